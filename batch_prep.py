@@ -0,0 +1,246 @@
+"""
+batch_prep.py - Gera vários prompts de Meeting Prep / Panel Prep de uma vez
+
+Lê uma planilha CSV ou um arquivo JSONL com uma reunião/painel por linha,
+carrega o corpus uma única vez (usando o cache de extração) e gera todos os
+prompts em paralelo numa pasta de saída. Os prompts saem da mesma camada
+usada pelo app (prompt_builder.py), então são idênticos aos do formulário.
+
+Colunas/campos aceitos:
+- tool: "meeting" (padrão) ou "panel"
+- Meeting Prep: organization, meeting_date, topics, meeting_type,
+  detail_level, objectives
+- Panel Prep: panel_title, event_name, panel_date, your_role, panel_topic,
+  duration, prep_level, audience, other_panelists, key_message
+
+Campos omitidos recebem os mesmos valores padrão do formulário.
+
+Uso:
+    python batch_prep.py reunioes.csv --output briefings --workers 4
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from document_loader import load_corpus
+from prompt_builder import build_meeting_prompt, build_panel_prompt
+from retrieval import PassageIndex
+from token_budget import count_tokens
+
+DOCS_FOLDER = Path("documents")
+OUTPUT_FOLDER = Path("briefings")
+DEFAULT_CONTEXT_TOKENS = 20000
+SUMMARY_NAME = "briefings.jsonl"
+
+# Padrões do formulário do app (meeting_prep.py)
+MEETING_DEFAULTS = {
+    'organization': "",
+    'meeting_date': None,
+    'topics': "",
+    'meeting_type': "Reunião de Mapeamento",
+    'detail_level': "Padrão",
+    'objectives': "",
+}
+PANEL_DEFAULTS = {
+    'panel_title': "",
+    'event_name': "",
+    'panel_date': None,
+    'your_role': "Painelista",
+    'panel_topic': "",
+    'duration': "5 minutos",
+    'prep_level': "Intermediário",
+    'audience': "",
+    'other_panelists': "",
+    'key_message': "",
+}
+REQUIRED_FIELDS = {
+    'meeting': ('organization', 'topics'),
+    'panel': ('panel_title', 'panel_topic'),
+}
+
+# Corpus e índice do processo (no modo paralelo, um por processo de trabalho)
+_state = None
+
+
+def read_specs(spec_path):
+    """Lê as especificações de um CSV ou JSONL; retorna uma lista de dicionários"""
+    spec_path = Path(spec_path)
+    with open(spec_path, 'r', encoding='utf-8-sig', newline='') as f:
+        if spec_path.suffix.lower() in ('.jsonl', '.json'):
+            return [json.loads(line) for line in f if line.strip()]
+        return [dict(row) for row in csv.DictReader(f)]
+
+
+def normalize_spec(spec):
+    """
+    Completa a especificação com os padrões do formulário.
+
+    Retorna (ferramenta, campos). Levanta ValueError se a ferramenta for
+    desconhecida ou faltar um campo obrigatório.
+    """
+    tool = (spec.get('tool') or "meeting").strip().lower()
+    if tool not in REQUIRED_FIELDS:
+        raise ValueError(f"ferramenta desconhecida: {tool!r} (use 'meeting' ou 'panel')")
+
+    defaults = MEETING_DEFAULTS if tool == "meeting" else PANEL_DEFAULTS
+    fields = {name: spec.get(name) or default for name, default in defaults.items()}
+
+    date_field = 'meeting_date' if tool == "meeting" else 'panel_date'
+    # O st.date_input do app começa no dia de hoje
+    fields[date_field] = str(fields[date_field] or date.today())
+
+    missing = [name for name in REQUIRED_FIELDS[tool] if not str(fields[name]).strip()]
+    if missing:
+        raise ValueError(f"campos obrigatórios vazios: {', '.join(missing)}")
+    return tool, fields
+
+
+def build_prompt(spec, documents, index, corpus_version, token_budget=DEFAULT_CONTEXT_TOKENS, compress=False):
+    """Monta o prompt de uma especificação; mesmo retorno de prompt_builder"""
+    tool, fields = normalize_spec(spec)
+    builder = build_meeting_prompt if tool == "meeting" else build_panel_prompt
+    return builder(documents, index, corpus_version, token_budget=token_budget, compress=compress, **fields)
+
+
+def load_state(docs_folder):
+    """Carrega o corpus e monta o índice de trechos"""
+    corpus = load_corpus(docs_folder)
+    return corpus, PassageIndex(corpus['documents'])
+
+
+def _init_worker(docs_folder):
+    # Com fork o processo já herda o corpus carregado pelo pai; com spawn
+    # (Windows/macOS) ele é lido do cache de extração
+    global _state
+    if _state is None:
+        _state = load_state(docs_folder)
+
+
+def _output_name(number, spec):
+    title = spec.get('organization') or spec.get('panel_title') or "briefing"
+    slug = re.sub(r"[^\w]+", "_", title.strip()).strip("_")[:50] or "briefing"
+    return f"{number:03d}_{slug}.txt"
+
+
+def _generate(job):
+    """Gera e salva um prompt; roda no processo principal ou num de trabalho"""
+    number, spec, output_folder, token_budget, compress = job
+    corpus, index = _state
+    output_file = output_folder / _output_name(number, spec)
+    start = time.perf_counter()
+
+    try:
+        result = build_prompt(spec, corpus['documents'], index, corpus['version'], token_budget, compress)
+    except Exception as e:
+        return {'row': number, 'error': str(e)}
+
+    output_file.write_text(result['prompt'], encoding='utf-8')
+    return {
+        'row': number,
+        'file': output_file.name,
+        'tool': normalize_spec(spec)[0],
+        'documents': len(result['token_usage']),
+        'context_chars': len(result['context']),
+        'prompt_tokens': count_tokens(result['prompt']),
+        'dedup_saved_tokens': result['dedup_savings']['tokens'],
+        'compression_ratio': round(result['compression']['ratio'], 3),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def generate_briefings(specs, output_folder=OUTPUT_FOLDER, docs_folder=DOCS_FOLDER,
+                       token_budget=DEFAULT_CONTEXT_TOKENS, workers=1, compress=False):
+    """
+    Gera um prompt por especificação em output_folder.
+
+    Retorna o resumo de cada linha, na ordem das especificações: arquivo
+    gerado e estatísticas, ou {'row', 'error'} se a linha for inválida.
+    """
+    global _state
+    output_folder = Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    _state = load_state(docs_folder)
+    jobs = [(number, spec, output_folder, token_budget, compress) for number, spec in enumerate(specs, start=1)]
+
+    if workers > 1 and len(jobs) > 1:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(docs_folder,)) as executor:
+            results = list(executor.map(_generate, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        results = [_generate(job) for job in jobs]
+
+    with open(output_folder / SUMMARY_NAME, 'w', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gera prompts de Meeting/Panel Prep em lote")
+    parser.add_argument("specs", type=Path, help="Arquivo CSV ou JSONL com uma reunião/painel por linha")
+    parser.add_argument("--output", type=Path, default=OUTPUT_FOLDER, help="Pasta dos prompts gerados")
+    parser.add_argument("--docs", type=Path, default=DOCS_FOLDER, help="Pasta dos documentos")
+    parser.add_argument(
+        "--tokens",
+        type=int,
+        default=DEFAULT_CONTEXT_TOKENS,
+        help="Orçamento do contexto em tokens (como na sidebar do app)"
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Compressão extrativa do contexto (como o checkbox da sidebar do app)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processos em paralelo (1 = sequencial; 0 = todos os núcleos)"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 70)
+    print("BRIEFINGS EM LOTE - IETA")
+    print("=" * 70)
+
+    specs = read_specs(args.specs)
+    if not specs:
+        print(f"\n⚠️  Nenhuma especificação em {args.specs}")
+        return 1
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    print(f"\n📋 {len(specs)} especificações | ⚡ {workers} processo(s)")
+
+    start = time.perf_counter()
+    results = generate_briefings(specs, args.output, args.docs, args.tokens, workers, args.compress)
+    elapsed = time.perf_counter() - start
+
+    errors = [result for result in results if 'error' in result]
+    for result in results:
+        if 'error' in result:
+            print(f"   ❌ Linha {result['row']}: {result['error']}")
+        else:
+            print(f"   ✅ {result['file']} ({result['prompt_tokens']:,} tokens)")
+
+    print(f"\n✅ {len(results) - len(errors)} prompts em {args.output.absolute()} ({elapsed:.1f}s)")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,377 @@
+"""
+benchmark.py - Medição de desempenho da extração, carga, chunking e prompts
+
+Roda as etapas principais sobre dois conjuntos de documentos:
+- sintético: PDFs, DOCX e TXT gerados com quantidade e tamanho
+  configuráveis (mesma semente = mesmos arquivos)
+- real: a pasta 'documents/' do app
+
+Para cada conjunto mede:
+- carga a frio (cache de extração vazio) e a quente (cache cheio)
+- montagem do índice de trechos
+- chunking (chunk_pdf / chunk_word) em páginas ou parágrafos por segundo
+- extração de DOCX: python-docx contra a leitura em fluxo (docx_stream.py)
+- latência da montagem do contexto e do prompt (p50/p95/máx)
+
+O tempo de cada etapa é medido sem tracemalloc; o pico de memória vem de uma
+segunda execução com tracemalloc ligado (só memória alocada pelo Python, no
+processo principal). O resultado sai em JSON, para comparar execuções.
+
+Uso:
+    python benchmark.py --pdfs 5 --pages 40 --output bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from docx import Document
+
+from chunk_documents import chunk_pdf, chunk_word
+from compression import query_compressor
+from document_loader import load_corpus
+from document_store import TEXT_CACHE
+from docx_stream import compare as compare_docx, iter_docx_blocks
+from prompt_builder import build_meeting_prompt
+from retrieval import PassageIndex, build_context
+from token_budget import tokenizer_name
+
+DOCS_FOLDER = Path("documents")
+
+VOCABULARY = """
+carbono mercado crédito emissão redução remoção compensação regulado voluntário
+SBCE CBAM CBIOs biometano aviação CORSIA artigo ajuste correspondente ITMO
+registro metodologia adicionalidade permanência vazamento jurisdicional REDD
+carbon market credit emission reduction removal offset registry methodology
+article adjustment corresponding integrity baseline verification issuance
+""".split()
+
+QUERIES = [
+    "SBCE, CBAM, CBIOs, certificados de biometano",
+    "Artigo 6 ITMOs ajustes correspondentes",
+    "REDD+ jurisdicional e nesting de projetos",
+    "voluntary carbon market prices and transaction volumes",
+    "CORSIA aviação combustíveis sustentáveis",
+]
+
+
+# ==============================================================================
+# CORPUS SINTÉTICO
+# ==============================================================================
+
+def _sentence(rnd, words=12):
+    text = " ".join(rnd.choice(VOCABULARY) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _pdf_string(text):
+    return text.encode('latin-1', 'replace').decode('latin-1').replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_synthetic_pdf(path, pages, rnd, lines_per_page=40):
+    """PDF mínimo válido com texto (Helvetica), sem dependências extras"""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} /Resources << /Font << /F1 {} 0 R >> >> >>".format(
+            " ".join(f"{3 + 2 * i} 0 R" for i in range(pages)), pages, 3 + 2 * pages
+        ),
+    ]
+    for i in range(pages):
+        lines = " ".join(f"({_pdf_string(_sentence(rnd))}) '" for _ in range(lines_per_page))
+        stream = f"BT /F1 9 Tf 12 TL 40 800 Td {lines} ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {4 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode('latin-1')
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode('latin-1')
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    path.write_bytes(bytes(out))
+
+
+def write_synthetic_docx(path, paragraphs, rnd):
+    doc = Document()
+    for _ in range(paragraphs):
+        doc.add_paragraph(" ".join(_sentence(rnd) for _ in range(rnd.randint(2, 5))))
+    doc.save(path)
+
+
+def write_synthetic_txt(path, paragraphs, rnd):
+    text = "\n\n".join(" ".join(_sentence(rnd) for _ in range(rnd.randint(2, 5))) for _ in range(paragraphs))
+    path.write_text(text, encoding='utf-8')
+
+
+def make_synthetic_corpus(folder, pdfs=3, docx=3, txt=3, pages=30, paragraphs=200, seed=0):
+    """Gera o corpus sintético em folder; retorna {'pdf_pages', 'docx_paragraphs', 'bytes'}"""
+    folder.mkdir(parents=True, exist_ok=True)
+    rnd = random.Random(seed)
+
+    for i in range(pdfs):
+        write_synthetic_pdf(folder / f"sintetico_{i:02d}.pdf", pages, rnd)
+    for i in range(docx):
+        write_synthetic_docx(folder / f"sintetico_{i:02d}.docx", paragraphs, rnd)
+    for i in range(txt):
+        write_synthetic_txt(folder / f"sintetico_{i:02d}.txt", paragraphs, rnd)
+
+    return {
+        'pdf_pages': pdfs * pages,
+        'docx_paragraphs': docx * paragraphs,
+        'bytes': sum(f.stat().st_size for f in folder.iterdir()),
+    }
+
+
+# ==============================================================================
+# MEDIÇÃO
+# ==============================================================================
+
+def measure(stage, setup=None, repeat=1):
+    """
+    Tempo e pico de memória de uma etapa.
+
+    setup() prepara os argumentos de cada execução (fora da medição).
+    Retorna (resultado da última execução, {'seconds', 'runs', 'peak_mb'}).
+    """
+    runs = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        result = stage(*args)
+        runs.append(time.perf_counter() - start)
+
+    args = setup() if setup else ()
+    tracemalloc.start()
+    try:
+        stage(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, {
+        'seconds': round(min(runs), 4),
+        'runs': [round(run, 4) for run in runs],
+        'peak_mb': round(peak / 1024 / 1024, 2),
+    }
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    return {
+        'p50_ms': round(statistics.median(ordered) * 1000, 2),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+
+def bench_loading(docs_folder, work_dir, workers, repeat):
+    def fresh_cache():
+        return (Path(tempfile.mkdtemp(prefix="cache_frio_", dir=work_dir)),)
+
+    def load(cache_dir):
+        return load_corpus(docs_folder, cache_dir=cache_dir, workers=workers)
+
+    corpus, cold = measure(load, fresh_cache, repeat)
+
+    warm_cache = Path(tempfile.mkdtemp(prefix="cache_quente_", dir=work_dir))
+    load(warm_cache)
+    _, warm = measure(load, lambda: (warm_cache,), repeat)
+
+    documents = corpus['documents']
+    stats = {
+        'documents': len(documents),
+        'chars': sum(doc['char_count'] for doc in documents.values()),
+        'errors': len(corpus['errors']),
+        'cold_load': cold,
+        'warm_load': warm,
+    }
+    return corpus, stats
+
+
+def bench_chunking(docs_folder, work_dir, repeat):
+    """Throughput do chunk_pdf/chunk_word (sequencial, modo por páginas/parágrafos)"""
+    from PyPDF2 import PdfReader
+
+    pdf_files = sorted(docs_folder.glob("*.pdf"))
+    word_files = sorted(docs_folder.glob("*.docx"))
+    stats = {}
+
+    def output_folder():
+        return (Path(tempfile.mkdtemp(prefix="chunks_", dir=work_dir)),)
+
+    def quiet(function, *args, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            function(*args, **kwargs)
+
+    if pdf_files:
+        pages = sum(len(PdfReader(str(pdf)).pages) for pdf in pdf_files)
+        _, pdf_stats = measure(
+            lambda folder: [quiet(chunk_pdf, pdf, folder, pages_per_chunk=15) for pdf in pdf_files],
+            output_folder, repeat,
+        )
+        pdf_stats['pages'] = pages
+        pdf_stats['pages_per_sec'] = round(pages / max(pdf_stats['seconds'], 1e-9), 1)
+        stats['pdf'] = pdf_stats
+
+    if word_files:
+        paragraphs = sum(sum(1 for _ in iter_docx_blocks(docx)) for docx in word_files)
+        _, word_stats = measure(
+            lambda folder: [quiet(chunk_word, docx, folder, paragraphs_per_chunk=100) for docx in word_files],
+            output_folder, repeat,
+        )
+        word_stats['paragraphs'] = paragraphs
+        word_stats['paragraphs_per_sec'] = round(paragraphs / max(word_stats['seconds'], 1e-9), 1)
+        stats['docx'] = word_stats
+
+    return stats
+
+
+def bench_docx(docs_folder):
+    """python-docx (doc.paragraphs) contra a leitura em fluxo, arquivo a arquivo e no total"""
+    files = [compare_docx(docx) for docx in sorted(docs_folder.glob("*.docx"))]
+    totals = {}
+    for name in ('python_docx', 'stream'):
+        totals[name] = {
+            'seconds': round(sum(result[name]['seconds'] for result in files), 4),
+            'peak_mb': max((result[name]['peak_mb'] for result in files), default=0.0),
+            'chars': sum(result[name]['chars'] for result in files),
+        }
+    return {'files': files, 'total': totals}
+
+
+def bench_prompts(corpus, queries, token_budget):
+    """Índice de trechos e latência do contexto (sem cache) e do prompt completo"""
+    documents = corpus['documents']
+    index, index_stats = measure(lambda: PassageIndex(documents))
+    index_stats['passages'] = len(index.passages)
+
+    context_times = []
+    for query in queries:
+        start = time.perf_counter()
+        build_context(documents, index, query, token_budget=token_budget)
+        context_times.append(time.perf_counter() - start)
+
+    compressed_times = []
+    ratios = []
+    for query in queries:
+        start = time.perf_counter()
+        *_, compression = build_context(documents, index, query, token_budget=token_budget,
+                                        compress=query_compressor(query))
+        compressed_times.append(time.perf_counter() - start)
+        ratios.append(compression['ratio'])
+
+    # Organização diferente em cada chamada: nenhuma resposta vem do cache
+    prompt_times = []
+    for number, query in enumerate(queries):
+        start = time.perf_counter()
+        build_meeting_prompt(
+            documents, index, corpus['version'],
+            organization=f"Benchmark {number:04d}", meeting_date="2025-01-01", topics=query,
+            meeting_type="Reunião de Mapeamento", detail_level="Padrão", objectives="",
+            token_budget=token_budget,
+        )
+        prompt_times.append(time.perf_counter() - start)
+
+    return {
+        'index_build': index_stats,
+        'context': dict(_percentiles(context_times), samples=len(context_times)),
+        'compressed_context': dict(
+            _percentiles(compressed_times), samples=len(compressed_times),
+            mean_ratio=round(sum(ratios) / max(len(ratios), 1), 3),
+        ),
+        'prompt': dict(_percentiles(prompt_times), samples=len(prompt_times)),
+        'text_cache': TEXT_CACHE.stats(),
+    }
+
+
+def run_suite(docs_folder, work_dir, workers, repeat, queries, token_budget):
+    corpus, loading = bench_loading(docs_folder, work_dir, workers, repeat)
+    return {
+        'loading': loading,
+        'chunking': bench_chunking(docs_folder, work_dir, repeat),
+        'docx_extraction': bench_docx(docs_folder),
+        'retrieval': bench_prompts(corpus, queries, token_budget),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de extração, carga, chunking e prompts")
+    parser.add_argument("--pdfs", type=int, default=3, help="PDFs sintéticos")
+    parser.add_argument("--docx", type=int, default=3, help="DOCX sintéticos")
+    parser.add_argument("--txt", type=int, default=3, help="TXT sintéticos")
+    parser.add_argument("--pages", type=int, default=30, help="Páginas por PDF sintético")
+    parser.add_argument("--paragraphs", type=int, default=200, help="Parágrafos por DOCX/TXT sintético")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do corpus sintético")
+    parser.add_argument("--queries", type=int, default=20, help="Consultas na medição de prompts")
+    parser.add_argument("--tokens", type=int, default=20000, help="Orçamento do contexto em tokens")
+    parser.add_argument("--repeat", type=int, default=1, help="Repetições de cada etapa (vale a melhor)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processos na extração (1 = sequencial; 0 = todos os núcleos)"
+    )
+    parser.add_argument("--docs", type=Path, default=DOCS_FOLDER, help="Pasta dos documentos reais")
+    parser.add_argument("--skip-real", action="store_true", help="Não medir a pasta de documentos reais")
+    parser.add_argument("--output", type=Path, help="Arquivo JSON de saída (padrão: tela)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workers = args.workers if args.workers > 0 else None
+    rnd = random.Random(args.seed)
+    queries = [QUERIES[i % len(QUERIES)] if i < len(QUERIES) else " ".join(rnd.sample(VOCABULARY, 4))
+               for i in range(args.queries)]
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'tokenizer': tokenizer_name(),
+        'params': {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        'suites': {},
+    }
+
+    work_dir = Path(tempfile.mkdtemp(prefix="ieta_bench_"))
+    try:
+        synthetic_folder = work_dir / "sintetico"
+        corpus_info = make_synthetic_corpus(synthetic_folder, args.pdfs, args.docx, args.txt,
+                                            args.pages, args.paragraphs, args.seed)
+        print("⏱️  Corpus sintético...", file=sys.stderr)
+        report['suites']['synthetic'] = dict(
+            corpus=corpus_info,
+            **run_suite(synthetic_folder, work_dir, workers, args.repeat, queries, args.tokens),
+        )
+
+        if not args.skip_real and args.docs.is_dir():
+            print(f"⏱️  Documentos reais ({args.docs})...", file=sys.stderr)
+            report['suites']['real'] = run_suite(args.docs, work_dir, workers, args.repeat, queries, args.tokens)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n", encoding='utf-8')
+        print(f"✅ Resultado salvo em {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
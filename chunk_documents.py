@@ -8,31 +8,256 @@ Como usar:
 2. Executar: python chunk_documents.py
 3. Chunks aparecerão em 'documentos_chunked/'
 4. Mover chunks para 'documents/' para usar nas ferramentas
+
+Modo paralelo (vários núcleos):
+    python chunk_documents.py --workers 4
+Os arquivos e as faixas de páginas de cada PDF são distribuídos entre
+processos; os arquivos gerados são idênticos aos do modo sequencial.
+
+Modo por tamanho (em vez de 15 páginas / 100 parágrafos fixos):
+    python chunk_documents.py --chunk-size 6000 --overlap 300
+    python chunk_documents.py --chunk-size 1500 --unit tokens
+Os cortes caem entre frases, e 'documentos_chunked/chunks_manifest.jsonl'
+registra origem, páginas/parágrafos e offsets de caracteres de cada chunk.
+
+Tempo, bytes lidos e caracteres gravados de cada arquivo aparecem na tela e
+vão para o log de diagnóstico (ver diagnostics.py).
+
+Execuções incrementais: 'documentos_chunked/build_manifest.json' guarda o
+hash, os parâmetros e as partes geradas de cada arquivo. Arquivos iguais e
+com os mesmos parâmetros são pulados, os alterados são divididos de novo
+(e as partes antigas que sobrarem, apagadas), e as partes de arquivos
+removidos de 'documentos_grandes/' também saem. O manifesto é gravado a
+cada arquivo concluído, então uma execução interrompida continua de onde
+parou. Para dividir tudo de novo (as partes antigas continuam sendo apagadas):
+    python chunk_documents.py --force
 """
 
+import argparse
+import io
+import itertools
+import json
+import os
+import re
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from PyPDF2 import PdfReader
-from docx import Document as DocxDocument
 
-def chunk_pdf(pdf_path, output_folder, pages_per_chunk=15):
-    """Divide PDF em chunks de N páginas"""
+from diagnostics import LOG_PATH, log_event
+from document_loader import file_sha256
+from docx_stream import iter_docx_blocks
+from token_budget import count_tokens
+
+# Tamanho fixo das partes no modo padrão
+PAGES_PER_CHUNK = 15
+PARAGRAPHS_PER_CHUNK = 100
+
+# Modo paralelo: tarefas adiantadas por processo (resultados à espera de gravação)
+JOB_WINDOW_PER_WORKER = 2
+
+
+def _release_page_contents(reader, page):
+    """
+    Tira do cache do PdfReader os streams de conteúdo de uma página já lida.
+
+    O PyPDF2 guarda em reader.resolved_objects todo objeto que já resolveu,
+    inclusive o conteúdo (decodificado) de cada página; num PDF de milhares
+    de páginas isso cresce sem limite. Fontes e recursos compartilhados
+    continuam em cache.
+    """
+    contents = page.get('/Contents')
+    if contents is None:
+        return
+    refs = contents if isinstance(contents, list) else [contents]
+    for ref in refs:
+        if hasattr(ref, 'idnum'):
+            reader.resolved_objects.pop((ref.generation, ref.idnum), None)
+
+
+def iter_pdf_pages(pdf_path, start_page, end_page):
+    """
+    Gera o texto de cada página da faixa, uma de cada vez.
+
+    O arquivo é lido sob demanda (sem carregar o PDF inteiro na memória) e o
+    conteúdo de cada página é liberado logo depois da extração.
+    """
+    with open(pdf_path, 'rb') as pdf_file:
+        reader = PdfReader(pdf_file)
+        for page_num in range(start_page, end_page):
+            page = reader.pages[page_num]
+            text = page.extract_text()
+            _release_page_contents(reader, page)
+            del page
+            yield text
+
+
+def extract_pdf_pages(pdf_path, start_page, end_page):
+    """Extrai o texto de uma faixa de páginas (roda nos processos do pool)"""
+    return list(iter_pdf_pages(pdf_path, start_page, end_page))
+
+
+def read_word_paragraphs(docx_path):
+    """
+    Lê o texto dos blocos do Word em fluxo: parágrafos e linhas de tabela
+    (ver docx_stream.py). Roda nos processos do pool.
+    """
+    return list(iter_docx_blocks(docx_path))
+
+
+class _Job:
+    """Tarefa de uma JobWindow: result() como o de um Future"""
+
+    __slots__ = ('window', 'function', 'args', 'future')
+
+    def __init__(self, window, function, args):
+        self.window = window
+        self.function = function
+        self.args = args
+        self.future = None
+
+    def result(self):
+        return self.window.result(self)
+
+
+class JobWindow:
+    """
+    Fila de tarefas do pool com no máximo `size` submetidas de cada vez.
+
+    As tarefas são consumidas na ordem em que foram agendadas (faixas dos
+    PDFs, depois os Words); só quando uma é consumida a seguinte entra no
+    pool. Assim os resultados prontos e ainda não gravados ficam limitados
+    à janela, em vez de o documento inteiro se acumular no processo
+    principal enquanto ele grava o arquivo anterior.
+    """
+
+    def __init__(self, executor, size):
+        self.executor = executor
+        self.size = size
+        self._queue = deque()  # Tarefas agendadas e ainda não consumidas, em ordem
+        self._submitted = 0    # Quantas do início da fila já estão no pool
+
+    def add(self, function, *args):
+        job = _Job(self, function, args)
+        self._queue.append(job)
+        self._fill()
+        return job
+
+    def _fill(self):
+        while self._submitted < min(self.size, len(self._queue)):
+            job = self._queue[self._submitted]
+            job.future = self.executor.submit(job.function, *job.args)
+            self._submitted += 1
+
+    def result(self, job):
+        """
+        Espera e devolve o resultado da tarefa. As tarefas agendadas antes
+        dela e nunca consumidas (arquivo que falhou no meio) são descartadas.
+        """
+        while self._queue:
+            head = self._queue.popleft()
+            if head.future is not None:
+                self._submitted -= 1
+            if head is job:
+                break
+            if head.future is not None:
+                head.future.cancel()
+        if job.future is None:
+            job.future = self.executor.submit(job.function, *job.args)
+        self._fill()
+        return job.future.result()
+
+
+def submit_pdf(jobs, pdf_path, pages_per_chunk=15):
+    """Agenda a extração do PDF na JobWindow, uma tarefa por faixa de páginas"""
+    with open(pdf_path, 'rb') as pdf_file:
+        total_pages = len(PdfReader(pdf_file).pages)
+    return [
+        jobs.add(extract_pdf_pages, pdf_path, start, min(start + pages_per_chunk, total_pages))
+        for start in range(0, total_pages, pages_per_chunk)
+    ]
+
+
+def _page_texts(pdf_path, total_pages, page_ranges):
+    """
+    Texto das páginas em ordem: lidas aqui mesmo ou das faixas da JobWindow.
+
+    No modo paralelo cada faixa sai da lista assim que é consumida, então o
+    que já foi gravado não fica preso na memória.
+    """
+    if page_ranges is None:
+        yield from iter_pdf_pages(pdf_path, 0, total_pages)
+    else:
+        for i in range(len(page_ranges)):
+            job, page_ranges[i] = page_ranges[i], None
+            yield from job.result()
+
+
+class _CountingWriter:
+    """Arquivo de saída que conta os caracteres gravados"""
+
+    def __init__(self, file):
+        self.file = file
+        self.chars = 0
+
+    def write(self, text):
+        self.chars += len(text)
+        return self.file.write(text)
+
+
+@contextmanager
+def _streaming_output(output_file, written):
+    """
+    Abre o arquivo de saída para gravação incremental.
+
+    O texto vai para um '.tmp' que só ganha o nome final se tudo der certo;
+    um erro no meio do PDF não deixa parte truncada na pasta de saída.
+    Depois do rename, (nome, caracteres) da parte entra na lista written.
+    """
+    tmp_file = output_file.with_name(output_file.name + ".tmp")
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            out = _CountingWriter(f)
+            yield out
+        os.replace(tmp_file, output_file)
+        written.append((output_file.name, out.chars))
+    finally:
+        if tmp_file.exists():
+            tmp_file.unlink()
+
+
+def chunk_pdf(pdf_path, output_folder, pages_per_chunk=15, page_ranges=None):
+    """
+    Divide PDF em chunks de N páginas
+
+    Cada página é gravada no arquivo assim que é extraída, então o uso de
+    memória não cresce com o tamanho do documento.
+
+    page_ranges: faixas de páginas já agendadas com submit_pdf (modo paralelo)
+
+    Retorna [(nome_da_parte, caracteres), ...] com as partes gravadas, ou
+    None se houve erro.
+    """
     print(f"\n📄 Processando PDF: {pdf_path.name}")
     
+    written = []
     try:
-        reader = PdfReader(pdf_path)
-        total_pages = len(reader.pages)
+        with open(pdf_path, 'rb') as pdf_file:
+            total_pages = len(PdfReader(pdf_file).pages)
+        page_texts = _page_texts(pdf_path, total_pages, page_ranges)
         
         print(f"   Total de páginas: {total_pages}")
         
         if total_pages <= pages_per_chunk:
             print(f"   ✅ Documento pequeno - copiando sem dividir")
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            
             output_file = output_folder / f"{pdf_path.stem}.txt"
-            output_file.write_text(text, encoding='utf-8')
-            return
+            with _streaming_output(output_file, written) as out:
+                for page_text in page_texts:
+                    out.write(page_text + "\n")
+            return written
         
         num_chunks = (total_pages + pages_per_chunk - 1) // pages_per_chunk
         print(f"   📊 Dividindo em {num_chunks} chunks de ~{pages_per_chunk} páginas")
@@ -41,78 +266,504 @@ def chunk_pdf(pdf_path, output_folder, pages_per_chunk=15):
             start_page = chunk_num * pages_per_chunk
             end_page = min(start_page + pages_per_chunk, total_pages)
             
-            chunk_text = []
-            chunk_text.append(f"DOCUMENTO: {pdf_path.stem}")
-            chunk_text.append(f"PARTE {chunk_num + 1} de {num_chunks}")
-            chunk_text.append(f"Páginas {start_page + 1} a {end_page}")
-            chunk_text.append("=" * 70)
-            chunk_text.append("")
-            
-            for page_num in range(start_page, end_page):
-                page = reader.pages[page_num]
-                chunk_text.append(f"\n--- PÁGINA {page_num + 1} ---\n")
-                chunk_text.append(page.extract_text())
+            header = []
+            header.append(f"DOCUMENTO: {pdf_path.stem}")
+            header.append(f"PARTE {chunk_num + 1} de {num_chunks}")
+            header.append(f"Páginas {start_page + 1} a {end_page}")
+            header.append("=" * 70)
+            header.append("")
             
             output_file = output_folder / f"{pdf_path.stem}_parte{chunk_num + 1:02d}de{num_chunks:02d}.txt"
-            output_file.write_text("\n".join(chunk_text), encoding='utf-8')
+            with _streaming_output(output_file, written) as out:
+                out.write("\n".join(header))
+                for page_num in range(start_page, end_page):
+                    out.write(f"\n\n--- PÁGINA {page_num + 1} ---\n")
+                    out.write("\n" + next(page_texts))
             
             print(f"      ✅ Parte {chunk_num + 1}/{num_chunks} salva")
         
         print(f"   ✅ PDF completo processado!")
+        return written
         
     except Exception as e:
         print(f"   ❌ Erro: {str(e)}")
+        return None
+
+
+def chunk_word(docx_path, output_folder, paragraphs_per_chunk=100, paragraphs=None):
+    """
+    Divide Word em chunks de N parágrafos
 
+    Os parágrafos são lidos em fluxo e cada chunk vai para o disco (como
+    '.tmp') assim que completa; o cabeçalho com o total de partes entra no
+    fim, quando ele é conhecido. Só um chunk fica em memória de cada vez.
 
-def chunk_word(docx_path, output_folder, paragraphs_per_chunk=100):
-    """Divide Word em chunks de N parágrafos"""
+    paragraphs: leitura já agendada no pool com read_word_paragraphs (modo paralelo)
+
+    Retorna [(nome_da_parte, caracteres), ...] com as partes gravadas, ou
+    None se houve erro.
+    """
     print(f"\n📝 Processando Word: {docx_path.name}")
     
+    chunk_files = []  # (arquivo_temporário, primeiro_parágrafo, último_parágrafo)
+    written = []
     try:
-        doc = DocxDocument(docx_path)
-        total_paragraphs = len(doc.paragraphs)
-        
-        print(f"   Total de parágrafos: {total_paragraphs}")
+        if paragraphs is None:
+            paragraph_texts = iter_docx_blocks(docx_path)
+        else:
+            paragraph_texts = iter(paragraphs.result())
         
-        if total_paragraphs <= paragraphs_per_chunk:
+        # Um parágrafo além do limite decide se o documento é dividido
+        first = [text for _, text in zip(range(paragraphs_per_chunk + 1), paragraph_texts)]
+        if len(first) <= paragraphs_per_chunk:
+            print(f"   Total de parágrafos: {len(first)}")
             print(f"   ✅ Documento pequeno - copiando sem dividir")
-            text = "\n".join([p.text for p in doc.paragraphs])
+            text = "\n".join(first)
             output_file = output_folder / f"{docx_path.stem}.txt"
             output_file.write_text(text, encoding='utf-8')
-            return
+            return [(output_file.name, len(text))]
+        
+        total_paragraphs = 0
+        chunk_lines = []
+        for para_text in itertools.chain(first, paragraph_texts):
+            total_paragraphs += 1
+            para_text = para_text.strip()
+            if para_text:
+                chunk_lines.append("\n" + para_text + "\n")  # Linha em branco entre parágrafos
+            if total_paragraphs % paragraphs_per_chunk == 0:
+                chunk_files.append(_write_word_chunk(docx_path, output_folder, chunk_files, chunk_lines,
+                                                     total_paragraphs - paragraphs_per_chunk + 1,
+                                                     total_paragraphs))
+                chunk_lines = []
+        if total_paragraphs % paragraphs_per_chunk:
+            chunk_files.append(_write_word_chunk(docx_path, output_folder, chunk_files, chunk_lines,
+                                                 total_paragraphs - total_paragraphs % paragraphs_per_chunk + 1,
+                                                 total_paragraphs))
         
-        num_chunks = (total_paragraphs + paragraphs_per_chunk - 1) // paragraphs_per_chunk
+        num_chunks = len(chunk_files)
+        print(f"   Total de parágrafos: {total_paragraphs}")
         print(f"   📊 Dividindo em {num_chunks} chunks de ~{paragraphs_per_chunk} parágrafos")
         
-        for chunk_num in range(num_chunks):
-            start_para = chunk_num * paragraphs_per_chunk
-            end_para = min(start_para + paragraphs_per_chunk, total_paragraphs)
-            
-            chunk_text = []
-            chunk_text.append(f"DOCUMENTO: {docx_path.stem}")
-            chunk_text.append(f"PARTE {chunk_num + 1} de {num_chunks}")
-            chunk_text.append(f"Parágrafos {start_para + 1} a {end_para}")
-            chunk_text.append("=" * 70)
-            chunk_text.append("")
-            
-            for para_num in range(start_para, end_para):
-                para_text = doc.paragraphs[para_num].text.strip()
-                if para_text:
-                    chunk_text.append(para_text)
-                    chunk_text.append("")
-            
+        for chunk_num, (tmp_file, start_para, end_para) in enumerate(chunk_files):
+            header = [
+                f"DOCUMENTO: {docx_path.stem}",
+                f"PARTE {chunk_num + 1} de {num_chunks}",
+                f"Parágrafos {start_para} a {end_para}",
+                "=" * 70,
+                "",
+            ]
             output_file = output_folder / f"{docx_path.stem}_parte{chunk_num + 1:02d}de{num_chunks:02d}.txt"
-            output_file.write_text("\n".join(chunk_text), encoding='utf-8')
+            with _streaming_output(output_file, written) as out:
+                out.write("\n".join(header))
+                with open(tmp_file, encoding='utf-8') as body:
+                    shutil.copyfileobj(body, out)
             
             print(f"      ✅ Parte {chunk_num + 1}/{num_chunks} salva")
         
         print(f"   ✅ Word completo processado!")
+        return written
         
     except Exception as e:
         print(f"   ❌ Erro: {str(e)}")
+        return None
+    finally:
+        for tmp_file, _, _ in chunk_files:
+            if tmp_file.exists():
+                tmp_file.unlink()
+
+
+def _write_word_chunk(docx_path, output_folder, chunk_files, chunk_lines, start_para, end_para):
+    """Grava o corpo de um chunk do Word num '.tmp'; retorna (arquivo, primeiro, último parágrafo)"""
+    tmp_file = output_folder / f".{docx_path.stem}_{len(chunk_files) + 1:04d}.tmp"
+    tmp_file.write_text("".join(chunk_lines), encoding='utf-8')
+    return tmp_file, start_para, end_para
+
+
+# ==============================================================================
+# MODO POR TAMANHO (caracteres ou tokens, com quebra em frases)
+# ==============================================================================
+
+MANIFEST_NAME = "chunks_manifest.jsonl"
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?;])\s+|\n\s*\n")
+WORD = re.compile(r"\S+")
+
+
+def _strip_span(text, start, end):
+    """Ajusta (início, fim) para descartar espaços nas pontas do trecho"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _split_sentences(text):
+    """Gera (início, fim) de cada frase do texto, sem espaços nas pontas"""
+    pos = 0
+    for match in SENTENCE_BREAK.finditer(text):
+        start, end = _strip_span(text, pos, match.start())
+        if start < end:
+            yield start, end
+        pos = match.end()
+    start, end = _strip_span(text, pos, len(text))
+    if start < end:
+        yield start, end
+
+
+def _split_long(text, start, end, target, size_fn):
+    """Quebra uma frase maior que o alvo em pedaços por palavra"""
+    piece_start = None
+    piece_size = 0
+    piece_end = start
+    for match in WORD.finditer(text, start, end):
+        word_size = size_fn(match.group()) + 1
+        if piece_start is not None and piece_size + word_size > target:
+            yield piece_start, piece_end
+            piece_start, piece_size = None, 0
+        if piece_start is None:
+            piece_start = match.start()
+        piece_size += word_size
+        piece_end = match.end()
+    if piece_start is not None:
+        yield piece_start, piece_end
+
+
+def _sentences(units, target, size_fn):
+    """
+    Gera as frases de todas as unidades (páginas ou parágrafos).
+
+    Cada frase vem como (unidade, texto, início, fim, tamanho), com os
+    offsets relativos ao texto do documento inteiro (unidades unidas por
+    "\\n", como no arquivo gerado para documentos pequenos).
+    """
+    offset = 0
+    for unit_num, unit_text in units:
+        for start, end in _split_sentences(unit_text):
+            size = size_fn(unit_text[start:end])
+            spans = [(start, end)] if size <= target else _split_long(unit_text, start, end, target, size_fn)
+            for span_start, span_end in spans:
+                sentence = unit_text[span_start:span_end]
+                yield unit_num, sentence, offset + span_start, offset + span_end, size_fn(sentence)
+        offset += len(unit_text) + 1
+
+
+def _format_body(sentences, unit_kind):
+    """Texto do chunk: marcador de página (PDF) ou linha em branco (Word) entre unidades"""
+    parts = []
+    previous_unit = None
+    for unit_num, sentence, _, _, _ in sentences:
+        if unit_num != previous_unit:
+            if unit_kind == "page":
+                parts.append(f"\n\n--- PÁGINA {unit_num} ---\n\n")
+            elif previous_unit is not None:
+                parts.append("\n\n")
+        elif parts:
+            parts.append(" ")
+        parts.append(sentence)
+        previous_unit = unit_num
+    return "".join(parts).strip("\n") + "\n"
+
+
+def chunk_by_size(source_path, output_folder, units, unit_kind, target, size_fn, overlap=0, manifest=None):
+    """
+    Divide o documento em chunks de ~target (caracteres ou tokens)
+
+    Os cortes caem sempre entre frases; com overlap > 0, as últimas frases
+    de um chunk (até esse tamanho, e sem que o seguinte passe do alvo) se
+    repetem no início do seguinte. Cada chunk vai para o disco assim que
+    fecha (como '.tmp') e só no fim recebe o nome _parteNNdeMM e o
+    cabeçalho, quando o total de partes é conhecido.
+
+    units: iterável de (número_da_unidade, texto) - páginas ou parágrafos
+    unit_kind: "page" ou "paragraph"
+    manifest: arquivo aberto onde é gravada uma linha JSON por chunk
+
+    Retorna [(nome_da_parte, caracteres), ...] com as partes gravadas.
+    """
+    unit_label = "Páginas" if unit_kind == "page" else "Parágrafos"
+    chunks = []  # (arquivo_temporário, primeira_unidade, última_unidade, início, fim, caracteres, tamanho)
+    current = []
+    current_size = 0
+    written = []
+
+    def flush(sentences):
+        body = _format_body(sentences, unit_kind)
+        tmp_file = output_folder / f".{source_path.stem}_{len(chunks) + 1:04d}.tmp"
+        tmp_file.write_text(body, encoding='utf-8')
+        chunks.append((
+            tmp_file, sentences[0][0], sentences[-1][0], sentences[0][2], sentences[-1][3],
+            len(body), sum(sentence[4] for sentence in sentences),
+        ))
+
+    try:
+        for sentence in _sentences(units, target, size_fn):
+            if current and current_size + sentence[4] > target:
+                flush(current)
+                # Sobreposição: últimas frases do chunk anterior, contadas no
+                # alvo (sempre cabe a frase nova, então o chunk traz conteúdo novo)
+                kept = []
+                kept_size = 0
+                for previous in reversed(current):
+                    if kept_size + previous[4] > min(overlap, target - sentence[4]):
+                        break
+                    kept.insert(0, previous)
+                    kept_size += previous[4]
+                current, current_size = kept, kept_size
+            current.append(sentence)
+            current_size += sentence[4]
+
+        if current:
+            flush(current)
+
+        num_chunks = len(chunks)
+        for chunk_num, (tmp_file, first_unit, last_unit, char_start, char_end, chars, size) in enumerate(chunks):
+            output_name = f"{source_path.stem}_parte{chunk_num + 1:02d}de{num_chunks:02d}.txt"
+            header = [
+                f"DOCUMENTO: {source_path.stem}",
+                f"PARTE {chunk_num + 1} de {num_chunks}",
+                f"{unit_label} {first_unit} a {last_unit}",
+                f"Caracteres {char_start} a {char_end}",
+                "=" * 70,
+                "",
+                "",
+            ]
+            with _streaming_output(output_folder / output_name, written) as out:
+                out.write("\n".join(header))
+                with open(tmp_file, encoding='utf-8') as body:
+                    shutil.copyfileobj(body, out)
+
+            if manifest is not None:
+                manifest.write(json.dumps({
+                    'source': source_path.name,
+                    'chunk_file': output_name,
+                    'part': chunk_num + 1,
+                    'total_parts': num_chunks,
+                    'unit': unit_kind,
+                    'span': [first_unit, last_unit],
+                    'char_start': char_start,
+                    'char_end': char_end,
+                    'chars': chars,
+                    'size': size,
+                }, ensure_ascii=False) + "\n")
+
+        return written
+    finally:
+        for chunk in chunks:
+            if chunk[0].exists():
+                chunk[0].unlink()
+
+
+def chunk_pdf_by_size(pdf_path, output_folder, target, size_fn, overlap=0, manifest=None, page_ranges=None):
+    """Divide PDF em chunks de tamanho alvo (ver chunk_by_size); None se houve erro"""
+    print(f"\n📄 Processando PDF: {pdf_path.name}")
+    
+    try:
+        with open(pdf_path, 'rb') as pdf_file:
+            total_pages = len(PdfReader(pdf_file).pages)
+        print(f"   Total de páginas: {total_pages}")
+        
+        units = enumerate(_page_texts(pdf_path, total_pages, page_ranges), 1)
+        written = chunk_by_size(pdf_path, output_folder, units, "page", target, size_fn, overlap, manifest)
+        print(f"   ✅ PDF dividido em {len(written)} chunks")
+        return written
+        
+    except Exception as e:
+        print(f"   ❌ Erro: {str(e)}")
+        return None
+
+
+class _Numbered:
+    """(número, texto) de cada parágrafo, contando quantos já passaram"""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.count = 0
+
+    def __iter__(self):
+        for text in self.texts:
+            self.count += 1
+            yield self.count, text
+
+
+def chunk_word_by_size(docx_path, output_folder, target, size_fn, overlap=0, manifest=None, paragraphs=None):
+    """Divide Word em chunks de tamanho alvo (ver chunk_by_size); None se houve erro"""
+    print(f"\n📝 Processando Word: {docx_path.name}")
+    
+    try:
+        # Em fluxo: os parágrafos vão para chunk_by_size conforme são lidos
+        if paragraphs is None:
+            paragraph_texts = iter_docx_blocks(docx_path)
+        else:
+            paragraph_texts = paragraphs.result()
+        
+        units = _Numbered(paragraph_texts)
+        written = chunk_by_size(docx_path, output_folder, units, "paragraph", target, size_fn, overlap, manifest)
+        print(f"   Total de parágrafos: {units.count}")
+        print(f"   ✅ Word dividido em {len(written)} chunks")
+        return written
+        
+    except Exception as e:
+        print(f"   ❌ Erro: {str(e)}")
+        return None
+
+
+def instrumented(chunk_function, source_path, output_folder, *args, **kwargs):
+    """
+    Roda chunk_function(source_path, output_folder, ...) medindo o arquivo.
+
+    Mostra e registra no log o tempo, os bytes lidos e os caracteres
+    gravados nas partes (como informados pela própria chunk_function);
+    retorna o evento registrado, com 'ok' (a divisão terminou sem erro) e
+    'outputs' (partes gravadas).
+    """
+    start = time.perf_counter()
+    written = chunk_function(source_path, output_folder, *args, **kwargs)
+    seconds = time.perf_counter() - start
+
+    outputs = written or []
+    chars = sum(part_chars for _, part_chars in outputs)
+    size = source_path.stat().st_size
+    print(f"   ⏱️  {seconds:.2f}s · {size / 1024:,.0f} KB lidos · {chars:,} caracteres gravados")
+    return log_event(
+        "chunk_file", file=source_path.name, function=chunk_function.__name__,
+        seconds=round(seconds, 4), bytes=size, chars=chars, parts=len(outputs),
+        ok=written is not None, outputs=sorted(name for name, _ in outputs),
+    )
+
+
+# ==============================================================================
+# MANIFESTO DE BUILD (execuções incrementais e retomáveis)
+# ==============================================================================
+
+BUILD_MANIFEST_NAME = "build_manifest.json"
+
+# Incrementar quando a divisão mudar de um jeito que exija refazer as partes
+CHUNKER_VERSION = 4
+
+
+def read_build_manifest(output_folder):
+    """{nome_do_arquivo: {'fingerprint', 'params', 'outputs', 'chunks'}}; vazio se não existe ou é ilegível"""
+    try:
+        with open(output_folder / BUILD_MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('chunker_version') != CHUNKER_VERSION:
+        return {}
+    return data.get('inputs', {})
+
+
+def write_build_manifest(build_manifest, output_folder):
+    """Grava o manifesto via temporário + rename (uma interrupção nunca o deixa pela metade)"""
+    path = output_folder / BUILD_MANIFEST_NAME
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'chunker_version': CHUNKER_VERSION, 'inputs': build_manifest}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def chunk_params(source_path, args):
+    """Parâmetros que definem as partes de um arquivo (mudou algum, divide de novo)"""
+    if args.chunk_size:
+        return {'mode': 'size', 'chunk_size': args.chunk_size, 'unit': args.unit, 'overlap': args.overlap}
+    if source_path.suffix.lower() == ".pdf":
+        return {'mode': 'fixed', 'pages_per_chunk': PAGES_PER_CHUNK}
+    return {'mode': 'fixed', 'paragraphs_per_chunk': PARAGRAPHS_PER_CHUNK}
+
+
+def build_status(source_path, entry, params, output_folder):
+    """
+    O que fazer com o arquivo: (motivo, fingerprint).
+
+    motivo é None quando o arquivo pode ser pulado, ou "novo", "alterado",
+    "parâmetros" ou "partes ausentes" (alguma parte gerada foi apagada ou
+    movida). O hash só é calculado se tamanho ou mtime mudaram.
+    """
+    stat = source_path.stat()
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if entry is None:
+        return "novo", dict(fingerprint, sha256=file_sha256(source_path))
+
+    previous = entry['fingerprint']
+    if (previous['size'], previous['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+        fingerprint['sha256'] = previous['sha256']
+    else:
+        fingerprint['sha256'] = file_sha256(source_path)
+        if fingerprint['sha256'] != previous['sha256']:
+            return "alterado", fingerprint
+
+    if entry['params'] != params:
+        return "parâmetros", fingerprint
+    if not all((output_folder / name).exists() for name in entry['outputs']):
+        return "partes ausentes", fingerprint
+    return None, fingerprint
+
+
+def remove_outputs(output_folder, names):
+    """Apaga as partes listadas que ainda existirem; retorna quantas foram apagadas"""
+    removed = 0
+    for name in names:
+        path = output_folder / name
+        if path.exists():
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def write_chunks_manifest(build_manifest, output_folder):
+    """Reescreve chunks_manifest.jsonl com os chunks de todos os arquivos do modo por tamanho"""
+    path = output_folder / MANIFEST_NAME
+    records = [record for name in sorted(build_manifest) for record in build_manifest[name].get('chunks', ())]
+    if not records:
+        if path.exists():
+            path.unlink()
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Divide documentos grandes em partes menores")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processos em paralelo (1 = sequencial; 0 = todos os núcleos)"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=0,
+        help="Tamanho alvo de cada chunk (ativa o modo por tamanho, com cortes entre frases)"
+    )
+    parser.add_argument(
+        "--unit",
+        choices=["chars", "tokens"],
+        default="chars",
+        help="Unidade de --chunk-size e --overlap"
+    )
+    parser.add_argument(
+        "--overlap",
+        type=int,
+        default=0,
+        help="Sobreposição entre chunks vizinhos, na mesma unidade"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Divide todos os arquivos de novo, mesmo os sem mudanças"
+    )
+    args = parser.parse_args()
+    if args.chunk_size and not 0 <= args.overlap < args.chunk_size:
+        parser.error("--overlap precisa ser menor que --chunk-size")
+    return args
 
 
 def main():
+    args = parse_args()
+    
     print("=" * 70)
     print("DIVISOR DE DOCUMENTOS GRANDES - IETA")
     print("=" * 70)
@@ -128,7 +779,19 @@ def main():
     
     total_files = len(pdf_files) + len(word_files)
     
+    # Manifesto de build: partes de arquivos que saíram da pasta são apagadas
+    # (também com --force: é ele que lista as partes antigas a apagar)
+    build_manifest = read_build_manifest(output_folder)
+    current_names = {source.name for source in pdf_files + word_files}
+    removed_parts = 0
+    for name in [name for name in build_manifest if name not in current_names]:
+        removed_parts += remove_outputs(output_folder, build_manifest.pop(name)['outputs'])
+    if removed_parts:
+        print(f"\n🗑️  {removed_parts} partes de arquivos removidos apagadas")
+    
     if total_files == 0:
+        write_build_manifest(build_manifest, output_folder)
+        write_chunks_manifest(build_manifest, output_folder)
         print("\n⚠️  Nenhum documento encontrado!")
         print(f"   Coloque PDFs ou Words na pasta: {input_folder.absolute()}")
         print("\n💡 Dica: Crie a pasta 'documentos_grandes' e adicione arquivos lá.")
@@ -138,31 +801,132 @@ def main():
     print(f"   - PDFs: {len(pdf_files)}")
     print(f"   - Words: {len(word_files)}")
     
-    if pdf_files:
-        print("\n" + "=" * 70)
-        print("PROCESSANDO PDFs")
-        print("=" * 70)
+    # Só entram arquivos novos, alterados, com outros parâmetros ou sem as partes
+    plan = {}  # arquivo -> (motivo, fingerprint, parâmetros)
+    for source in pdf_files + word_files:
+        params = chunk_params(source, args)
+        reason, fingerprint = build_status(source, build_manifest.get(source.name), params, output_folder)
+        if reason is None and args.force:
+            reason = "--force"
+        if reason is None:
+            # Só o mtime mudou (mesmo hash): o novo fingerprint poupa o hash na próxima execução
+            build_manifest[source.name]['fingerprint'] = fingerprint
+        else:
+            plan[source] = (reason, fingerprint, params)
+    skipped = total_files - len(plan)
+    pdf_files = [source for source in pdf_files if source in plan]
+    word_files = [source for source in word_files if source in plan]
+    
+    if skipped:
+        print(f"   ⏭️  {skipped} sem mudanças (pulados)")
+    for source, (reason, _, _) in plan.items():
+        print(f"   🔁 {source.name}: {reason}")
+    
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    run_start = time.perf_counter()
+    file_events = []
+    executor = None
+    pdf_jobs = {}
+    word_jobs = {}
+    
+    if workers > 1 and plan:
+        # Agenda tudo na ordem em que vai ser gravado: arquivos diferentes e
+        # faixas de páginas do mesmo PDF rodam ao mesmo tempo, mas só
+        # JOB_WINDOW_PER_WORKER tarefas por processo ficam adiantadas
+        executor = ProcessPoolExecutor(max_workers=workers)
+        jobs = JobWindow(executor, JOB_WINDOW_PER_WORKER * workers)
+        print(f"\n⚡ Modo paralelo: {workers} processos")
         
         for pdf_file in pdf_files:
-            chunk_pdf(pdf_file, output_folder, pages_per_chunk=15)
-    
-    if word_files:
-        print("\n" + "=" * 70)
-        print("PROCESSANDO WORDS")
-        print("=" * 70)
+            try:
+                pdf_jobs[pdf_file] = submit_pdf(jobs, pdf_file, pages_per_chunk=PAGES_PER_CHUNK)
+            except Exception:
+                pass  # chunk_pdf reporta o erro ao abrir o arquivo
         
         for word_file in word_files:
-            chunk_word(word_file, output_folder, paragraphs_per_chunk=100)
+            word_jobs[word_file] = jobs.add(read_word_paragraphs, word_file)
+    
+    if args.chunk_size:
+        size_fn = len if args.unit == "chars" else count_tokens
+        print(f"\n📏 Modo por tamanho: ~{args.chunk_size} {args.unit} por chunk, sobreposição {args.overlap}")
+    
+    def record(source, event, chunk_lines=None):
+        """Arquivo concluído: atualiza o manifesto e apaga as partes antigas que sobraram"""
+        file_events.append(event)
+        if not event['ok']:
+            return  # Fica a entrada anterior: o arquivo é tentado de novo na próxima execução
+        
+        _, fingerprint, params = plan[source]
+        previous = build_manifest.get(source.name)
+        if previous is not None:
+            remove_outputs(output_folder, set(previous['outputs']) - set(event['outputs']))
+        
+        entry = {'fingerprint': fingerprint, 'params': params, 'outputs': event['outputs']}
+        if chunk_lines is not None:
+            entry['chunks'] = [json.loads(line) for line in chunk_lines.getvalue().splitlines()]
+        build_manifest[source.name] = entry
+        write_build_manifest(build_manifest, output_folder)
+    
+    try:
+        if pdf_files:
+            print("\n" + "=" * 70)
+            print("PROCESSANDO PDFs")
+            print("=" * 70)
+            
+            for pdf_file in pdf_files:
+                if args.chunk_size:
+                    chunk_lines = io.StringIO()
+                    event = instrumented(chunk_pdf_by_size, pdf_file, output_folder, args.chunk_size, size_fn,
+                                         args.overlap, chunk_lines, page_ranges=pdf_jobs.get(pdf_file))
+                    record(pdf_file, event, chunk_lines)
+                else:
+                    event = instrumented(chunk_pdf, pdf_file, output_folder, pages_per_chunk=PAGES_PER_CHUNK,
+                                         page_ranges=pdf_jobs.get(pdf_file))
+                    record(pdf_file, event)
+        
+        if word_files:
+            print("\n" + "=" * 70)
+            print("PROCESSANDO WORDS")
+            print("=" * 70)
+            
+            for word_file in word_files:
+                if args.chunk_size:
+                    chunk_lines = io.StringIO()
+                    event = instrumented(chunk_word_by_size, word_file, output_folder, args.chunk_size, size_fn,
+                                         args.overlap, chunk_lines, paragraphs=word_jobs.get(word_file))
+                    record(word_file, event, chunk_lines)
+                else:
+                    event = instrumented(chunk_word, word_file, output_folder,
+                                         paragraphs_per_chunk=PARAGRAPHS_PER_CHUNK,
+                                         paragraphs=word_jobs.get(word_file))
+                    record(word_file, event)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        write_build_manifest(build_manifest, output_folder)
+        write_chunks_manifest(build_manifest, output_folder)
     
     output_files = list(output_folder.glob("*.txt"))
+    run_seconds = time.perf_counter() - run_start
+    failed = [event['file'] for event in file_events if not event['ok']]
+    log_event(
+        "chunk_run", seconds=round(run_seconds, 4), files=len(file_events), workers=workers,
+        chunk_size=args.chunk_size, unit=args.unit, skipped=skipped, failed=len(failed),
+        removed_parts=removed_parts,
+        bytes=sum(event['bytes'] for event in file_events), chars=sum(event['chars'] for event in file_events),
+    )
     
     print("\n" + "=" * 70)
     print("PROCESSAMENTO CONCLUÍDO!")
     print("=" * 70)
-    print(f"\n✅ {len(output_files)} arquivos criados em: {output_folder.absolute()}")
+    print(f"\n✅ {len(file_events) - len(failed)} documentos divididos, {skipped} pulados · "
+          f"{len(output_files)} arquivos em: {output_folder.absolute()}")
+    if failed:
+        print(f"❌ Com erro (tentados de novo na próxima execução): {', '.join(failed)}")
+    print(f"⏱️  Tempo total: {run_seconds:.1f}s (detalhes por arquivo em {LOG_PATH})")
     print("\n📋 Próximos passos:")
     print("   1. Revisar arquivos em 'documentos_chunked/'")
-    print("   2. Mover para 'documents/' para usar nas ferramentas")
+    print("   2. Copiar para 'documents/' para usar nas ferramentas")
     print("   3. Clicar em 'Recarregar Documentos' no app")
 
 
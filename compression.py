@@ -0,0 +1,131 @@
+"""
+compression.py - Compressão extrativa dos trechos pela consulta
+
+Mesmo os trechos escolhidos pelo BM25 trazem frases que não tratam dos
+tópicos pedidos: introduções, sumários, avisos legais. Aqui cada trecho é
+dividido em frases, e cada frase recebe uma nota que combina:
+
+- relevância: quantos termos da consulta ela contém
+- centralidade (estilo TextRank): o quanto ela se parece com as demais
+  frases do trecho, pela sobreposição de termos
+
+Ficam as frases de maior nota até KEEP_RATIO do tamanho do trecho, na ordem
+original, com "[...]" onde houve corte. O texto continua sendo do documento
+(nada é reescrito), então as citações continuam literais.
+"""
+
+import math
+import re
+
+from text_normalization import tokenize
+
+# Fração do trecho (em caracteres) mantida pela compressão
+KEEP_RATIO = 0.4
+
+# Peso da relevância à consulta na nota da frase (o resto é centralidade)
+QUERY_WEIGHT = 0.7
+
+# Trechos com até esse número de frases ficam inteiros
+MIN_SENTENCES = 3
+
+# Frases com menos termos que isso (números de página, títulos soltos) só
+# entram se tiverem termos da consulta
+MIN_SENTENCE_TERMS = 4
+
+SENTENCE_GAP = " [...] "
+
+# Fim de frase (pontuação seguida de espaço) ou parágrafo (linha em branco)
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+# Linhas de sumário: "1.2 Introdução ........ 7"
+TOC_LINE = re.compile(r"\.{4,}\s*\d+\s*$", re.MULTILINE)
+
+
+def sentence_spans(text):
+    """Frases do texto como [(inicio, fim)], sem os espaços das pontas"""
+    spans = []
+    start = 0
+    for match in SENTENCE_BREAK.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text)))
+
+    stripped = []
+    for start, end in spans:
+        piece = text[start:end]
+        if piece.strip():
+            lead = len(piece) - len(piece.lstrip())
+            stripped.append((start + lead, start + len(piece.rstrip())))
+    return stripped
+
+
+def score_sentences(sentences, query_terms):
+    """Nota de cada frase: relevância à consulta e centralidade, ambas normalizadas"""
+    terms = [set(tokenize(sentence)) for sentence in sentences]
+
+    relevance = [len(sentence_terms & query_terms) for sentence_terms in terms]
+
+    # Centralidade: soma da similaridade com as demais frases (a similaridade
+    # do TextRank original: termos em comum / log dos tamanhos)
+    centrality = []
+    for i, first in enumerate(terms):
+        total = 0.0
+        for j, second in enumerate(terms):
+            if i != j and len(first) > 1 and len(second) > 1:
+                total += len(first & second) / (math.log(len(first)) + math.log(len(second)))
+        centrality.append(total)
+
+    top_relevance = max(relevance) or 1
+    top_centrality = max(centrality) or 1.0
+    scores = []
+    for sentence, sentence_terms, rel, cent in zip(sentences, terms, relevance, centrality):
+        if TOC_LINE.search(sentence):
+            scores.append(0.0)
+            continue
+        if len(sentence_terms) < MIN_SENTENCE_TERMS:
+            cent = 0.0
+        scores.append(QUERY_WEIGHT * rel / top_relevance + (1 - QUERY_WEIGHT) * cent / top_centrality)
+    return scores
+
+
+def compress_passage(text, query_terms, keep_ratio=KEEP_RATIO):
+    """
+    Versão extrativa do trecho: as frases de maior nota, na ordem original.
+
+    query_terms: conjunto de termos da consulta (text_normalization.tokenize).
+    Retorna o texto comprimido; trechos curtos voltam inteiros (sem as
+    pontas em branco).
+    """
+    spans = sentence_spans(text)
+    if len(spans) <= MIN_SENTENCES:
+        return text.strip()
+
+    sentences = [text[start:end] for start, end in spans]
+    scores = score_sentences(sentences, query_terms)
+
+    target = keep_ratio * sum(len(sentence) for sentence in sentences)
+    kept = set()
+    kept_chars = 0
+    for i in sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True):
+        if kept_chars >= target or (scores[i] <= 0 and kept):
+            break
+        kept.add(i)
+        kept_chars += len(sentences[i])
+
+    pieces = []
+    previous = None
+    for i in sorted(kept):
+        if previous is not None and i == previous + 1:
+            pieces[-1] += " " + sentences[i]  # Frases vizinhas: texto contínuo
+        else:
+            pieces.append(sentences[i])
+        previous = i
+
+    # Cortes nas pontas já aparecem como o "[...]" entre trechos do contexto
+    return SENTENCE_GAP.join(pieces)
+
+
+def query_compressor(query, keep_ratio=KEEP_RATIO):
+    """Função texto -> texto comprimido para a consulta (o compress de retrieval.build_context)"""
+    query_terms = set(tokenize(query))
+    return lambda text: compress_passage(text, query_terms, keep_ratio)
@@ -0,0 +1,429 @@
+"""
+corpus_db.py - Corpus compilado num único arquivo SQLite (FTS5)
+
+Passo de build para deploy: extrai todos os documentos de 'documents/',
+divide em trechos, detecta duplicatas e grava tudo em 'corpus.sqlite':
+
+- files: nome, tamanho e hash de cada arquivo da pasta (conferência)
+- documents: texto completo de cada documento
+- passages: offsets de cada trecho, tokens, termos indexados (tamanho no
+  BM25) e representante de duplicatas
+- pages: offset de cada marcador "--- PÁGINA N ---" nas partes geradas pelo
+  chunk_documents.py (índice de páginas, ver logical_documents.py)
+- passages_fts: índice FTS5 dos termos normalizados de cada trecho
+  (text_normalization.tokenize, os mesmos do índice em memória). As
+  consultas leem dele, pelas tabelas fts5vocab, em quantos trechos cada
+  termo aparece e quantas vezes; o BM25 é o mesmo do índice em memória
+  (retrieval.bm25_term_score, k1 = 1.5), e não o bm25() do FTS5 (k1 = 1.2)
+- meta: versão do artefato, data do build, parâmetros
+
+No início do app, se o artefato corresponde à pasta (mesmos arquivos, com o
+mesmo tamanho), o corpus sai de uma leitura só desse arquivo, sem abrir
+PDF/DOCX nem montar o índice em memória. Do texto dos documentos só o
+tamanho é lido; o texto (ou só o trecho pedido) vem da tabela documents
+quando é usado (ver document_store.py). O conteúdo dos arquivos com mtime
+diferente do build (todos, num checkout novo) é conferido pelo hash depois,
+com o app já respondendo (artifact_mismatches, chamado pelo CorpusLoader).
+
+Uso:
+    python corpus_db.py                       # documents/ -> corpus.sqlite
+    python corpus_db.py --docs pasta --output outro.sqlite
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from corpus_store import format_bytes, freeze_corpus
+from diagnostics import log_event
+from document_loader import file_sha256, load_corpus, scan_folder
+from document_store import StoredDocument
+from logical_documents import LogicalDocuments
+from retrieval import PASSAGE_CHARS, PassageIndex, RankedPassages, bm25_idf, bm25_term_score
+from text_normalization import tokenize
+
+DOCS_FOLDER = Path("documents")
+CORPUS_DB = Path("corpus.sqlite")
+
+# Incrementar quando o formato das tabelas mudar (artefatos antigos são ignorados)
+SCHEMA_VERSION = 4
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE files (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE documents (
+    position INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE REFERENCES files(name),
+    content TEXT NOT NULL
+);
+CREATE TABLE errors (name TEXT PRIMARY KEY);
+CREATE TABLE passages (
+    id INTEGER PRIMARY KEY,
+    document INTEGER NOT NULL REFERENCES documents(position),
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    tokens INTEGER NOT NULL,
+    terms INTEGER NOT NULL,
+    representative INTEGER NOT NULL
+);
+CREATE TABLE pages (
+    document INTEGER NOT NULL REFERENCES documents(position),
+    page INTEGER NOT NULL,
+    start INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE passages_fts USING fts5(
+    text, content='', tokenize='unicode61 remove_diacritics 0 tokenchars ''_'''
+);
+"""
+
+
+def content_version(hashes):
+    """Versão do artefato pelo conteúdo dos arquivos (não muda com o mtime de um novo deploy)"""
+    payload = json.dumps(sorted(hashes.items()), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]
+
+
+# ==============================================================================
+# BUILD
+# ==============================================================================
+
+def build_artifact(docs_folder=DOCS_FOLDER, db_path=CORPUS_DB, workers=None):
+    """Compila a pasta de documentos no artefato SQLite; retorna os metadados gravados"""
+    start = time.perf_counter()
+    corpus = load_corpus(docs_folder, workers=workers)
+    documents = corpus['documents']
+    index = PassageIndex(documents)
+
+    snapshot = corpus['snapshot']
+    hashes = {name: file_sha256(docs_folder / name) for name in snapshot}
+    meta = {
+        'schema': str(SCHEMA_VERSION),
+        'version': content_version(hashes),
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+        'passage_chars': str(PASSAGE_CHARS),
+        'documents': str(len(documents)),
+        'passages': str(len(index.passages)),
+    }
+
+    # Gravado num temporário e renomeado no fim: o app nunca abre um artefato pela metade
+    tmp_path = db_path.with_name(f".{db_path.name}.{os.getpid()}.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+        conn.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?)",
+            ((name, size, mtime_ns, hashes[name]) for name, (size, mtime_ns) in snapshot.items()),
+        )
+        conn.executemany(
+            "INSERT INTO documents VALUES (?, ?, ?)",
+            ((position, name, doc['full_content']) for position, (name, doc) in enumerate(documents.items())),
+        )
+        conn.executemany(
+            "INSERT INTO errors VALUES (?)", ((name,) for name in [*corpus['errors'], *corpus['quarantine']])
+        )
+
+        positions = {name: position for position, name in enumerate(documents)}
+        conn.executemany(
+            "INSERT INTO passages VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (passage_id, positions[name], start, end, index.passage_tokens[passage_id],
+                 index.passage_terms(passage_id), index.representative[passage_id])
+                for passage_id, (name, start, end) in enumerate(index.passages)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO pages VALUES (?, ?, ?)",
+            (
+                (positions[name], page, start)
+                for name, (pages, offsets) in index.logical.markers.items()
+                for page, start in zip(pages, offsets)
+            ),
+        )
+        # O FTS5 recebe os termos já normalizados (radicais, conceitos), não o texto
+        conn.executemany(
+            "INSERT INTO passages_fts (rowid, text) VALUES (?, ?)",
+            (
+                (passage_id, " ".join(tokenize(documents[name].text(start, end))))
+                for passage_id, (name, start, end) in enumerate(index.passages)
+            ),
+        )
+        conn.execute("INSERT INTO passages_fts (passages_fts) VALUES ('optimize')")
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    log_event("artifact_build", seconds=round(time.perf_counter() - start, 4), path=str(db_path), **meta)
+    return meta
+
+
+# ==============================================================================
+# LEITURA
+# ==============================================================================
+
+def _connect(db_path):
+    """Conexão somente leitura, compartilhável entre as threads das sessões"""
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+
+
+def _matches_folder(rows, snapshot):
+    """O artefato corresponde à pasta? Mesmos arquivos, com o mesmo tamanho (o hash fica para depois)"""
+    built = {name: size for name, size, _, _ in rows}
+    return built == {name: size for name, (size, _) in snapshot.items()}
+
+
+def artifact_mismatches(db_path=CORPUS_DB, docs_folder=DOCS_FOLDER):
+    """
+    Arquivos da pasta cujo conteúdo não é o do artefato.
+
+    Só os arquivos com mtime diferente do build são lidos e conferidos pelo
+    hash (um checkout novo muda o mtime sem mudar o conteúdo). Roda depois
+    de open_artifact_corpus, fora do caminho da primeira resposta do app.
+    Arquivos a mais ou a menos também contam; um artefato ilegível devolve
+    todos os arquivos da pasta.
+    """
+    snapshot = scan_folder(docs_folder)
+    try:
+        conn = _connect(db_path)
+        try:
+            rows = conn.execute("SELECT name, size, mtime_ns, sha256 FROM files").fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return sorted(snapshot)
+
+    built = {name: (size, mtime_ns, sha256) for name, size, mtime_ns, sha256 in rows}
+    mismatches = set(built).symmetric_difference(snapshot)
+    for name, (size, mtime_ns, sha256) in built.items():
+        if name not in snapshot:
+            continue
+        if snapshot[name][0] != size:
+            mismatches.add(name)
+        elif snapshot[name][1] != mtime_ns:
+            try:
+                if file_sha256(docs_folder / name) != sha256:
+                    mismatches.add(name)
+            except OSError:
+                mismatches.add(name)  # Saiu da pasta no meio da conferência
+    return sorted(mismatches)
+
+
+def open_artifact_corpus(db_path=CORPUS_DB, docs_folder=DOCS_FOLDER):
+    """
+    Corpus lido do artefato, ou None se ele não existe ou não corresponde à pasta.
+
+    A conferência aqui é só de nomes e tamanhos, para a primeira carga não
+    ler todos os arquivos; o conteúdo é conferido depois com
+    artifact_mismatches.
+    A versão do corpus é a do artefato; assim open_artifact_index() reconhece
+    que o índice do artefato vale para ele. Os documentos guardam só o
+    tamanho: o texto é lido do artefato quando usado, pela mesma conexão
+    (um build novo no lugar do arquivo não muda o que este corpus lê).
+    """
+    if not db_path.exists():
+        return None
+
+    start = time.perf_counter()
+    try:
+        conn = _connect(db_path)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            if meta.get('schema') != str(SCHEMA_VERSION):
+                conn.close()
+                return None
+
+            snapshot = scan_folder(docs_folder)
+            rows = conn.execute("SELECT name, size, mtime_ns, sha256 FROM files").fetchall()
+            if not _matches_folder(rows, snapshot):
+                conn.close()
+                return None
+
+            texts = ArtifactTexts(conn, db_path, meta['version'])
+            documents = {
+                name: StoredDocument(char_count, texts.source(name))
+                for name, char_count in conn.execute(
+                    "SELECT name, length(content) FROM documents ORDER BY position"
+                )
+            }
+            errors = [name for (name,) in conn.execute("SELECT name FROM errors")]
+        except Exception:
+            conn.close()
+            raise
+    except sqlite3.Error:
+        return None
+
+    seconds = time.perf_counter() - start
+    stats = {
+        name: {'source': 'artefato', 'seconds': None, 'bytes': snapshot[name][0], 'chars': doc['char_count']}
+        for name, doc in documents.items()
+    }
+    log_event("artifact_open", seconds=round(seconds, 4), path=str(db_path), version=meta['version'],
+              documents=len(documents))
+    return freeze_corpus({
+        'snapshot': snapshot,
+        'documents': documents,
+        'errors': errors,
+        'quarantine': {},
+        'stats': stats,
+        'version': meta['version'],
+    })
+
+
+class ArtifactTexts:
+    """Textos da tabela documents de um artefato aberto, lidos sob demanda"""
+
+    def __init__(self, conn, db_path, version):
+        self._conn = conn
+        self._lock = threading.Lock()
+        self.db_path = db_path
+        self.version = version
+
+    def source(self, name):
+        return ArtifactText(self, name)
+
+    def query(self, sql, params):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+
+class ArtifactText:
+    """Origem do texto de um documento do artefato: inteiro ou uma faixa (substr)"""
+
+    def __init__(self, texts, name):
+        self._texts = texts
+        self._name = name
+        self.key = ('artefato', str(texts.db_path), texts.version, name)
+
+    def read(self):
+        return self._texts.query("SELECT content FROM documents WHERE name = ?", (self._name,))
+
+    def read_range(self, start, end):
+        # substr conta caracteres a partir de 1, como o len() do Python conta
+        return self._texts.query(
+            "SELECT substr(content, ?, ?) FROM documents WHERE name = ?", (start + 1, end - start, self._name)
+        )
+
+
+def open_artifact_index(db_path=CORPUS_DB, corpus_version=None):
+    """ArtifactIndex do artefato se ele for da versão pedida; senão None"""
+    if not db_path.exists():
+        return None
+    try:
+        conn = _connect(db_path)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            if meta.get('schema') != str(SCHEMA_VERSION) or meta.get('version') != corpus_version:
+                conn.close()
+                return None
+            return ArtifactIndex(conn)
+        except Exception:
+            conn.close()
+            raise
+    except sqlite3.Error:
+        return None
+
+
+class ArtifactIndex(RankedPassages):
+    """
+    Índice de trechos servido pelo artefato.
+
+    Mesma interface do PassageIndex (ver retrieval.RankedPassages), com os
+    offsets das tabelas passages e pages. Na consulta, o FTS5 só entrega as
+    ocorrências de cada termo (tabelas fts5vocab: trechos com o termo e
+    frequência em cada um); o BM25 é calculado com as mesmas fórmulas e
+    parâmetros do índice em memória, então os dois ordenam igual.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._lock = threading.Lock()
+
+        names = dict(conn.execute("SELECT position, name FROM documents ORDER BY position"))
+        markers = {}
+        for document, page, start in conn.execute("SELECT document, page, start FROM pages"):
+            markers.setdefault(names[document], []).append((page, start))
+
+        passages = []
+        passage_tokens = []
+        representative = []
+        self._lengths = []
+        for document, start, end, tokens, terms, group in conn.execute(
+            "SELECT document, start, end, tokens, terms, representative FROM passages ORDER BY id"
+        ):
+            passages.append((names[document], start, end))
+            passage_tokens.append(tokens)
+            self._lengths.append(terms)
+            representative.append(group)
+        self._avg_length = (sum(self._lengths) / len(passages)) if passages else 0.0
+
+        # Vocabulário do FTS5 (tabelas temporárias: o artefato continua só de leitura)
+        conn.execute("CREATE VIRTUAL TABLE temp.fts_terms USING fts5vocab(main, passages_fts, row)")
+        conn.execute("CREATE VIRTUAL TABLE temp.fts_instances USING fts5vocab(main, passages_fts, instance)")
+
+        super().__init__(passages, passage_tokens, representative, LogicalDocuments(names.values(), markers))
+
+    def _scores(self, query):
+        scores = {}
+        total = len(self.passages)
+        avg_length = self._avg_length or 1.0
+
+        with self._lock:
+            for term in set(tokenize(query)):
+                row = self._conn.execute("SELECT doc FROM fts_terms WHERE term = ?", (term,)).fetchone()
+                if row is None:
+                    continue
+                idf = bm25_idf(total, row[0])
+                for passage_id, freq in self._conn.execute(
+                    "SELECT doc, count(*) FROM fts_instances WHERE term = ? GROUP BY doc", (term,)
+                ):
+                    score = bm25_term_score(idf, freq, self._lengths[passage_id], avg_length)
+                    scores[passage_id] = scores.get(passage_id, 0.0) + score
+        return scores
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compila os documentos num artefato SQLite (FTS5)")
+    parser.add_argument("--docs", type=Path, default=DOCS_FOLDER, help="Pasta dos documentos")
+    parser.add_argument("--output", type=Path, default=CORPUS_DB, help="Arquivo do artefato")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Processos na extração (1 = sequencial; 0 = todos os núcleos)"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 70)
+    print("COMPILAÇÃO DO CORPUS - IETA")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    meta = build_artifact(args.docs, args.output, workers=args.workers or None)
+
+    print(f"\n✅ {meta['documents']} documentos, {meta['passages']} trechos")
+    print(f"   Versão {meta['version']} · {format_bytes(args.output.stat().st_size)} · "
+          f"{time.perf_counter() - start:.1f}s")
+    print(f"   Artefato: {args.output.absolute()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+corpus_loader.py - Carga do corpus em segundo plano
+
+A extração de uma pasta grande leva minutos; com ela no fluxo do script o
+app inteiro ficava parado antes de desenhar os formulários. Aqui a carga (e
+o índice de trechos) roda numa thread do processo: as sessões leem o último
+corpus pronto e o progresso da carga em andamento sem esperar por ela.
+
+Um corpus e o índice dele são trocados juntos, de uma vez: enquanto um
+"Recarregar Documentos" roda, as sessões seguem usando a versão anterior.
+
+Na primeira carga, o artefato compilado (corpus_db.py) é aceito se tem os
+mesmos arquivos, com o mesmo tamanho, e já passa a responder; o conteúdo é
+conferido pelo hash em seguida, na mesma thread, e se algum arquivo mudou o
+corpus é recarregado da pasta.
+"""
+
+import threading
+import time
+import traceback
+
+from corpus_db import artifact_mismatches, open_artifact_corpus, open_artifact_index
+from diagnostics import log_event
+from document_loader import empty_corpus, refresh_corpus
+from document_store import TEXT_CACHE
+from retrieval import PassageIndex
+
+
+class CorpusLoader:
+    """Corpus e índice compartilhados, carregados e recarregados numa thread"""
+
+    def __init__(self, docs_folder, db_path):
+        self.docs_folder = docs_folder
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ready = None      # (corpus, índice) da última carga concluída
+        self._partial = {}      # nome -> (caracteres, KB) dos documentos já prontos nesta carga
+        self._progress = None   # (feitos, total, nome) da extração em andamento
+        self._changes = None    # mudanças da última carga concluída
+        self._error = None      # erro da última carga, se ela falhou
+        self._seconds = {}      # tempo de cada fase da última carga
+
+    def start(self):
+        """Inicia uma carga (ou recarga incremental); False se já há uma em andamento"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._partial = {}
+            self._progress = None
+            self._error = None
+            self._thread = threading.Thread(target=self._run, name="corpus-loader", daemon=True)
+            self._thread.start()
+            return True
+
+    def state(self):
+        """
+        Fotografia do estado para um rerun.
+
+        {'corpus', 'index', 'loading', 'partial', 'progress', 'changes',
+        'error', 'seconds'}: corpus e index são None até a primeira carga
+        terminar; partial é {nome: (caracteres, KB)} da carga em andamento.
+        """
+        with self._lock:
+            corpus, index = self._ready or (None, None)
+            return {
+                'corpus': corpus,
+                'index': index,
+                'loading': self._thread is not None and self._thread.is_alive(),
+                'partial': dict(self._partial),
+                'progress': self._progress,
+                'changes': self._changes,
+                'error': self._error,
+                'seconds': dict(self._seconds),
+            }
+
+    def _on_progress(self, done, total, name):
+        with self._lock:
+            self._progress = (done, total, name)
+
+    def _on_document(self, name, entry):
+        with self._lock:
+            self._partial[name] = (entry['char_count'], entry['size_kb'])
+
+    def _run(self):
+        with self._lock:
+            current = self._ready[0] if self._ready else None
+
+        # Primeira carga do processo: do artefato compilado (corpus.sqlite), se
+        # estiver em dia com a pasta; senão extração (cache + processos isolados)
+        if self._load(current, use_artifact=current is None) != 'artefato':
+            return
+
+        # O artefato foi aceito por nomes e tamanhos; o conteúdo é conferido
+        # agora, com as sessões já usando o corpus dele
+        start = time.perf_counter()
+        mismatches = artifact_mismatches(self.db_path, self.docs_folder)
+        log_event("artifact_verify", seconds=round(time.perf_counter() - start, 4), mismatches=mismatches)
+        if mismatches:
+            self._load(None, use_artifact=False)
+
+    def _load(self, current, use_artifact):
+        """Uma carga completa; retorna 'artefato' ou 'pasta' (de onde veio o corpus), ou None se falhou"""
+        start = time.perf_counter()
+        try:
+            changes = None
+            corpus = open_artifact_corpus(self.db_path, self.docs_folder) if use_artifact else None
+            source = 'artefato' if corpus is not None else 'pasta'
+            if corpus is None:
+                corpus, changes = refresh_corpus(
+                    current or empty_corpus(), self.docs_folder,
+                    progress=self._on_progress, on_document=self._on_document,
+                )
+            corpus_seconds = time.perf_counter() - start
+
+            if current is not None and corpus is current:
+                index = self._ready[1]  # Nada mudou: o índice continua valendo
+            else:
+                # Se o corpus veio do artefato, as consultas vão para o FTS5 dele
+                index = open_artifact_index(self.db_path, corpus['version']) or PassageIndex(corpus['documents'])
+            index_seconds = time.perf_counter() - start - corpus_seconds
+        except Exception as e:
+            log_event("corpus_load_error", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+            with self._lock:
+                self._error = f"{type(e).__name__}: {e}"
+            return None
+
+        with self._lock:
+            self._ready = (corpus, index)
+            self._changes = changes
+            self._seconds = {'corpus': corpus_seconds, 'índice': index_seconds}
+        log_event(
+            "corpus_load", seconds=round(time.perf_counter() - start, 4),
+            corpus_seconds=round(corpus_seconds, 4), index_seconds=round(index_seconds, 4),
+            documents=len(corpus['documents']), version=corpus['version'], text_cache=TEXT_CACHE.stats(),
+            source=source,
+        )
+        return source
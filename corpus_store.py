@@ -0,0 +1,62 @@
+"""
+corpus_store.py - Corpus imutável compartilhado entre sessões
+
+O corpus fica numa única cópia por processo (st.cache_resource) e é entregue
+a todas as sessões por referência. Para isso ser seguro ele é congelado:
+dicionários viram MappingProxyType (somente leitura) e listas viram tuplas;
+os documentos (StoredDocument, ver document_store.py) já são mapeamentos
+somente leitura.
+Um "Recarregar Documentos" cria um corpus novo em vez de alterar o atual.
+
+Também traz medidas simples de memória para o painel da sidebar.
+"""
+
+import sys
+from types import MappingProxyType
+
+from document_store import StoredDocument
+
+
+def freeze_corpus(corpus):
+    """Versão somente leitura do corpus {'snapshot', 'documents', 'errors', 'quarantine', 'stats', 'version'}"""
+    documents = {
+        name: doc if isinstance(doc, (MappingProxyType, StoredDocument)) else MappingProxyType(dict(doc))
+        for name, doc in corpus['documents'].items()
+    }
+    return MappingProxyType({
+        'snapshot': MappingProxyType({name: tuple(stat) for name, stat in corpus['snapshot'].items()}),
+        'documents': MappingProxyType(documents),
+        'errors': tuple(corpus['errors']),
+        'quarantine': MappingProxyType(dict(corpus['quarantine'])),
+        'stats': MappingProxyType({name: MappingProxyType(dict(entry)) for name, entry in corpus['stats'].items()}),
+        'version': corpus['version'],
+    })
+
+
+def deep_sizeof(obj, seen=None):
+    """Tamanho aproximado em bytes de um objeto e de tudo que ele referencia"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+
+    if isinstance(obj, (dict, MappingProxyType)):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def format_bytes(num_bytes):
+    for unit in ("B", "KB", "MB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
@@ -0,0 +1,100 @@
+"""
+dedup.py - Detecção de trechos quase duplicados no corpus
+
+Relatórios de anos seguidos, briefs parecidos e partes do mesmo documento
+repetem parágrafos inteiros. Para cada trecho é calculada uma assinatura
+MinHash (variante bottom-k: os K menores hashes dos shingles de 5 palavras);
+trechos que compartilham valores da assinatura viram candidatos (estilo
+LSH), e só os pares com similaridade de Jaccard estimada acima do limite
+são agrupados. Cada grupo tem um representante, o único que entra no prompt.
+"""
+
+import re
+import zlib
+from collections import defaultdict
+from heapq import nsmallest
+
+SHINGLE_WORDS = 5
+SKETCH_SIZE = 64
+
+# Similaridade de Jaccard mínima para considerar dois trechos duplicados
+# (os cortes dos trechos não coincidem entre documentos, então um mesmo
+# parágrafo repetido raramente passa de ~0.8)
+SIMILARITY_THRESHOLD = 0.6
+
+# Valores em comum na assinatura para virar candidato
+MIN_SHARED_VALUES = 6
+
+# Valores presentes em muitos trechos (texto padrão curto) não geram candidatos
+MAX_BUCKET_SIZE = 50
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def minhash_sketch(text):
+    """Os SKETCH_SIZE menores hashes dos shingles de palavras do texto"""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return ()
+    shingles = {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode('utf-8'))
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+    return tuple(nsmallest(SKETCH_SIZE, shingles))
+
+
+def estimate_similarity(sketch_a, sketch_b):
+    """Jaccard estimado: fração dos K menores hashes da união presentes nas duas assinaturas"""
+    set_a, set_b = set(sketch_a), set(sketch_b)
+    union = nsmallest(SKETCH_SIZE, set_a | set_b)
+    if not union:
+        return 0.0
+    return sum(1 for value in union if value in set_a and value in set_b) / len(union)
+
+
+def find_duplicates(sketches, lengths):
+    """
+    Agrupa trechos quase duplicados.
+
+    sketches: assinatura de cada trecho (minhash_sketch)
+    lengths: tamanho de cada trecho; o maior de cada grupo é o representante
+
+    Retorna a lista representante[id_do_trecho] (o próprio id quando o
+    trecho não tem duplicata).
+    """
+    buckets = defaultdict(list)
+    for passage_id, sketch in enumerate(sketches):
+        for value in sketch:
+            buckets[value].append(passage_id)
+
+    shared = defaultdict(int)
+    for members in buckets.values():
+        if len(members) > MAX_BUCKET_SIZE:
+            continue
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                shared[first, second] += 1
+
+    parent = list(range(len(sketches)))
+
+    def find(passage_id):
+        while parent[passage_id] != passage_id:
+            parent[passage_id] = parent[parent[passage_id]]
+            passage_id = parent[passage_id]
+        return passage_id
+
+    for (first, second), count in shared.items():
+        if count < MIN_SHARED_VALUES:
+            continue
+        if estimate_similarity(sketches[first], sketches[second]) >= SIMILARITY_THRESHOLD:
+            parent[find(first)] = find(second)
+
+    # Representante: o trecho mais longo do grupo (em empate, o primeiro)
+    best = {}
+    for passage_id in range(len(sketches)):
+        root = find(passage_id)
+        current = best.get(root)
+        if current is None or lengths[passage_id] > lengths[current]:
+            best[root] = passage_id
+
+    return [best[find(passage_id)] for passage_id in range(len(sketches))]
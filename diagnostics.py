@@ -0,0 +1,74 @@
+"""
+diagnostics.py - Medição de tempo por etapa e log estruturado
+
+Cada evento (documento extraído, carga do corpus, briefing gerado, arquivo
+dividido pelo chunk_documents.py) vira uma linha JSON em
+'.cache/diagnostics.jsonl' (ou no caminho da variável IETA_DIAGNOSTICS_LOG),
+com data/hora, processo e os números da etapa. Assim uma lentidão em
+produção pode ser rastreada até um arquivo ou uma etapa específica:
+
+    python -c "import json; [print(l) for l in open('.cache/diagnostics.jsonl') if json.loads(l).get('seconds', 0) > 2]"
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+
+LOG_PATH = Path(os.environ.get("IETA_DIAGNOSTICS_LOG", Path(".cache") / "diagnostics.jsonl"))
+
+_log_lock = threading.Lock()
+
+
+def log_event(event, **fields):
+    """Grava um evento no log JSON-lines; falhas de escrita são ignoradas"""
+    record = {
+        'ts': datetime.now().isoformat(timespec='milliseconds'),
+        'event': event,
+        'pid': os.getpid(),
+        **fields,
+    }
+    try:
+        LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with _log_lock, open(LOG_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    except OSError:
+        pass  # Sem permissão de escrita: o app segue sem log
+    return record
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo em MB (None onde não há 'resource')"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return round(peak / (1024 * 1024 if os.uname().sysname == "Darwin" else 1024), 1)
+
+
+class StageTimer:
+    """Acumula o tempo de cada etapa nomeada, na ordem em que aparecem"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def as_ms(self):
+        return {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()}
+
+
+def stage(timer, name):
+    """timer.stage(name), ou um contexto vazio quando não há timer"""
+    return timer.stage(name) if timer is not None else nullcontext()
@@ -0,0 +1,626 @@
+"""
+document_loader.py - Extração de texto dos documentos com cache persistente
+
+O texto extraído de cada PDF/DOCX/TXT é salvo em '.cache/extracao/', indexado
+pelo caminho, tamanho, data de modificação e hash do conteúdo do arquivo.
+Arquivos que não mudaram são servidos direto do cache, sem passar de novo
+pelo PyPDF2/python-docx (reinício do container, "Recarregar Documentos", etc).
+
+Estrutura do cache:
+- index.json: caminho -> {size, mtime_ns, sha256} (atalho sem reler o arquivo)
+- <sha256>.txt: texto extraído
+- <sha256>.json: metadados da extração
+- quarantine.json: arquivos cuja extração travou ou estourou a memória; são
+  ignorados até o conteúdo mudar (ou até apagar este arquivo)
+
+O corpus guarda de cada documento só os metadados; o texto é lido sob
+demanda da entrada do cache, com os mais usados num LRU de tamanho limitado
+(ver document_store.py).
+
+Para cada documento o corpus guarda também o tempo de extração (ou de
+leitura do cache), os bytes lidos e os caracteres extraídos, que vão para o
+log de diagnóstico (ver diagnostics.py).
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import queue
+import struct
+import subprocess
+import sys
+import threading
+import time
+from functools import partial
+from pathlib import Path
+
+from PyPDF2 import PdfReader
+
+from corpus_store import freeze_corpus
+from diagnostics import log_event
+from docx_stream import extract_docx
+from document_store import FileText, stored_document
+
+CACHE_DIR = Path(".cache") / "extracao"
+
+# Incrementar sempre que a forma de extrair texto mudar (invalida o cache)
+EXTRACTOR_VERSION = 3
+
+SUPPORTED_SUFFIXES = ('.pdf', '.docx', '.txt')
+
+# Limites por arquivo na extração de PDF/DOCX (ver extract_many)
+EXTRACT_TIMEOUT = float(os.environ.get("IETA_EXTRACT_TIMEOUT", "120"))
+EXTRACT_MEMORY_MB = int(os.environ.get("IETA_EXTRACT_MEMORY_MB", "1536"))
+
+
+def extract_text(file_path):
+    """Extrai o texto de um PDF, DOCX ou TXT (sem cache)"""
+    suffix = file_path.suffix.lower()
+    content = ""
+
+    if suffix == '.pdf':
+        reader = PdfReader(file_path)
+        content = "".join(page.extract_text() for page in reader.pages)
+
+    elif suffix == '.docx':
+        # Em fluxo, com tabelas e caixas de texto (ver docx_stream.py)
+        content = extract_docx(file_path)
+
+    elif suffix == '.txt':
+        content = file_path.read_text(encoding='utf-8')
+
+    return content
+
+
+def file_sha256(file_path, block_size=1024 * 1024):
+    """Hash SHA-256 do conteúdo do arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    """Grava o arquivo via arquivo temporário + rename (nunca fica pela metade)"""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(text, encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def read_cache_index(cache_dir=CACHE_DIR):
+    """Lê o índice caminho -> fingerprint; índice corrompido é descartado"""
+    index_file = cache_dir / "index.json"
+    try:
+        return json.loads(index_file.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_cache_index(index, cache_dir=CACHE_DIR):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    _write_atomic(cache_dir / "index.json", json.dumps(index, ensure_ascii=False, indent=1))
+
+
+def read_quarantine(cache_dir=CACHE_DIR):
+    """Lê a quarentena caminho -> {'sha256', 'reason'}; arquivo corrompido é descartado"""
+    try:
+        return json.loads((cache_dir / "quarantine.json").read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_quarantine(quarantine, cache_dir=CACHE_DIR):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    _write_atomic(cache_dir / "quarantine.json", json.dumps(quarantine, ensure_ascii=False, indent=1))
+
+
+def _read_entry(sha256, cache_dir):
+    """Retorna o texto em cache para o hash, ou None se não houver entrada válida"""
+    meta_file = cache_dir / f"{sha256}.json"
+    text_file = cache_dir / f"{sha256}.txt"
+    try:
+        meta = json.loads(meta_file.read_text(encoding='utf-8'))
+        if meta.get('extractor_version') != EXTRACTOR_VERSION:
+            return None
+        return text_file.read_text(encoding='utf-8')
+    except (OSError, ValueError):
+        return None
+
+
+def _write_entry(sha256, file_path, content, cache_dir):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Texto primeiro: a entrada só vale quando os metadados existem
+    _write_atomic(cache_dir / f"{sha256}.txt", content)
+    meta = {
+        'extractor_version': EXTRACTOR_VERSION,
+        'source': file_path.name,
+        'suffix': file_path.suffix.lower(),
+        'char_count': len(content),
+    }
+    _write_atomic(cache_dir / f"{sha256}.json", json.dumps(meta, ensure_ascii=False))
+
+
+def lookup_cache(file_path, index, cache_dir=CACHE_DIR):
+    """
+    Procura o texto do arquivo no cache em disco.
+
+    Se caminho, tamanho e mtime batem com o índice, o hash guardado é usado
+    sem reler o arquivo. Caso contrário o conteúdo é rehashado: um arquivo só
+    "tocado" (mesmo conteúdo) continua vindo do cache.
+
+    Retorna (fingerprint, texto), com texto None quando não há entrada.
+    """
+    stat = file_path.stat()
+    known = index.get(str(file_path.resolve()))
+
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        sha256 = known['sha256']
+    else:
+        sha256 = file_sha256(file_path)
+
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    return fingerprint, _read_entry(sha256, cache_dir)
+
+
+def store_extraction(file_path, fingerprint, content, index, cache_dir=CACHE_DIR):
+    """
+    Salva o texto extraído no cache e registra o fingerprint no índice.
+
+    O índice é atualizado em memória; quem chama deve persistir com
+    write_cache_index(). Retorna False se o texto não pôde ser gravado.
+    """
+    index[str(file_path.resolve())] = fingerprint
+    try:
+        _write_entry(fingerprint['sha256'], file_path, content, cache_dir)
+    except OSError:
+        return False  # Cache indisponível não pode impedir o carregamento
+    return True
+
+
+def cached_text(file_path, sha256, cache_dir=CACHE_DIR):
+    """Origem do texto de um documento: a entrada do cache (reextraído se ela sumir)"""
+    return FileText(cache_dir / f"{sha256}.txt", fallback=partial(extract_text, file_path))
+
+
+class ExtractionAborted(Exception):
+    """Extração interrompida pelo supervisor: tempo esgotado, memória ou queda do processo"""
+
+
+# O processo de extração é um Python novo (subprocess), e não um
+# multiprocessing com spawn: o Streamlit roda o app como __main__, e o spawn
+# reimportaria o script inteiro em cada processo filho
+WORKER_COMMAND = "import sys; from document_loader import _worker_main; _worker_main(int(sys.argv[1]))"
+
+
+def _send_frame(stream, message):
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(struct.pack("<Q", len(data)))
+    stream.write(data)
+    stream.flush()
+
+
+def _read_frame(stream):
+    header = stream.read(8)
+    if len(header) < 8:
+        raise EOFError
+    size, = struct.unpack("<Q", header)
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError
+    return pickle.loads(data)
+
+
+def _limit_memory(memory_mb):
+    """Limita o espaço de endereçamento do processo (sem efeito onde não há 'resource')"""
+    try:
+        import resource
+    except ImportError:
+        return
+    limit = memory_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        pass  # Limite acima do permitido pelo sistema: segue sem teto
+
+
+def _worker_main(memory_mb):
+    """Processo de extração: lê caminhos da entrada padrão e responde (estado, texto, segundos)"""
+    requests = sys.stdin.buffer
+    replies = os.fdopen(os.dup(1), 'wb')
+    # Prints de bibliotecas vão para o stderr e não corrompem o canal de respostas
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    _limit_memory(memory_mb)
+    _send_frame(replies, ('ready', None, 0.0))
+    while True:
+        try:
+            path = _read_frame(requests)
+        except EOFError:
+            break
+        if path is None:
+            break
+
+        start = time.perf_counter()
+        # A resposta sai fora do except: lá o traceback ainda segura a memória
+        # que estourou o limite, e nem a mensagem de erro caberia
+        try:
+            status, payload = 'ok', extract_text(Path(path))
+        except MemoryError:
+            status, payload = 'memory', None
+        except Exception as e:
+            status, payload = 'error', f"{type(e).__name__}: {e}"
+        _send_frame(replies, (status, payload, time.perf_counter() - start))
+        payload = None
+
+
+class _Worker:
+    """Processo de extração com uma thread que repassa as respostas para a fila"""
+
+    def __init__(self, memory_mb, replies):
+        env = dict(os.environ)
+        module_dir = str(Path(__file__).resolve().parent)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [module_dir, env.get('PYTHONPATH')]))
+        self.started = False
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", WORKER_COMMAND, str(memory_mb)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env,
+        )
+        threading.Thread(target=self._pump, args=(replies,), daemon=True).start()
+
+    def _pump(self, replies):
+        try:
+            while True:
+                replies.put((self, _read_frame(self.process.stdout)))
+        except (EOFError, OSError, pickle.UnpicklingError):
+            replies.put((self, None))  # Processo terminou
+
+    def send(self, path):
+        _send_frame(self.process.stdin, path)
+
+    def stop(self, kill=False):
+        if not kill:
+            try:
+                self.send(None)
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+def _take_idle(idle):
+    """Um processo ocioso ainda vivo (os que morreram são encerrados), ou None"""
+    while idle:
+        worker = idle.pop()
+        if worker.process.poll() is None:
+            return worker
+        worker.stop(kill=True)
+    return None
+
+
+def _extract_safely(file_path):
+    start = time.perf_counter()
+    try:
+        return extract_text(file_path), None, time.perf_counter() - start
+    except Exception as e:
+        return None, e, time.perf_counter() - start
+
+
+def extract_many(file_paths, workers=None, progress=None, timeout=None, memory_mb=None):
+    """
+    Extrai vários arquivos, com PDFs e DOCX em processos isolados.
+
+    A extração do PyPDF2 é Python puro e presa à CPU, então processos (e não
+    threads) usam todos os núcleos. Cada processo tem o espaço de memória
+    limitado a memory_mb, e cada arquivo tem até timeout segundos: um PDF
+    que trava ou estoura a memória tem o processo encerrado (e substituído)
+    e volta com erro ExtractionAborted, sem afetar os demais. TXT é só
+    leitura de disco e fica no processo atual. Os arquivos maiores são
+    enviados primeiro, para o último a terminar não ser um PDF enorme.
+
+    Gera (caminho, texto, erro, segundos) à medida que cada arquivo termina
+    e chama progress(feitos, total, nome) depois de cada um. Sem timeout ou
+    memory_mb, valem EXTRACT_TIMEOUT e EXTRACT_MEMORY_MB.
+    """
+    timeout = EXTRACT_TIMEOUT if timeout is None else timeout
+    memory_mb = EXTRACT_MEMORY_MB if memory_mb is None else memory_mb
+    total = len(file_paths)
+    heavy = sorted(
+        (path for path in file_paths if path.suffix.lower() != '.txt'),
+        key=lambda path: path.stat().st_size,
+        reverse=True,
+    )
+    light = [path for path in file_paths if path.suffix.lower() == '.txt']
+    workers = max(1, min(workers or os.cpu_count() or 1, len(heavy)))
+    done = 0
+
+    for file_path in light:
+        content, error, seconds = _extract_safely(file_path)
+        done += 1
+        if progress:
+            progress(done, total, file_path.name)
+        yield file_path, content, error, seconds
+
+    replies = queue.Queue()
+    pending = list(heavy)
+    idle = []
+    busy = {}  # processo -> (caminho, início, prazo)
+
+    try:
+        while pending or busy:
+            while pending and (idle or len(busy) < workers):
+                worker = _take_idle(idle) or _Worker(memory_mb, replies)
+                file_path = pending.pop(0)
+                start = time.monotonic()
+                busy[worker] = (file_path, start, start + timeout)
+                try:
+                    worker.send(str(file_path.resolve()))
+                except OSError:
+                    if worker.started:
+                        # Morreu ocioso entre a conferência e o envio: o arquivo vai para outro processo
+                        del busy[worker]
+                        worker.stop(kill=True)
+                        pending.insert(0, file_path)
+                    # Processo novo que não subiu: o fim da conexão chega pela fila
+
+            next_deadline = min(deadline for _, _, deadline in busy.values())
+            try:
+                worker, message = replies.get(timeout=max(0.0, next_deadline - time.monotonic()))
+            except queue.Empty:
+                worker, message = None, None
+
+            finished = []
+            if message is None and worker in idle:
+                # Processo ocioso morreu: sai do grupo antes de receber outro arquivo
+                idle.remove(worker)
+                worker.stop(kill=True)
+            elif worker in busy:
+                file_path, start, _ = busy[worker]
+                if message is None:
+                    del busy[worker]
+                    worker.stop(kill=True)
+                    if worker.started:
+                        # Processo morreu no meio do arquivo (falha nativa, OOM do sistema)
+                        error = ExtractionAborted(
+                            f"processo de extração encerrado (código {worker.process.returncode})"
+                        )
+                    else:
+                        # Nem chegou a iniciar: problema do ambiente, não do arquivo
+                        error = RuntimeError(
+                            f"processo de extração não iniciou (código {worker.process.returncode})"
+                        )
+                    finished.append((file_path, None, error, time.monotonic() - start))
+                elif message[0] == 'ready':
+                    worker.started = True
+                else:
+                    status, payload, seconds = message
+                    del busy[worker]
+                    idle.append(worker)
+                    if status == 'ok':
+                        finished.append((file_path, payload, None, seconds))
+                    elif status == 'memory':
+                        error = ExtractionAborted(f"memória acima do limite de {memory_mb} MB")
+                        finished.append((file_path, None, error, seconds))
+                    else:
+                        finished.append((file_path, None, RuntimeError(payload), seconds))
+
+            now = time.monotonic()
+            for worker, (file_path, start, deadline) in list(busy.items()):
+                if now >= deadline:
+                    del busy[worker]
+                    worker.stop(kill=True)
+                    error = ExtractionAborted(f"tempo esgotado ({timeout:.0f}s)")
+                    finished.append((file_path, None, error, now - start))
+
+            for file_path, content, error, seconds in finished:
+                done += 1
+                if progress:
+                    progress(done, total, file_path.name)
+                yield file_path, content, error, seconds
+    finally:
+        for worker in idle:
+            worker.stop()
+        for worker in busy:
+            worker.stop(kill=True)
+
+
+def document_entry(content, source=None):
+    """Documento do corpus (metadados + texto sob demanda de source; ver document_store)"""
+    return stored_document(content, source)
+
+
+def scan_folder(docs_folder):
+    """Fotografa a pasta: {nome: (tamanho, mtime_ns)} dos arquivos suportados"""
+    snapshot = {}
+    if not docs_folder.exists():
+        return snapshot
+
+    for file_path in docs_folder.iterdir():
+        if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_SUFFIXES:
+            stat = file_path.stat()
+            snapshot[file_path.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def diff_snapshots(old, new):
+    """Compara duas fotografias da pasta: (adicionados, alterados, removidos)"""
+    added = [name for name in new if name not in old]
+    changed = [name for name in new if name in old and new[name] != old[name]]
+    removed = [name for name in old if name not in new]
+    return added, changed, removed
+
+
+def snapshot_version(snapshot):
+    """Identificador curto da versão do corpus (muda se qualquer arquivo mudar)"""
+    payload = json.dumps(sorted(snapshot.items()), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]
+
+
+def empty_corpus():
+    return freeze_corpus({
+        'snapshot': {}, 'documents': {}, 'errors': [], 'quarantine': {}, 'stats': {},
+        'version': snapshot_version({}),
+    })
+
+
+def _record_stats(stats, name, size, source, seconds, content=None, error=None):
+    """Registra no corpus e no log o custo de obter o texto de um documento"""
+    entry = {
+        'source': source,  # 'cache' ou 'extracao'
+        'seconds': round(seconds, 4) if seconds is not None else None,
+        'bytes': size,
+        'chars': len(content) if content is not None else 0,
+    }
+    if error is not None:
+        entry['error'] = str(error)
+    stats[name] = entry
+    log_event("document", file=name, **entry)
+
+
+def refresh_corpus(corpus, docs_folder, cache_dir=CACHE_DIR, workers=None, progress=None, on_document=None):
+    """
+    Atualiza o corpus de forma incremental.
+
+    Compara a pasta com a última fotografia conhecida e reextrai só os
+    arquivos adicionados ou alterados; os removidos saem do corpus. O corpus
+    recebido não é modificado: é retornado um novo, junto com as mudanças
+    {'added', 'changed', 'removed'}. Assim uma sessão que esteja lendo a
+    versão anterior nunca vê um estado pela metade.
+
+    Arquivos fora do cache são extraídos em processos isolados (ver
+    extract_many); progress(feitos, total, nome) acompanha essa extração, e
+    on_document(nome, documento) recebe cada documento assim que ele fica
+    pronto (do cache ou da extração), para quem quer mostrar a carga parcial.
+    Um arquivo que esgota o tempo ou a memória vai para a quarentena e não é
+    tentado de novo enquanto o conteúdo não mudar.
+
+    Corpus: {'snapshot', 'documents', 'errors', 'quarantine', 'stats',
+    'version'}, onde documents é {nome: {'full_content', 'size_kb',
+    'char_count'}} (StoredDocument, com o texto lido do cache de extração
+    sob demanda), quarantine é {nome: motivo} e stats é {nome: {'source',
+    'seconds', 'bytes', 'chars'}}, congelado com freeze_corpus() para ser
+    compartilhado entre sessões sem cópias.
+    """
+    refresh_start = time.perf_counter()
+    snapshot = scan_folder(docs_folder)
+    added, changed, removed = diff_snapshots(corpus['snapshot'], snapshot)
+
+    if not (added or changed or removed):
+        # Nada mudou: mesmo corpus e mesma versão (índices e caches continuam valendo)
+        return corpus, {'added': added, 'changed': changed, 'removed': removed}
+
+    documents = dict(corpus['documents'])
+    stats = dict(corpus['stats'])
+    stale = set(changed) | set(removed)
+    errors = [name for name in corpus['errors'] if name not in stale]
+    quarantined = {name: reason for name, reason in corpus['quarantine'].items() if name not in stale}
+
+    for name in stale:
+        documents.pop(name, None)
+        stats.pop(name, None)
+
+    pending = {}  # caminho -> fingerprint dos arquivos fora do cache
+    if added or changed:
+        index = read_cache_index(cache_dir)
+        quarantine = read_quarantine(cache_dir)
+        quarantine_changed = False
+        extracted = {}
+
+        for name in added + changed:
+            file_path = docs_folder / name
+            lookup_start = time.perf_counter()
+            try:
+                fingerprint, content = lookup_cache(file_path, index, cache_dir)
+            except OSError as e:
+                errors.append(name)
+                _record_stats(stats, name, snapshot[name][0], 'cache', time.perf_counter() - lookup_start, error=e)
+                continue
+
+            held = quarantine.get(str(file_path.resolve()))
+            if held is not None and held['sha256'] == fingerprint['sha256']:
+                quarantined[name] = held['reason']
+                continue
+            if held is not None:
+                # Conteúdo mudou: sai da quarentena e é tentado de novo
+                del quarantine[str(file_path.resolve())]
+                quarantine_changed = True
+
+            if content is None:
+                pending[file_path] = fingerprint
+            else:
+                index[str(file_path.resolve())] = fingerprint
+                source = cached_text(file_path, fingerprint['sha256'], cache_dir)
+                extracted[name] = _ready_entry(name, content, on_document, source)
+                _record_stats(stats, name, snapshot[name][0], 'cache', time.perf_counter() - lookup_start, content)
+
+        for file_path, content, error, seconds in extract_many(list(pending), workers, progress):
+            _record_stats(stats, file_path.name, snapshot[file_path.name][0], 'extracao', seconds, content, error)
+            if isinstance(error, ExtractionAborted):
+                quarantine[str(file_path.resolve())] = {'sha256': pending[file_path]['sha256'], 'reason': str(error)}
+                quarantined[file_path.name] = str(error)
+                quarantine_changed = True
+                log_event("quarantine", file=file_path.name, reason=str(error))
+                continue
+            if error is not None:
+                errors.append(file_path.name)
+                continue
+            # Sem cache gravado, o texto fica preso ao documento
+            source = None
+            if store_extraction(file_path, pending[file_path], content, index, cache_dir):
+                source = cached_text(file_path, pending[file_path]['sha256'], cache_dir)
+            extracted[file_path.name] = _ready_entry(file_path.name, content, on_document, source)
+
+        # Inserção na ordem da pasta, independente de quem terminou primeiro
+        for name in added + changed:
+            entry = extracted.get(name)
+            if entry is not None:
+                documents[name] = entry
+
+        try:
+            write_cache_index(index, cache_dir)
+            if quarantine_changed:
+                write_quarantine(quarantine, cache_dir)
+        except OSError:
+            pass  # Sem permissão de escrita: funciona sem persistir o índice
+
+    new_corpus = {
+        'snapshot': snapshot,
+        'documents': documents,
+        'errors': errors,
+        'quarantine': quarantined,
+        'stats': stats,
+        'version': snapshot_version(snapshot),
+    }
+    log_event(
+        "corpus_refresh",
+        seconds=round(time.perf_counter() - refresh_start, 4),
+        added=len(added), changed=len(changed), removed=len(removed),
+        extracted=len(pending),
+        documents=len(documents), errors=len(errors), quarantined=len(quarantined),
+    )
+    return freeze_corpus(new_corpus), {'added': added, 'changed': changed, 'removed': removed}
+
+
+def _ready_entry(name, content, on_document, source=None):
+    """Documento de um texto extraído (None se vazio), avisando on_document"""
+    if not content.strip():
+        return None
+    entry = document_entry(content, source)
+    if on_document:
+        on_document(name, entry)
+    return entry
+
+
+def load_corpus(docs_folder, cache_dir=CACHE_DIR, workers=None, progress=None):
+    """Carrega o corpus completo (equivale a um refresh a partir do vazio)"""
+    corpus, _ = refresh_corpus(empty_corpus(), docs_folder, cache_dir, workers, progress)
+    return corpus
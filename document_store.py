@@ -0,0 +1,205 @@
+"""
+document_store.py - Texto dos documentos sob demanda, com teto de memória
+
+O corpus guardava o texto completo de cada documento durante toda a vida do
+processo, e a memória crescia com a pasta de documentos. Aqui cada documento
+do corpus (StoredDocument) guarda só os metadados (caracteres, KB) e de onde
+ler o texto:
+
+- o cache de extração ('.cache/extracao/<sha256>.txt', ver document_loader)
+- o artefato compilado (tabela documents do corpus.sqlite, ver corpus_db),
+  que também entrega uma faixa do texto sem ler o documento inteiro
+
+Os textos lidos ficam num LRU por processo, compartilhado pelas sessões, com
+teto em bytes (IETA_DOCUMENT_CACHE_MB); quando ele enche, saem os usados há
+mais tempo. O teto, o quanto está residente e os acertos/leituras aparecem
+no painel "🧠 Memória" da sidebar e no log de diagnóstico.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from diagnostics import log_event
+
+# Teto (MB) dos textos de documentos mantidos em memória por processo
+DOCUMENT_CACHE_MB = float(os.environ.get("IETA_DOCUMENT_CACHE_MB", "256"))
+
+
+class TextCache:
+    """
+    LRU de textos com teto em bytes, seguro entre threads.
+
+    O tamanho de cada texto é o que ele ocupa de fato (sys.getsizeof). Um
+    texto maior que o teto inteiro é entregue sem ficar residente.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # chave -> (texto, bytes)
+        self._lock = threading.Lock()
+        self._resident = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._load_seconds = 0.0
+
+    def get(self, key, load):
+        """Texto da chave; se não está residente, load() o lê e ele entra no LRU"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        # Leitura fora do lock: sessões lendo documentos diferentes não se esperam
+        start = time.perf_counter()
+        text = load()
+        with self._lock:
+            self._load_seconds += time.perf_counter() - start
+        self.put(key, text)
+        return text
+
+    def peek(self, key):
+        """Texto se ele já está residente (sem contar acerto nem mudar a ordem), senão None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key, text):
+        """Guarda um texto já lido (p. ex. recém-extraído), descartando os mais antigos se passar do teto"""
+        size = sys.getsizeof(text)
+        with self._lock:
+            if key in self._entries or size > self.max_bytes:
+                return
+            self._entries[key] = (text, size)
+            self._resident += size
+            self._evict()
+
+    def _evict(self):
+        while self._resident > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self._resident -= size
+            self._evictions += 1
+
+    def stats(self):
+        """{'max_bytes', 'resident_bytes', 'documents', 'hits', 'misses', 'evictions', 'load_seconds'}"""
+        with self._lock:
+            return {
+                'max_bytes': self.max_bytes,
+                'resident_bytes': self._resident,
+                'documents': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'load_seconds': round(self._load_seconds, 4),
+            }
+
+
+TEXT_CACHE = TextCache(int(DOCUMENT_CACHE_MB * 1024 * 1024))
+
+
+class FileText:
+    """Texto completo num arquivo UTF-8 (uma entrada do cache de extração)"""
+
+    def __init__(self, path, fallback=None):
+        self.path = path.absolute()
+        self.key = ('arquivo', str(self.path))
+        self.fallback = fallback  # Reextração, se o arquivo do cache sumir
+
+    def read(self):
+        try:
+            return self.path.read_text(encoding='utf-8')
+        except OSError as e:
+            if self.fallback is None:
+                raise
+            log_event("document_fallback", path=str(self.path), error=f"{type(e).__name__}: {e}")
+            return self.fallback()
+
+
+class StoredDocument(Mapping):
+    """
+    Documento do corpus: metadados residentes e texto lido sob demanda.
+
+    Continua lendo como o dicionário de antes ({'full_content', 'size_kb',
+    'char_count'}): doc['full_content'] passa pelo TEXT_CACHE. Para só uma
+    parte, text(inicio, fim) lê a faixa direto da origem (quando ela sabe
+    fazer isso e o texto não está residente).
+
+    Sem origem (cache de extração indisponível), o texto fica preso ao
+    documento, como antes.
+    """
+
+    __slots__ = ('char_count', '_source', '_text')
+
+    KEYS = ('full_content', 'size_kb', 'char_count')
+
+    def __init__(self, char_count, source=None, text=None):
+        self.char_count = char_count
+        self._source = source
+        self._text = text
+
+    @property
+    def size_kb(self):
+        return self.char_count / 1024
+
+    @property
+    def resident(self):
+        """O texto completo está em memória agora?"""
+        return self._text is not None or TEXT_CACHE.peek(self._source.key) is not None
+
+    def text(self, start=0, end=None):
+        """Texto completo, ou a faixa [start:end] dele"""
+        if self._text is not None:
+            return self._text[start:end]
+
+        end = self.char_count if end is None else min(end, self.char_count)
+        read_range = getattr(self._source, 'read_range', None)
+        if (start, end) != (0, self.char_count) and read_range is not None:
+            cached = TEXT_CACHE.peek(self._source.key)
+            if cached is not None:
+                return cached[start:end]
+            return read_range(start, end)
+
+        content = TEXT_CACHE.get(self._source.key, self._source.read)
+        return content if (start, end) == (0, self.char_count) else content[start:end]
+
+    def __getitem__(self, key):
+        if key == 'full_content':
+            return self.text()
+        if key == 'size_kb':
+            return self.size_kb
+        if key == 'char_count':
+            return self.char_count
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __sizeof__(self):
+        # Para corpus_store.deep_sizeof: o texto preso conta, o do LRU não
+        size = object.__sizeof__(self)
+        return size + sys.getsizeof(self._text) if self._text is not None else size
+
+    def __repr__(self):
+        return f"StoredDocument(char_count={self.char_count}, resident={self.resident})"
+
+
+def stored_document(content, source=None):
+    """
+    Documento de um texto já lido: com origem, o texto vai para o TEXT_CACHE
+    (costuma ser usado logo em seguida, na montagem do índice) e o documento
+    guarda só os metadados; sem origem, o texto fica preso ao documento.
+    """
+    if source is None:
+        return StoredDocument(len(content), text=content)
+    TEXT_CACHE.put(source.key, content)
+    return StoredDocument(len(content), source)
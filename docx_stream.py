@@ -0,0 +1,207 @@
+"""
+docx_stream.py - Texto de DOCX lido direto do XML, em fluxo
+
+O python-docx monta a árvore lxml inteira do documento para depois percorrer
+doc.paragraphs, e esses são só os parágrafos do corpo: tabelas (onde os
+Business Briefs e o VCM Benchmark guardam os números principais), caixas de
+texto e controles de conteúdo ficavam de fora.
+
+Aqui 'word/document.xml' é lido com iterparse, direto do zip, e cada bloco
+sai assim que termina, na ordem do documento:
+
+- parágrafo: o texto dele (tabulações e quebras de linha como no python-docx)
+- linha de tabela: as células separadas por " | " (parágrafos de uma célula
+  unidos por espaço; tabelas dentro de células entram no texto da célula)
+- caixa de texto: cada parágrafo como uma linha própria
+
+Diferenças no texto de um parágrafo do corpo em relação ao Paragraph.text do
+python-docx, que só lê os w:r e w:hyperlink filhos diretos do parágrafo:
+
+- inserções com controle de alterações (w:ins) entram, e as exclusões
+  (w:delText) não: o texto é o do documento com as alterações aceitas
+- runs dentro de campos simples (w:fldSimple), smart tags e controles de
+  conteúdo no meio do parágrafo (w:sdt) também entram
+
+Fora isso os parágrafos do corpo saem iguais aos do python-docx e na mesma
+ordem (ver test_docx_stream.py).
+
+Os elementos já processados são descartados, então a memória fica no
+tamanho de um bloco (um parágrafo ou uma tabela), e não do documento.
+
+Uso (comparação com o python-docx nos arquivos da pasta):
+    python docx_stream.py documents/
+"""
+
+import sys
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+from xml.etree.ElementTree import iterparse
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+DOCUMENT_PART = "word/document.xml"
+
+CELL_SEPARATOR = " | "
+
+# Texto de cada elemento de uma execução (run); w:br de página/coluna não vira texto
+RUN_TEXT = {
+    W + "tab": "\t",
+    W + "ptab": "\t",
+    W + "cr": "\n",
+    W + "noBreakHyphen": "-",
+}
+
+# Contêineres acompanhados na pilha (o resto é só atravessado)
+CONTAINERS = {W + "p", W + "tc", W + "tr", W + "txbxContent"}
+
+# Ignorados com tudo o que têm dentro: mc:Fallback é cópia alternativa do
+# mesmo conteúdo, e nas propriedades do parágrafo w:tab é uma parada de
+# tabulação (w:tabs), não texto
+SKIPPED = {MC + "Fallback", W + "pPr"}
+
+
+def iter_docx_blocks(docx_path):
+    """
+    Gera o texto de cada bloco do documento, na ordem: parágrafos, linhas de
+    tabela (células separadas por CELL_SEPARATOR) e parágrafos de caixas de
+    texto. Linhas de tabela vazias são puladas; parágrafos vazios não, como
+    no doc.paragraphs.
+    """
+    with zipfile.ZipFile(docx_path) as archive, archive.open(DOCUMENT_PART) as xml:
+        body = None
+        stack = []      # [(tag, partes)] dos contêineres abertos
+        skipping = 0    # Dentro de um elemento de SKIPPED
+
+        for event, elem in iterparse(xml, events=("start", "end")):
+            tag = elem.tag
+
+            if tag in SKIPPED:
+                skipping += 1 if event == "start" else -1
+                continue
+            if skipping:
+                if event == "end":
+                    elem.clear()
+                continue
+
+            if event == "start":
+                if tag in CONTAINERS:
+                    stack.append((tag, []))
+                elif tag == W + "body":
+                    body = elem
+                continue
+
+            text = None
+            if tag == W + "t":
+                text = elem.text or ""
+            elif tag == W + "br":
+                if elem.get(W + "type") in (None, "textWrapping"):
+                    text = "\n"
+            elif tag in RUN_TEXT:
+                text = RUN_TEXT[tag]
+
+            if text is not None:
+                # Texto solto fora de parágrafo (não deveria haver) é ignorado
+                if stack and stack[-1][0] == W + "p":
+                    stack[-1][1].append(text)
+                continue
+
+            if tag not in CONTAINERS:
+                if elem is not body and stack == [] and body is not None:
+                    body.clear()  # Bloco do corpo terminado: libera a memória
+                continue
+
+            _, parts = stack.pop()
+            elem.clear()
+            if tag == W + "p":
+                block = "".join(parts)
+            elif tag == W + "tc":
+                block = " ".join(part for part in parts if part.strip())
+            elif tag == W + "tr":
+                block = CELL_SEPARATOR.join(parts) if any(part for part in parts) else None
+            else:
+                block = None  # Fim de caixa de texto: os parágrafos já saíram
+
+            parent = stack[-1][0] if stack else None
+            if block is None:
+                pass
+            elif parent in (W + "tc", W + "tr"):
+                stack[-1][1].append(block)
+            else:
+                # Corpo, caixa de texto ou parágrafo com caixa de texto dentro
+                yield block
+
+            if not stack and body is not None:
+                body.clear()
+
+
+def extract_docx(docx_path):
+    """Texto do DOCX (blocos de iter_docx_blocks unidos por quebra de linha)"""
+    return "\n".join(iter_docx_blocks(docx_path))
+
+
+# ==============================================================================
+# COMPARAÇÃO COM O PYTHON-DOCX
+# ==============================================================================
+
+def _python_docx_text(docx_path):
+    # Importado só aqui: os processos de extração carregam este módulo e não
+    # precisam do python-docx
+    from docx import Document
+    return "\n".join(p.text for p in Document(docx_path).paragraphs)
+
+
+def _measure(function, docx_path):
+    """(texto, segundos, pico de memória em MB) de uma extração"""
+    start = time.perf_counter()
+    text = function(docx_path)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        function(docx_path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return text, seconds, peak / 1024 / 1024
+
+
+def compare(docx_path):
+    """Tempo, pico de memória e caracteres do python-docx e do fluxo para um arquivo"""
+    result = {'file': docx_path.name, 'bytes': docx_path.stat().st_size}
+    for name, function in (('python_docx', _python_docx_text), ('stream', extract_docx)):
+        text, seconds, peak_mb = _measure(function, docx_path)
+        result[name] = {'seconds': round(seconds, 4), 'peak_mb': round(peak_mb, 2), 'chars': len(text)}
+    return result
+
+
+def main():
+    folder = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("documents")
+    files = sorted(folder.glob("*.docx"))
+    if not files:
+        print(f"Nenhum DOCX em {folder}")
+        return
+
+    print(f"{'arquivo':<48} {'python-docx':>27} {'fluxo':>27}")
+    totals = {'python_docx': [0.0, 0.0, 0], 'stream': [0.0, 0.0, 0]}
+    for docx_path in files:
+        result = compare(docx_path)
+        cells = []
+        for name in ('python_docx', 'stream'):
+            stats = result[name]
+            totals[name][0] += stats['seconds']
+            totals[name][1] = max(totals[name][1], stats['peak_mb'])
+            totals[name][2] += stats['chars']
+            cells.append(f"{stats['seconds'] * 1000:7.1f} ms {stats['peak_mb']:5.1f} MB {stats['chars']:>7,}")
+        print(f"{docx_path.name[:48]:<48} {cells[0]:>27} {cells[1]:>27}")
+
+    print("-" * 104)
+    for name, label in (('python_docx', "python-docx"), ('stream', "fluxo")):
+        seconds, peak_mb, chars = totals[name]
+        print(f"{label:<12} {seconds * 1000:8.1f} ms no total · pico {peak_mb:.1f} MB · {chars:,} caracteres")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+"""
+load_test.py - Teste de carga: várias sessões simultâneas no app
+
+Sobe o meeting_prep.py num servidor Streamlit de verdade (processo separado,
+porta livre, pasta de trabalho temporária) apontado para um corpus de teste,
+e abre N sessões ao mesmo tempo pelo mesmo websocket que o navegador usa.
+Cada sessão, em cada rodada:
+
+- escolhe a ferramenta (Meeting Prep ou Panel Prep; com --tool both elas
+  se alternam, e metade das sessões começa por cada uma)
+- preenche os campos obrigatórios, um rerun por campo, como no navegador
+- clica em gerar e espera o prompt
+
+O AppTest do Streamlit não serve aqui: ele troca a configuração e o runtime
+globais do processo, então duas sessões simultâneas no mesmo processo se
+atrapalham. Com o servidor real, as sessões concorrem pelo mesmo corpus,
+índice e caches, como em produção.
+
+Mede:
+- latência de cada rerun (p50/p95/p99/máx), por ação: abrir, ferramenta,
+  campo, gerar
+- vazão: briefings e reruns por segundo
+- memória: RSS do servidor antes e depois das sessões (e a diferença por
+  sessão) e o "Estado desta sessão" que o próprio app informa na sidebar
+
+O corpus padrão é o sintético do benchmark.py (mesma semente = mesmos
+arquivos); --docs usa uma pasta real. Com --max-p95-ms, o script sai com
+erro se o p95 de gerar passar do limite ou se alguma sessão falhar, para
+barrar uma regressão antes do deploy.
+
+Uso:
+    python load_test.py --sessions 8 --rounds 3 --output carga.json
+    python load_test.py --docs documents/ --sessions 20 --max-p95-ms 3000
+    python load_test.py --url http://localhost:8501 --sessions 5
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from websockets.sync.client import connect
+
+from benchmark import QUERIES, make_synthetic_corpus
+
+APP_SCRIPT = Path(__file__).resolve().parent / "meeting_prep.py"
+
+# Rótulos do meeting_prep.py usados pelas sessões
+TOOL_LABEL = "Escolha a ferramenta:"
+TOOLS = {'meeting': "🎯 Meeting Prep", 'panel': "🎤 Panel Prep"}
+FORMS = {
+    'meeting': {
+        'fields': ("**Organização/Participantes:**", "**Tópicos principais:**"),
+        'button': "🚀 Gerar Briefing",
+        'generated': "Prompt gerado com documentos completos!",
+    },
+    'panel': {
+        'fields': ("**Título do Painel:**", "**Tema/questão do painel:**"),
+        'button': "🎤 Gerar Preparação para Painel",
+        'generated': "Preparação estruturada!",
+    },
+}
+# Texto dos st.success que só aparecem quando o prompt foi gerado (o da sidebar aparece
+# em todo rerun); o emoji do início chega separado, como ícone do alerta
+GENERATED_ALERTS = {form['generated'] for form in FORMS.values()}
+SESSION_STATE_LABEL = "Estado desta sessão"
+
+WIDGET_TYPES = ('button', 'text_input', 'text_area', 'radio', 'selectbox')
+
+# Tempo máximo (s) para o servidor subir, o índice ficar pronto e um rerun terminar
+SERVER_TIMEOUT = 60
+READY_TIMEOUT = 600
+RERUN_TIMEOUT = 300
+
+UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+# ==============================================================================
+# SERVIDOR
+# ==============================================================================
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def _healthy(url):
+    try:
+        with urllib.request.urlopen(f"{url}/_stcore/health", timeout=2) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def start_server(docs_folder, work_dir):
+    """
+    Sobe o app numa porta livre, com a pasta de trabalho como diretório atual
+    (cache de extração, corpus.sqlite e log ficam nela). Retorna (processo, url).
+    """
+    port = _free_port()
+    env = dict(os.environ, IETA_DOCS_FOLDER=str(docs_folder.resolve()))
+    log = open(work_dir / "streamlit.log", 'wb')
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "streamlit", "run", str(APP_SCRIPT),
+            "--server.headless", "true",
+            "--server.port", str(port),
+            "--server.fileWatcherType", "none",
+            "--browser.gatherUsageStats", "false",
+        ],
+        cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    log.close()
+
+    url = f"http://localhost:{port}"
+    deadline = time.monotonic() + SERVER_TIMEOUT
+    while not _healthy(url):
+        if process.poll() is not None or time.monotonic() > deadline:
+            stop_server(process)
+            raise RuntimeError(f"Servidor não subiu (ver {work_dir / 'streamlit.log'})")
+        time.sleep(0.2)
+    return process, url
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def rss_mb(pid):
+    """Memória residente atual do processo em MB (None fora do Linux)"""
+    try:
+        with open(f"/proc/{pid}/status", encoding='ascii') as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def parse_bytes(text):
+    """Bytes de um texto de format_bytes ("12.3 KB"), ou None"""
+    match = re.fullmatch(r"([\d.]+) (B|KB|MB|GB)", text.strip())
+    return float(match.group(1)) * UNITS[match.group(2)] if match else None
+
+
+# ==============================================================================
+# SESSÃO
+# ==============================================================================
+
+class Session:
+    """
+    Uma aba do navegador: um websocket, os widgets do último rerun e os
+    valores preenchidos (reenviados a cada rerun, como faz o navegador).
+    """
+
+    def __init__(self, url):
+        ws_url = url.replace("http", "ws", 1) + "/_stcore/stream"
+        self.ws = connect(ws_url, subprotocols=["streamlit"], max_size=None, open_timeout=SERVER_TIMEOUT)
+        self.widgets = {}   # rótulo -> (tipo, id, desabilitado)
+        self.values = {}    # rótulo -> texto/opção escolhida
+        self.samples = []   # (ação, segundos)
+        self.errors = []
+        self.generated = 0
+        self.state_bytes = None
+
+    def __enter__(self):
+        self.ws.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.ws.__exit__(*exc_info)
+
+    def rerun(self, action, click=None):
+        """Roda o script com os valores atuais (e o clique no botão click); devolve os segundos"""
+        msg = BackMsg()
+        client_state = msg.rerun_script
+        client_state.query_string = ""
+        client_state.page_script_hash = ""
+        for label, value in self.values.items():
+            if label in self.widgets:
+                widget = client_state.widget_states.widgets.add()
+                widget.id = self.widgets[label][1]
+                widget.string_value = value
+        if click is not None:
+            widget = client_state.widget_states.widgets.add()
+            widget.id = self.widgets[click][1]
+            widget.trigger_value = True
+
+        start = time.perf_counter()
+        self.ws.send(msg.SerializeToString())
+        success = self._receive()
+        seconds = time.perf_counter() - start
+
+        self.samples.append((action, seconds))
+        if click is not None:
+            if success:
+                self.generated += 1
+            elif not self.errors:
+                self.errors.append(f"{action}: prompt não gerado")
+        return seconds
+
+    def _receive(self):
+        """Lê as mensagens até o fim do rerun; atualiza widgets e erros. True se um prompt foi gerado"""
+        widgets = {}
+        success = False
+        deadline = time.monotonic() + RERUN_TIMEOUT
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(self.ws.recv(timeout=max(deadline - time.monotonic(), 0.1)))
+            kind = forward.WhichOneof('type')
+
+            if kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type in WIDGET_TYPES:
+                    widget = getattr(element, element_type)
+                    widgets[widget.label] = (element_type, widget.id, widget.disabled)
+                elif element_type == 'exception':
+                    self.errors.append(f"{element.exception.type}: {element.exception.message}")
+                elif element_type == 'alert':
+                    if element.alert.format == Alert.ERROR:
+                        self.errors.append(element.alert.body)
+                    if element.alert.format == Alert.SUCCESS and element.alert.body in GENERATED_ALERTS:
+                        success = True
+                elif element_type == 'metric' and element.metric.label == SESSION_STATE_LABEL:
+                    self.state_bytes = parse_bytes(element.metric.body)
+
+            elif kind == 'script_finished':
+                status = forward.script_finished
+                if status == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    widgets, success = {}, False  # Interrompido: o rerun seguinte é o que vale
+                elif status in (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR):
+                    if status == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                        self.errors.append("erro de compilação do script")
+                    self.widgets = widgets
+                    return success
+
+    def ready(self, tool):
+        """O botão de gerar da ferramenta está liberado (índice pronto)?"""
+        widget = self.widgets.get(FORMS[tool]['button'])
+        return widget is not None and not widget[2]
+
+
+def wait_until_ready(url):
+    """Abre uma sessão e roda o script até o índice ficar pronto; devolve os segundos"""
+    start = time.perf_counter()
+    with Session(url) as session:
+        session.rerun('abrir')
+        while not session.ready('meeting'):
+            if time.perf_counter() - start > READY_TIMEOUT:
+                raise RuntimeError("Índice não ficou pronto a tempo")
+            time.sleep(1)
+            session.rerun('abrir')
+    return time.perf_counter() - start
+
+
+def run_session(url, index, tool, rounds, think, barrier, sessions):
+    """Uma sessão do teste: abre o app e gera um prompt por rodada"""
+    try:
+        barrier.wait()
+        with Session(url) as session:
+            sessions[index] = session
+            _run_rounds(session, index, tool, rounds, think)
+    except Exception as e:
+        if sessions[index] is None:
+            sessions[index] = _FailedSession()
+        sessions[index].errors.append(f"{type(e).__name__}: {e}")
+
+
+def _run_rounds(session, index, tool, rounds, think):
+    session.rerun('abrir')
+    current = 'meeting'
+
+    for round_number in range(rounds):
+        if tool == 'both':
+            target = ('meeting', 'panel')[(index + round_number) % 2]
+        else:
+            target = tool
+        query = QUERIES[(index + round_number) % len(QUERIES)]
+
+        if target != current:
+            time.sleep(think)
+            session.values[TOOL_LABEL] = TOOLS[target]
+            session.rerun('ferramenta')
+            current = target
+
+        first_field, second_field = FORMS[target]['fields']
+        for label, value in ((first_field, f"Sessão {index} rodada {round_number}"), (second_field, query)):
+            time.sleep(think)
+            session.values[label] = value
+            session.rerun('campo')
+
+        time.sleep(think)
+        session.rerun('gerar', click=FORMS[target]['button'])
+
+
+class _FailedSession:
+    """Sessão que nem chegou a conectar (só o erro)"""
+
+    def __init__(self):
+        self.samples = []
+        self.errors = []
+        self.generated = 0
+        self.state_bytes = None
+
+
+# ==============================================================================
+# RELATÓRIO
+# ==============================================================================
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def latency_stats(samples):
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'p50_ms': round(statistics.median(ordered) * 1000, 2),
+        'p95_ms': round(_percentile(ordered, 0.95) * 1000, 2),
+        'p99_ms': round(_percentile(ordered, 0.99) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+
+def run_load(url, args, server_pid=None):
+    """Roda as sessões simultâneas; devolve latência, vazão, memória e erros"""
+    ready_seconds = wait_until_ready(url)
+    rss_start = rss_mb(server_pid) if server_pid else None
+
+    sessions = [None] * args.sessions
+    barrier = threading.Barrier(args.sessions)
+    threads = [
+        threading.Thread(target=run_session, args=(url, i, args.tool, args.rounds, args.think, barrier, sessions))
+        for i in range(args.sessions)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    rss_end = rss_mb(server_pid) if server_pid else None
+
+    by_action = {}
+    for session in sessions:
+        for action, sample in session.samples:
+            by_action.setdefault(action, []).append(sample)
+    all_samples = [sample for samples in by_action.values() for sample in samples]
+    latency = {action: latency_stats(samples) for action, samples in by_action.items()}
+    if all_samples:
+        latency['todas'] = latency_stats(all_samples)
+
+    generated = sum(session.generated for session in sessions)
+    state_sizes = sorted(session.state_bytes for session in sessions if session.state_bytes is not None)
+    memory = {
+        'server_rss_start_mb': rss_start,
+        'server_rss_end_mb': rss_end,
+        'per_session_mb': (round((rss_end - rss_start) / args.sessions, 2)
+                           if rss_start is not None and rss_end is not None else None),
+        'session_state_bytes': ({'p50': statistics.median(state_sizes), 'max': state_sizes[-1]}
+                                if state_sizes else None),
+    }
+
+    return {
+        'ready_seconds': round(ready_seconds, 2),
+        'latency': latency,
+        'throughput': {
+            'seconds': round(seconds, 2),
+            'briefings': generated,
+            'briefings_per_s': round(generated / seconds, 3),
+            'reruns_per_s': round(len(all_samples) / seconds, 2),
+        },
+        'memory': memory,
+        'errors': {i: session.errors for i, session in enumerate(sessions) if session.errors},
+    }
+
+
+def print_summary(report):
+    result = report['result']
+    print(f"\n👥 {report['params']['sessions']} sessões × {report['params']['rounds']} rodadas "
+          f"({report['params']['tool']}) · índice pronto em {result['ready_seconds']:.1f} s", file=sys.stderr)
+    print(f"{'ação':<12} {'n':>5} {'p50':>10} {'p95':>10} {'p99':>10} {'máx':>10}", file=sys.stderr)
+    for action, stats in result['latency'].items():
+        print(f"{action:<12} {stats['count']:>5} {stats['p50_ms']:>8.0f}ms {stats['p95_ms']:>8.0f}ms "
+              f"{stats['p99_ms']:>8.0f}ms {stats['max_ms']:>8.0f}ms", file=sys.stderr)
+
+    throughput = result['throughput']
+    print(f"⚡ {throughput['briefings']} prompts em {throughput['seconds']:.1f} s: "
+          f"{throughput['briefings_per_s']:.2f} prompts/s · {throughput['reruns_per_s']:.1f} reruns/s", file=sys.stderr)
+
+    memory = result['memory']
+    if memory['server_rss_start_mb'] is not None:
+        print(f"🧠 Servidor: {memory['server_rss_start_mb']:.0f} → {memory['server_rss_end_mb']:.0f} MB "
+              f"(~{memory['per_session_mb']:.2f} MB por sessão)", file=sys.stderr)
+    if memory['session_state_bytes']:
+        print(f"🧠 Estado por sessão (app): p50 {memory['session_state_bytes']['p50']:,.0f} B · "
+              f"máx {memory['session_state_bytes']['max']:,.0f} B", file=sys.stderr)
+
+    for index, errors in result['errors'].items():
+        print(f"❌ Sessão {index}: {errors[0]}" + (f" (+{len(errors) - 1})" if len(errors) > 1 else ""),
+              file=sys.stderr)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Teste de carga do app com sessões simultâneas")
+    parser.add_argument("--sessions", type=int, default=8, help="Sessões simultâneas")
+    parser.add_argument("--rounds", type=int, default=3, help="Prompts gerados por sessão")
+    parser.add_argument("--tool", choices=("meeting", "panel", "both"), default="both",
+                        help="Ferramenta usada pelas sessões")
+    parser.add_argument("--think", type=float, default=0.0, help="Pausa (s) entre as ações de uma sessão")
+    parser.add_argument("--docs", type=Path, help="Pasta de documentos (padrão: corpus sintético do benchmark)")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do corpus sintético")
+    parser.add_argument("--url", help="Servidor já rodando (não sobe outro; sem medida de RSS)")
+    parser.add_argument("--max-p95-ms", type=float, help="Falha se o p95 de gerar passar deste limite")
+    parser.add_argument("--output", type=Path, help="Arquivo JSON de saída (padrão: tela)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+    }
+
+    if args.url:
+        report['result'] = run_load(args.url.rstrip("/"), args)
+    else:
+        work_dir = Path(tempfile.mkdtemp(prefix="ieta_carga_"))
+        try:
+            docs_folder = args.docs
+            if docs_folder is None:
+                docs_folder = work_dir / "sintetico"
+                report['corpus'] = make_synthetic_corpus(docs_folder, seed=args.seed)
+            print("🚀 Subindo o servidor...", file=sys.stderr)
+            process, url = start_server(docs_folder, work_dir)
+            try:
+                report['result'] = run_load(url, args, process.pid)
+            finally:
+                stop_server(process)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_summary(report)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n", encoding='utf-8')
+        print(f"✅ Resultado salvo em {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    result = report['result']
+    failed = bool(result['errors'])
+    if args.max_p95_ms is not None and 'gerar' in result['latency']:
+        p95_ms = result['latency']['gerar']['p95_ms']
+        if p95_ms > args.max_p95_ms:
+            print(f"❌ p95 de gerar ({p95_ms:.0f} ms) acima do limite de {args.max_p95_ms:.0f} ms", file=sys.stderr)
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+logical_documents.py - Partes do chunk_documents.py reunidas em documentos lógicos
+
+O chunk_documents.py divide um documento grande em 'Manual_parte01de07.txt'
+a 'Manual_parte07de07.txt', e o app tratava cada parte como um documento à
+parte: sete cabeçalhos no prompt, sete vezes a cota de MAX_DOC_SHARE e a
+citação apontando para um arquivo que o usuário nunca viu. Aqui:
+
+- as partes de uma mesma origem (mesmo nome antes de _parteNNdeMM) formam
+  um documento lógico, com as partes na ordem delas
+- os marcadores "--- PÁGINA N ---" escritos pelo chunk_pdf formam um índice
+  de páginas: onde cada página começa dentro de cada parte
+
+Só metadados ficam aqui (nomes e offsets). Com o índice, um trecho sabe de
+que páginas é (para a citação), e uma faixa de páginas (page_text) é lida
+direto das partes que a contêm, só nos offsets dela (StoredDocument.text),
+sem passar pelas demais partes (ver test_logical_documents.py).
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+
+# Nome dos arquivos gerados pelo chunk_documents.py
+PART_NAME = re.compile(r"^(?P<stem>.+)_parte(?P<part>\d+)de(?P<total>\d+)\.txt$", re.IGNORECASE)
+
+# Marcador de página escrito pelo chunk_pdf (e pelo modo por tamanho, em PDFs)
+PAGE_MARKER = re.compile(r"^--- PÁGINA (\d+) ---$", re.MULTILINE)
+
+
+def part_info(name):
+    """(origem, parte, total) de um arquivo _parteNNdeMM, ou None para um documento inteiro"""
+    match = PART_NAME.match(name)
+    if match is None:
+        return None
+    return match.group('stem'), int(match.group('part')), int(match.group('total'))
+
+
+def page_markers(text):
+    """Páginas marcadas no texto: [(página, offset do marcador)]"""
+    return [(int(match.group(1)), match.start()) for match in PAGE_MARKER.finditer(text)]
+
+
+def page_label(first, last):
+    return f"[Página {first}]" if first == last else f"[Páginas {first} a {last}]"
+
+
+class LogicalDocuments:
+    """
+    Agrupamento das partes e índice de páginas de um corpus.
+
+    names: documentos na ordem do corpus; markers: {nome: [(página, offset)]}
+    (page_markers de cada documento que tem marcadores). Um documento que
+    não é parte forma sozinho um documento lógico com o próprio nome.
+    """
+
+    def __init__(self, names, markers=None):
+        self._logical = {}   # documento -> nome lógico
+        self._position = {}  # documento -> número da parte (0 se não é parte)
+        self.parts = {}      # nome lógico -> [documentos, na ordem das partes]
+        for name in names:
+            info = part_info(name)
+            logical, position = (info[0], info[1]) if info else (name, 0)
+            self._logical[name] = logical
+            self._position[name] = position
+            self.parts.setdefault(logical, []).append(name)
+        for part_names in self.parts.values():
+            part_names.sort(key=self._position.__getitem__)
+        self.order = {logical: i for i, logical in enumerate(self.parts)}
+
+        self.markers = {}  # documento -> ([páginas], [offsets]) em ordem de offset
+        for name, found in (markers or {}).items():
+            if found:
+                pages, offsets = zip(*sorted(found, key=lambda item: item[1]))
+                self.markers[name] = (list(pages), list(offsets))
+
+    def logical_name(self, name):
+        return self._logical.get(name, name)
+
+    def sort_key(self, name):
+        """Ordem de leitura: documento lógico, depois parte"""
+        return self.order.get(self.logical_name(name), len(self.order)), self._position.get(name, 0)
+
+    def pages_of(self, name, start, end):
+        """(primeira, última) página da faixa [start, end) do documento, ou None sem marcadores"""
+        found = self.markers.get(name)
+        if found is None:
+            return None
+        pages, offsets = found
+        # Texto antes do primeiro marcador (sobreposição do modo por tamanho) fica com a primeira página
+        first = max(bisect_right(offsets, start) - 1, 0)
+        last = max(bisect_left(offsets, end) - 1, first)
+        return pages[first], pages[last]
+
+    def pages(self, logical):
+        """Páginas conhecidas do documento lógico, em ordem"""
+        pages = set()
+        for name in self.parts.get(logical, ()):
+            pages.update(self.markers.get(name, ([], []))[0])
+        return sorted(pages)
+
+    def page_spans(self, logical, first, last, documents):
+        """
+        Onde estão as páginas first..last: [(documento, início, fim)], na ordem.
+
+        documents dá o tamanho de cada parte (a última página vai até o fim
+        dela). Uma página repartida entre duas partes aparece nas duas.
+        """
+        spans = []
+        for name in self.parts.get(logical, ()):
+            found = self.markers.get(name)
+            if found is None:
+                continue
+            pages, offsets = found
+            ends = offsets[1:] + [documents[name]['char_count']]
+            for page, start, end in zip(pages, offsets, ends):
+                if first <= page <= last:
+                    if spans and spans[-1][0] == name and spans[-1][2] == start:
+                        spans[-1] = (name, spans[-1][1], end)  # Páginas seguidas: uma faixa só
+                    else:
+                        spans.append((name, start, end))
+        return spans
+
+    def page_text(self, logical, first, last, documents):
+        """Texto das páginas first..last do documento lógico, lido só das faixas que as contêm"""
+        return "\n".join(
+            documents[name].text(start, end).strip("\n")
+            for name, start, end in self.page_spans(logical, first, last, documents)
+        )
@@ -1,53 +1,118 @@
+import os
 import streamlit as st
 from pathlib import Path
-from PyPDF2 import PdfReader
-from docx import Document
+import time
 import urllib.parse  # NOVO: Para criar links do ChatGPT
 
+from corpus_db import CORPUS_DB
+from corpus_loader import CorpusLoader
+from corpus_store import deep_sizeof, format_bytes
+from diagnostics import LOG_PATH, StageTimer, log_event, peak_rss_mb
+from document_store import TEXT_CACHE
+from logical_documents import part_info
+from prompt_builder import build_meeting_prompt, build_panel_prompt, cache_stats
+from prompt_delivery import clipboard_button_html, compress_prompt, get_prompt, page_bounds, store_prompt
+from token_budget import count_tokens, exact_counts, tokenizer_name
+
 st.set_page_config(
     page_title="IETA Wizard",
     page_icon="🧙",
     layout="wide"
 )
 
-# Função para carregar documentos COM MAIS CONTEÚDO
-@st.cache_data
-def load_all_documents():
-    """Carrega documentos com máximo conteúdo possível"""
-    docs_folder = Path("documents")
-    all_content = {}
-    
-    if not docs_folder.exists():
-        return {}
-    
-    for file_path in docs_folder.iterdir():
-        if file_path.is_file():
-            try:
-                content = ""
-                
-                if file_path.suffix.lower() == '.pdf':
-                    reader = PdfReader(file_path)
-                    for page in reader.pages:
-                        content += page.extract_text()
-                
-                elif file_path.suffix.lower() == '.docx':
-                    doc = Document(file_path)
-                    content = "\n".join([p.text for p in doc.paragraphs])
-                
-                elif file_path.suffix.lower() == '.txt':
-                    content = file_path.read_text(encoding='utf-8')
-                
-                if content.strip():
-                    all_content[file_path.name] = {
-                        'full_content': content,  # Conteúdo completo
-                        'size_kb': len(content) / 1024,
-                        'char_count': len(content)
-                    }
-                    
-            except Exception as e:
-                st.sidebar.warning(f"⚠️ Erro: {file_path.name}")
+# Pasta dos documentos (IETA_DOCS_FOLDER troca, p. ex. pelo corpus de teste do load_test.py)
+DOCS_FOLDER = Path(os.environ.get("IETA_DOCS_FOLDER", "documents"))
+
+# Orçamento padrão do contexto (~80k caracteres de antes)
+DEFAULT_CONTEXT_TOKENS = 20000
+
+# Sem o tiktoken, os números de tokens na tela são estimativas e dizem isso
+TOKENS_SUFFIX = "" if exact_counts() else " (estimativa)"
+
+# Intervalo de atualização da sidebar enquanto o corpus carrega
+LOADING_REFRESH_SECONDS = 1.0
+
+# Corpus e índice de busca compartilhados por todas as sessões, carregados
+# numa thread: os formulários aparecem na hora e a sidebar vai se preenchendo
+# O texto extraído fica em cache no disco ('.cache/extracao/'), e o botão de
+# recarregar só reprocessa arquivos novos ou alterados
+@st.cache_resource
+def get_corpus_loader():
+    """Carregador do processo; a primeira carga começa na primeira execução"""
+    loader = CorpusLoader(DOCS_FOLDER, CORPUS_DB)
+    loader.start()
+    return loader
+
+# Entrega do prompt: o texto fica no servidor e só vai para a página o que é
+# usado (compactado para copiar, uma página por vez para ler, baixado no clique)
+# Como fragmento, paginar não roda o app todo nem some com o resultado
+@st.fragment
+def show_prompt(prompt_id, file_name, key):
+    prompt = get_prompt(prompt_id)
+    if prompt is None:
+        st.warning("⚠️ Este prompt já saiu da memória do servidor. Gere de novo.")
+        return
+    
+    payload = compress_prompt(prompt)
     
-    return all_content
+    # Encode do prompt para URL do ChatGPT
+    encoded_prompt = urllib.parse.quote(prompt[:2000])  # Limite de URL
+    
+    col_btn1, col_btn2, col_btn3 = st.columns(3)
+    
+    with col_btn1:
+        st.iframe(clipboard_button_html(payload), height=70)
+    
+    with col_btn2:
+        # Download adiado: o arquivo sai do servidor só no clique
+        st.download_button(
+            "📥 Baixar Prompt",
+            lambda: get_prompt(prompt_id) or "",
+            file_name=file_name,
+            mime="text/plain",
+            on_click="ignore",
+            use_container_width=True
+        )
+    
+    with col_btn3:
+        # Botão para abrir ChatGPT
+        st.markdown(f"""
+        <a href="https://chat.openai.com/?q={encoded_prompt}" target="_blank">
+            <button style="
+                width: 100%;
+                height: 43px;
+                padding: 0.5rem;
+                background-color: #10a37f;
+                color: white;
+                border: none;
+                border-radius: 0.5rem;
+                cursor: pointer;
+                font-size: 14px;
+                font-weight: 500;
+            ">
+                🤖 Abrir no ChatGPT
+            </button>
+        </a>
+        """, unsafe_allow_html=True)
+    
+    st.caption(
+        f"📦 Enviado ao navegador: {format_bytes(len(payload))} compactados "
+        f"(prompt de {format_bytes(len(prompt.encode('utf-8')))})"
+    )
+    
+    if st.toggle("👀 Pré-visualizar prompt", key=f"{key}_preview"):
+        bounds = page_bounds(prompt)
+        page = 1
+        if len(bounds) > 1:
+            page = st.number_input(f"Página (de {len(bounds)})", min_value=1, max_value=len(bounds),
+                                   key=f"{key}_page")
+        start, end = bounds[page - 1]
+        st.code(prompt[start:end], language=None, wrap_lines=True)
+    
+    st.info("💡 **Dica:** O botão ChatGPT abre com parte do prompt. Para o prompt completo, use 'Copiar prompt completo'!")
+
+# Tempo de cada etapa deste rerun (painel de diagnóstico e log)
+timer = StageTimer()
 
 # Título e menu
 st.title("🧙 IETA Wizard")
@@ -63,43 +128,155 @@ tool_choice = st.radio(
 with st.sidebar:
     st.header("📊 Base de Conhecimento")
     
-    # BOTÃO DE RELOAD
+    corpus_access_start = time.perf_counter()
+    loader = get_corpus_loader()
+    
+    # BOTÃO DE RELOAD (incremental: só reextrai o que mudou na pasta)
     if st.button("🔄 Recarregar Documentos", use_container_width=True, type="primary"):
-        st.cache_data.clear()
-        st.success("✅ Base atualizada!")
-        st.rerun()
+        loader.start()
+        st.session_state['reload_requested'] = True
     
     st.markdown("---")
     
-    # Carregar documentos
-    documents = load_all_documents()
+    # Último corpus pronto (referência ao corpus compartilhado, sem cópia)
+    with timer.stage("corpus"):
+        loader_state = loader.state()
+    corpus = loader_state['corpus']
+    passage_index = loader_state['index']
+    documents = corpus['documents'] if corpus is not None else {}
+    corpus_access_ms = (time.perf_counter() - corpus_access_start) * 1000
+    
+    # Enquanto a carga roda, só este trecho da sidebar é atualizado
+    loading = loader_state['loading']
     
-    if documents:
-        st.success(f"✅ {len(documents)} documentos")
+    @st.fragment(run_every=LOADING_REFRESH_SECONDS if loading else None)
+    def corpus_status():
+        state = loader.state()
+        if loading and not state['loading']:
+            # Carga terminou: o app todo roda de novo, com o índice pronto
+            st.rerun()
         
-        # Estatísticas
-        total_chars = sum(doc['char_count'] for doc in documents.values())
-        total_kb = sum(doc['size_kb'] for doc in documents.values())
+        if state['loading']:
+            if state['progress']:
+                done, total, name = state['progress']
+                st.progress(done / total, text=f"📄 {done}/{total} · {name}")
+            else:
+                st.progress(0.0, text="📄 Carregando documentos...")
         
-        st.metric("Total de caracteres", f"{total_chars:,}")
-        st.metric("Tamanho total", f"{total_kb:.1f} KB")
+        if state['error']:
+            st.error(f"❌ Falha ao carregar os documentos: {state['error']}")
+        elif not state['loading'] and st.session_state.pop('reload_requested', False):
+            changes = state['changes']
+            if changes and any(changes.values()):
+                st.success(
+                    f"✅ Base atualizada! {len(changes['added'])} novos, "
+                    f"{len(changes['changed'])} alterados, {len(changes['removed'])} removidos"
+                )
+            else:
+                st.success("✅ Base já estava atualizada!")
         
-        # Lista de documentos
-        with st.expander("📄 Ver documentos"):
-            for doc_name, doc_data in sorted(documents.items()):
-                st.text(f"• {doc_name}")
-                st.caption(f"  {doc_data['char_count']:,} chars")
-    else:
-        st.error("❌ Nenhum documento encontrado!")
-        st.info("Adicione arquivos PDF, DOCX ou TXT na pasta 'documents/'")
+        current = state['corpus']
+        if current is not None:
+            for error_name in current['errors']:
+                st.warning(f"⚠️ Erro: {error_name}")
+            
+            # Arquivos que travaram ou estouraram a memória na extração (ignorados até mudarem)
+            if current['quarantine']:
+                with st.expander(f"🚫 Quarentena ({len(current['quarantine'])})", expanded=True):
+                    for quarantined_name, reason in current['quarantine'].items():
+                        st.text(f"• {quarantined_name}")
+                        st.caption(f"  {reason}")
+                    st.caption("Substitua o arquivo (ou apague '.cache/extracao/quarantine.json') e recarregue.")
+            
+            sizes = {name: (doc['char_count'], doc['size_kb']) for name, doc in current['documents'].items()}
+        else:
+            # Primeira carga em andamento: documentos prontos até agora
+            sizes = state['partial']
+        
+        if sizes:
+            suffix = " (carregando...)" if current is None else ""
+            st.success(f"✅ {len(sizes)} documentos{suffix}")
+            
+            # Estatísticas
+            total_chars = sum(char_count for char_count, _ in sizes.values())
+            total_kb = sum(size_kb for _, size_kb in sizes.values())
+            
+            st.metric("Total de caracteres", f"{total_chars:,}")
+            st.metric("Tamanho total", f"{total_kb:.1f} KB")
+            
+            # Lista de documentos (partes _parteNNdeMM reunidas no documento de origem)
+            with st.expander("📄 Ver documentos"):
+                grouped = {}
+                for doc_name, (char_count, _) in sizes.items():
+                    info = part_info(doc_name)
+                    logical = grouped.setdefault(info[0] if info else doc_name, [0, 0])
+                    logical[0] += char_count
+                    logical[1] += 1 if info else 0
+                for logical_name, (char_count, parts) in sorted(grouped.items()):
+                    st.text(f"• {logical_name}")
+                    st.caption(f"  {char_count:,} chars" + (f" · {parts} partes" if parts else ""))
+            
+            # Memória: uma cópia do corpus por processo, lida por referência
+            if current is not None:
+                with st.expander("🧠 Memória"):
+                    session_state = {key: st.session_state[key] for key in st.session_state}
+                    st.metric("Corpus compartilhado (1 cópia)", format_bytes(deep_sizeof(current)))
+                    st.metric("Acesso ao corpus neste rerun", f"{corpus_access_ms:.2f} ms")
+                    st.metric("Estado desta sessão", format_bytes(deep_sizeof(session_state)))
+                    
+                    # Textos lidos sob demanda, num LRU com teto (IETA_DOCUMENT_CACHE_MB)
+                    text_cache = TEXT_CACHE.stats()
+                    st.metric(
+                        "Texto de documentos residente",
+                        f"{format_bytes(text_cache['resident_bytes'])} / {format_bytes(text_cache['max_bytes'])}"
+                    )
+                    st.caption(
+                        f"{text_cache['documents']} textos em memória · {text_cache['hits']:,} acertos · "
+                        f"{text_cache['misses']:,} leituras · {text_cache['evictions']:,} descartes"
+                    )
+        elif not state['loading']:
+            st.error("❌ Nenhum documento encontrado!")
+            st.info("Adicione arquivos PDF, DOCX ou TXT na pasta 'documents/'")
+    
+    corpus_status()
+    
+    st.markdown("---")
+    
+    # Orçamento de tokens do contexto (ajuste à janela do modelo que vai usar)
+    context_tokens = st.number_input(
+        "🎚️ Orçamento do contexto (tokens)",
+        min_value=2000,
+        max_value=500000,
+        value=DEFAULT_CONTEXT_TOKENS,
+        step=1000,
+        help="Os trechos mais relevantes entram inteiros até atingir este limite"
+    )
+    st.caption(f"Contagem: {tokenizer_name()}")
+    
+    # Só as frases mais ligadas aos tópicos: cabem mais fontes no mesmo orçamento
+    compress_context = st.checkbox(
+        "✂️ Compressão extrativa",
+        value=False,
+        help="Mantém de cada trecho as frases mais relevantes para os tópicos, na ordem original"
+    )
+    
+    # Preenchidos no fim do script, depois de uma eventual geração
+    cache_stats_slot = st.empty()
+    
+    show_diagnostics = st.checkbox("🩺 Mostrar diagnóstico", help="Tempo por etapa e por documento")
+    diagnostics_slot = st.empty()
     
     st.markdown("---")
     st.caption("🌍 IETA Brazil Initiative")
 
 # Main content
-if not documents:
-    st.warning("⚠️ Adicione documentos à pasta 'documents/' e clique em 'Recarregar Documentos'")
-    st.stop()
+# Os formulários aparecem mesmo durante a carga; só a geração espera o índice
+index_ready = passage_index is not None and bool(documents)
+if not index_ready:
+    if loading:
+        st.info("⏳ Carregando documentos... Preencha o formulário: o botão de gerar é liberado quando o índice estiver pronto.")
+    else:
+        st.warning("⚠️ Adicione documentos à pasta 'documents/' e clique em 'Recarregar Documentos'")
 
 # ==============================================================================
 # MEETING PREP
@@ -148,95 +325,31 @@ if tool_choice == "🎯 Meeting Prep":
     
     st.markdown("---")
     
-    if st.button("🚀 Gerar Briefing", type="primary", use_container_width=True):
+    if st.button("🚀 Gerar Briefing", type="primary", use_container_width=True, disabled=not index_ready):
         
         if not organization or not topics:
             st.error("⚠️ Preencha pelo menos Organização e Tópicos")
         else:
             with st.spinner("📝 Preparando briefing com documentos completos..."):
                 
-                # Preparar contexto COM MUITO MAIS CONTEÚDO
-                docs_context = []
-                
-                for doc_name, doc_data in documents.items():
-                    # Pegar primeiros 12.000 caracteres de cada doc (era 2.500!)
-                    content = doc_data['full_content'][:12000]
-                    
-                    docs_context.append(f"""
-{'='*70}
-DOCUMENTO: {doc_name}
-Tamanho: {doc_data['char_count']:,} caracteres
-{'='*70}
-
-{content}
-
-""")
-                
-                # Limitar contexto total para não explodir (máx 80k chars)
-                full_context = "\n".join(docs_context)[:80000]
-                
-                # Ajustar seções por nível
-                if detail_level == "Rápido":
-                    sections = """
-1. 🎯 Objetivos Estratégicos (2-3 pontos)
-2. 💡 Posições IETA Relevantes (cite documentos específicos)
-3. 🗣️ 3 Talking Points Principais
-"""
-                elif detail_level == "Padrão":
-                    sections = """
-1. 🎯 Objetivos Estratégicos IETA
-2. 📊 Contexto sobre a Organização
-3. 💡 Posições IETA Relevantes (SEMPRE cite o documento fonte)
-4. 🗣️ 5 Talking Points Estratégicos
-5. ❓ 3-4 Perguntas Prováveis e Respostas
-"""
-                else:  # Completo
-                    sections = """
-1. 🎯 Objetivos Estratégicos IETA
-2. 📊 Contexto Detalhado sobre a Organização
-3. 💡 Posições IETA Relevantes (com citações literais dos documentos)
-4. 🗣️ 7 Talking Points Estratégicos
-5. ❓ 5+ Perguntas Prováveis e Respostas Preparadas
-6. ⚠️ Considerações Estratégicas (Oportunidades e Riscos)
-7. 📋 Action Items para Follow-up
-"""
-                
-                # Criar prompt melhorado
-                prompt = f"""Você é um assistente especializado da IETA (International Emissions Trading Association) Brasil.
-
-REGRAS CRÍTICAS DE RESPOSTA:
-1. Use APENAS informações dos documentos fornecidos abaixo
-2. SEMPRE cite a fonte: "Segundo [nome do documento], ..."
-3. Use dados numéricos EXATOS dos documentos (não invente)
-4. Se não houver informação específica, diga claramente
-5. Priorize informações de Position Papers oficiais
-6. Quando múltiplos documentos mencionarem algo, sintetize mostrando convergências
-
-INFORMAÇÕES DA REUNIÃO:
-- Organização: {organization}
-- Data: {meeting_date}
-- Tipo: {meeting_type}
-- Tópicos: {topics}
-- Objetivos: {objectives if objectives else "Mapear oportunidades e alinhar posições"}
-
-DOCUMENTOS IETA COMPLETOS ({len(documents)} documentos, ~{len(full_context):,} caracteres):
-
-{full_context}
-
-TAREFA:
-Crie um briefing executivo estruturado para esta reunião.
-
-ESTRUTURA DO BRIEFING:
-{sections}
-
-FORMATO:
-- Use markdown com headers (##, ###) e bullet points
-- Cada afirmação importante deve incluir [Fonte: nome_do_documento]
-- Seja específico e prático
-- Foque em informações ACIONÁVEIS
-
-BRIEFING:
-"""
+                # Contexto + prompt (camada compartilhada com o Panel Prep, com cache)
+                with timer.stage("prompt"):
+                    result = build_meeting_prompt(
+                        documents, passage_index, corpus['version'],
+                        organization=organization,
+                        meeting_date=meeting_date,
+                        topics=topics,
+                        meeting_type=meeting_type,
+                        detail_level=detail_level,
+                        objectives=objectives,
+                        token_budget=context_tokens,
+                        timer=timer,
+                        compress=compress_context
+                    )
+                prompt = result['prompt']
+                full_context = result['context']
+                token_usage = result['token_usage']
+                prompt_tokens = count_tokens(prompt)
                 
                 # Mostrar resultados
                 st.success("✅ Prompt gerado com documentos completos!")
@@ -245,62 +358,48 @@ BRIEFING:
                 col_stat1, col_stat2, col_stat3 = st.columns(3)
                 
                 with col_stat1:
-                    st.metric("Documentos incluídos", len(documents))
+                    st.metric("Documentos incluídos", len(token_usage))
                 
                 with col_stat2:
                     st.metric("Caracteres no contexto", f"{len(full_context):,}")
                 
                 with col_stat3:
-                    st.metric("Tokens aproximados", f"{len(full_context)//4:,}")
+                    st.metric(f"Tokens do prompt{TOKENS_SUFFIX}", f"{prompt_tokens:,}")
                 
-                st.markdown("---")
-                
-                # Mostrar prompt
-                st.markdown("### 📋 Prompt Gerado (Copie e Cole no ChatGPT/Claude)")
+                with st.expander(f"📊 Tokens por documento{TOKENS_SUFFIX}"):
+                    for doc_name, doc_tokens in token_usage.items():
+                        st.text(f"• {doc_name}: {doc_tokens:,} tokens")
                 
-                st.text_area(
-                    "Prompt completo:",
-                    prompt,
-                    height=400,
-                    help="Copie todo este texto e cole no ChatGPT ou Claude.ai"
+                dedup_savings = result['dedup_savings']
+                st.caption(
+                    f"♻️ Deduplicação: {dedup_savings['passages']} trechos repetidos deixaram de entrar "
+                    f"(~{dedup_savings['tokens']:,} tokens, {dedup_savings['chars']:,} caracteres)"
                 )
                 
-                # NOVO: Botões de ação melhorados
-                # Encode do prompt para URL do ChatGPT
-                encoded_prompt = urllib.parse.quote(prompt[:2000])  # Limite de URL
+                compression = result['compression']
+                if compress_context:
+                    st.caption(
+                        f"✂️ Compressão: trechos reduzidos a {compression['ratio']:.0%} "
+                        f"({compression['original_chars']:,} → {compression['chars']:,} caracteres)"
+                    )
                 
-                col_btn1, col_btn2 = st.columns(2)
+                st.markdown("---")
                 
-                with col_btn1:
-                    st.download_button(
-                        "📥 Baixar Prompt",
-                        prompt,
-                        file_name=f"briefing_{organization.replace(' ', '_')}_{meeting_date}.txt",
-                        use_container_width=True
+                # Renderização: o prompt fica no servidor; a página recebe só o necessário
+                with timer.stage("renderização"):
+                    st.markdown("### 📋 Prompt Gerado (Copie e Cole no ChatGPT/Claude)")
+                    show_prompt(
+                        store_prompt(prompt),
+                        f"briefing_{organization.replace(' ', '_')}_{meeting_date}.txt",
+                        key="meeting"
                     )
                 
-                with col_btn2:
-                    # Botão para abrir ChatGPT
-                    st.markdown(f"""
-                    <a href="https://chat.openai.com/?q={encoded_prompt}" target="_blank">
-                        <button style="
-                            width: 100%;
-                            height: 43px;
-                            padding: 0.5rem;
-                            background-color: #10a37f;
-                            color: white;
-                            border: none;
-                            border-radius: 0.5rem;
-                            cursor: pointer;
-                            font-size: 14px;
-                            font-weight: 500;
-                        ">
-                            🤖 Abrir no ChatGPT
-                        </button>
-                    </a>
-                    """, unsafe_allow_html=True)
-                
-                st.info("💡 **Dica:** O botão ChatGPT abre com parte do prompt. Para prompt completo, copie da caixa acima!")
+                # Log estruturado do briefing para rastrear lentidão por etapa
+                log_event(
+                    "briefing", tool="meeting", stages_ms=timer.as_ms(), prompt_chars=len(prompt),
+                    prompt_tokens=prompt_tokens, documents=len(token_usage), token_budget=context_tokens,
+                    compression_ratio=round(compression['ratio'], 3),
+                )
 
 # ==============================================================================
 # PANEL PREP
@@ -370,157 +469,132 @@ elif tool_choice == "🎤 Panel Prep":
     
     st.markdown("---")
     
-    if st.button("🎤 Gerar Preparação para Painel", type="primary", use_container_width=True):
+    if st.button("🎤 Gerar Preparação para Painel", type="primary", use_container_width=True,
+                 disabled=not index_ready):
         
         if not panel_title or not panel_topic:
             st.error("⚠️ Preencha pelo menos Título e Tema do Painel")
         else:
             with st.spinner("📝 Preparando material para painel..."):
                 
-                # Preparar contexto (mesmo sistema do Meeting Prep)
-                docs_context = []
-                
-                for doc_name, doc_data in documents.items():
-                    content = doc_data['full_content'][:12000]
-                    
-                    docs_context.append(f"""
-{'='*70}
-DOCUMENTO: {doc_name}
-{'='*70}
-
-{content}
-
-""")
-                
-                full_context = "\n".join(docs_context)[:80000]
-                
-                # Ajustar por nível
-                if prep_level == "Básico":
-                    sections = """
-1. 🎯 Mensagem Central (1 frase impactante)
-2. 💡 3 Pontos-Chave para Sua Fala
-3. 📊 2-3 Dados de Apoio dos documentos
-4. 🎤 Sugestão de Abertura
-5. 🔚 Sugestão de Fechamento
-"""
-                elif prep_level == "Intermediário":
-                    sections = """
-1. 🎯 Mensagem Central e Narrativa
-2. 💡 5 Pontos Principais Estruturados
-3. 📊 Dados e Evidências (com fontes)
-4. 🎤 Abertura Impactante
-5. 🗣️ Possíveis Perguntas do Moderador/Audiência
-6. 🔚 Fechamento Memorável
-7. ⏰ Estrutura por Tempo ({duration})
-"""
-                else:  # Avançado
-                    sections = """
-1. 🎯 Narrativa Estratégica Completa
-2. 💡 7-10 Pontos de Argumentação
-3. 📊 Dados, Evidências e Cases (citando documentos)
-4. 🎤 Múltiplas Opções de Abertura
-5. 🗣️ Banco de Q&A (10+ perguntas)
-6. 💬 Soundbites para Mídia/Redes
-7. 🔚 Variações de Fechamento
-8. ⏰ Roteiro Minuto a Minuto
-9. 🎭 Gestão de Debates e Contra-argumentos
-"""
-                
-                prompt = f"""Você é um coach de comunicação especializado em painéis sobre mercados de carbono para a IETA.
-
-REGRAS CRÍTICAS:
-1. Use APENAS informações dos documentos IETA fornecidos
-2. Cite fontes específicas: [Fonte: nome_documento]
-3. Foque em comunicação CLARA e IMPACTANTE
-4. Adapte ao tempo disponível ({duration})
-5. Considere o público: {audience if audience else "profissionais do setor"}
-
-PAINEL:
-- Título: {panel_title}
-- Evento: {event_name}
-- Data: {panel_date}
-- Seu papel: {your_role}
-- Duração: {duration}
-- Tema: {panel_topic}
-- Público: {audience if audience else "profissionais do setor"}
-- Outros painelistas: {other_panelists if other_panelists else "Não informado"}
-- Mensagem-chave desejada: {key_message if key_message else "A definir com base nos documentos IETA"}
-
-DOCUMENTOS IETA ({len(documents)} documentos):
-
-{full_context}
-
-TAREFA:
-Crie uma preparação completa e prática para este painel.
-
-ESTRUTURA:
-{sections}
-
-DIRETRIZES:
-- Seja PRÁTICO e ACIONÁVEL
-- Pense em storytelling, não só dados
-- Inclua transições naturais
-- Prepare para imprevistos
-- Use dados concretos dos documentos IETA
-
-PREPARAÇÃO:
-"""
+                # Contexto + prompt (mesma camada do Meeting Prep)
+                with timer.stage("prompt"):
+                    result = build_panel_prompt(
+                        documents, passage_index, corpus['version'],
+                        panel_title=panel_title,
+                        event_name=event_name,
+                        panel_date=panel_date,
+                        your_role=your_role,
+                        panel_topic=panel_topic,
+                        duration=duration,
+                        prep_level=prep_level,
+                        audience=audience,
+                        other_panelists=other_panelists,
+                        key_message=key_message,
+                        token_budget=context_tokens,
+                        timer=timer,
+                        compress=compress_context
+                    )
+                prompt = result['prompt']
+                full_context = result['context']
+                token_usage = result['token_usage']
+                prompt_tokens = count_tokens(prompt)
                 
                 # Mostrar resultados
                 st.success("✅ Preparação estruturada!")
                 
-                col_stat1, col_stat2 = st.columns(2)
+                col_stat1, col_stat2, col_stat3 = st.columns(3)
                 
                 with col_stat1:
-                    st.metric("Documentos", len(documents))
+                    st.metric("Documentos", len(token_usage))
                 
                 with col_stat2:
                     st.metric("Contexto", f"{len(full_context):,} chars")
                 
-                st.markdown("---")
+                with col_stat3:
+                    st.metric(f"Tokens do prompt{TOKENS_SUFFIX}", f"{prompt_tokens:,}")
                 
-                st.markdown("### 🎤 Prompt para Panel Prep")
+                with st.expander(f"📊 Tokens por documento{TOKENS_SUFFIX}"):
+                    for doc_name, doc_tokens in token_usage.items():
+                        st.text(f"• {doc_name}: {doc_tokens:,} tokens")
                 
-                st.text_area(
-                    "Prompt completo:",
-                    prompt,
-                    height=400
+                dedup_savings = result['dedup_savings']
+                st.caption(
+                    f"♻️ Deduplicação: {dedup_savings['passages']} trechos repetidos deixaram de entrar "
+                    f"(~{dedup_savings['tokens']:,} tokens, {dedup_savings['chars']:,} caracteres)"
                 )
                 
-                # NOVO: Botões melhorados para Panel Prep também
-                encoded_prompt = urllib.parse.quote(prompt[:2000])
+                compression = result['compression']
+                if compress_context:
+                    st.caption(
+                        f"✂️ Compressão: trechos reduzidos a {compression['ratio']:.0%} "
+                        f"({compression['original_chars']:,} → {compression['chars']:,} caracteres)"
+                    )
                 
-                col_btn1, col_btn2 = st.columns(2)
+                st.markdown("---")
                 
-                with col_btn1:
-                    st.download_button(
-                        "📥 Baixar Prompt",
-                        prompt,
-                        file_name=f"panel_{panel_title[:30].replace(' ', '_')}_{panel_date}.txt",
-                        use_container_width=True
+                # Renderização: o prompt fica no servidor; a página recebe só o necessário
+                with timer.stage("renderização"):
+                    st.markdown("### 🎤 Prompt para Panel Prep")
+                    show_prompt(
+                        store_prompt(prompt),
+                        f"panel_{panel_title[:30].replace(' ', '_')}_{panel_date}.txt",
+                        key="panel"
                     )
                 
-                with col_btn2:
-                    st.markdown(f"""
-                    <a href="https://chat.openai.com/?q={encoded_prompt}" target="_blank">
-                        <button style="
-                            width: 100%;
-                            height: 43px;
-                            padding: 0.5rem;
-                            background-color: #10a37f;
-                            color: white;
-                            border: none;
-                            border-radius: 0.5rem;
-                            cursor: pointer;
-                            font-size: 14px;
-                            font-weight: 500;
-                        ">
-                            🤖 Abrir no ChatGPT
-                        </button>
-                    </a>
-                    """, unsafe_allow_html=True)
-                
-                st.info("💡 **Dica:** O botão ChatGPT abre com parte do prompt. Para prompt completo, copie da caixa acima!")
+                # Log estruturado do briefing para rastrear lentidão por etapa
+                log_event(
+                    "briefing", tool="panel", stages_ms=timer.as_ms(), prompt_chars=len(prompt),
+                    prompt_tokens=prompt_tokens, documents=len(token_usage), token_budget=context_tokens,
+                    compression_ratio=round(compression['ratio'], 3),
+                )
+
+# Painel de diagnóstico: etapas deste rerun e custo de cada documento
+if show_diagnostics:
+    with diagnostics_slot.container():
+        st.markdown("**🩺 Etapas deste rerun**")
+        for stage_name, stage_ms in timer.as_ms().items():
+            st.text(f"• {stage_name}: {stage_ms:,.1f} ms")
+        
+        rss = peak_rss_mb()
+        if rss is not None:
+            st.metric("Pico de memória do processo", f"{rss:,.1f} MB")
+        
+        load_seconds = loader_state['seconds']
+        if load_seconds:
+            st.markdown("**⏳ Última carga em segundo plano**")
+            for stage_name, stage_seconds in load_seconds.items():
+                st.text(f"• {stage_name}: {stage_seconds * 1000:,.1f} ms")
+        
+        text_cache = TEXT_CACHE.stats()
+        st.markdown("**🗂️ Texto dos documentos (sob demanda)**")
+        st.text(
+            f"• {format_bytes(text_cache['resident_bytes'])} residentes de {format_bytes(text_cache['max_bytes'])} "
+            f"({text_cache['documents']} textos)"
+        )
+        st.text(
+            f"• {text_cache['misses']:,} leituras em {text_cache['load_seconds'] * 1000:,.1f} ms · "
+            f"{text_cache['evictions']:,} descartes"
+        )
+        
+        st.markdown("**📄 Documentos mais lentos**")
+        corpus_stats = corpus['stats'] if corpus is not None else {}
+        slowest = sorted(corpus_stats.items(), key=lambda item: item[1]['seconds'] or 0, reverse=True)
+        for doc_name, doc_stats in slowest[:10]:
+            st.text(f"• {doc_name}")
+            elapsed = f"{doc_stats['seconds'] * 1000:,.1f} ms" if doc_stats['seconds'] is not None else "—"
+            st.caption(
+                f"  {elapsed} ({doc_stats['source']}) · "
+                f"{doc_stats['bytes'] / 1024:,.0f} KB lidos · {doc_stats['chars']:,} chars"
+            )
+        st.caption(f"Log JSON: {LOG_PATH}")
+
+# Contadores dos caches de contexto/prompt (compartilhados entre sessões)
+stats = cache_stats()
+cache_stats_slot.caption(
+    f"⚡ Cache de contexto: {stats['context']['hits']} acertos / {stats['context']['misses']} falhas · "
+    f"Cache de prompts: {stats['prompt']['hits']} acertos / {stats['prompt']['misses']} falhas"
+)
 
 # Rodapé
 st.markdown("---")
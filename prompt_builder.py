@@ -0,0 +1,306 @@
+"""
+prompt_builder.py - Montagem dos prompts do Meeting Prep e do Panel Prep
+
+Camada única usada pelas duas ferramentas (e por qualquer outro ponto de
+entrada): seleciona o contexto com retrieval.build_context e preenche o
+template de cada ferramenta.
+
+Os resultados ficam em caches LRU limitados e compartilhados por todas as
+sessões do processo, com chave na versão do corpus e num hash dos campos
+normalizados (espaços extras ignorados; para o contexto, só o conjunto de
+termos da consulta importa). Briefings repetidos ou quase repetidos voltam
+na hora.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from compression import query_compressor
+from diagnostics import stage
+from retrieval import build_context
+from text_normalization import tokenize
+
+
+class LRUCache:
+    """Cache LRU com limite de entradas e contadores de acertos/falhas"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+
+        # Montagem fora do lock: sessões diferentes não esperam umas pelas outras
+        value = build()
+
+        with self._lock:
+            self.misses += 1
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def put(self, key, value):
+        """Guarda um valor já pronto (sem contar acerto ou falha)"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
+
+
+CONTEXT_CACHE = LRUCache(maxsize=128)
+PROMPT_CACHE = LRUCache(maxsize=64)
+
+
+def normalize_field(value):
+    """Texto do campo sem espaços/quebras de linha repetidos nas pontas ou no meio"""
+    return " ".join(str(value).split()) if value is not None else ""
+
+
+def _hash_key(*parts):
+    payload = json.dumps(parts, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cached_context(documents, index, corpus_version, query, token_budget, show_size=True, timer=None,
+                   compress=False):
+    """
+    build_context com cache.
+
+    A busca (e a compressão) só usa o conjunto de termos da consulta, então a
+    chave usa os termos ordenados: "SBCE, CBAM" e "cbam sbce" dão o mesmo
+    contexto. compress liga a compressão extrativa (compression.py).
+    timer (diagnostics.StageTimer) recebe o tempo na etapa "contexto".
+    """
+    terms = sorted(set(tokenize(query)))
+    key = _hash_key(corpus_version, terms, token_budget, show_size, compress)
+
+    def build():
+        return build_context(documents, index, query, token_budget=token_budget, show_size=show_size,
+                             compress=query_compressor(query) if compress else None)
+
+    with stage(timer, "contexto"):
+        return CONTEXT_CACHE.get_or_build(key, build)
+
+
+def cache_stats():
+    """Contadores dos caches de contexto e de prompt"""
+    return {'context': CONTEXT_CACHE.stats(), 'prompt': PROMPT_CACHE.stats()}
+
+
+# ==============================================================================
+# MEETING PREP
+# ==============================================================================
+
+def build_meeting_prompt(documents, index, corpus_version, organization, meeting_date, topics,
+                         meeting_type, detail_level, objectives, token_budget, timer=None, compress=False):
+    """
+    Prompt do Meeting Prep.
+
+    Retorna {'prompt', 'context', 'token_usage', 'dedup_savings', 'compression'}; ver
+    retrieval.build_context. compress liga a compressão extrativa do contexto.
+    timer: diagnostics.StageTimer opcional (etapa "contexto", se não vier do cache).
+    """
+    # Só a chave usa os campos normalizados; o prompt leva o texto como foi digitado
+    fields = [organization, meeting_date, topics, meeting_type, detail_level, objectives]
+    key = _hash_key("meeting", corpus_version, *map(normalize_field, fields), token_budget, compress)
+
+    def build():
+        query = f"{topics}\n{objectives}\n{organization}"
+        full_context, token_usage, dedup_savings, compression = cached_context(
+            documents, index, corpus_version, query, token_budget, timer=timer, compress=compress
+        )
+
+        # Ajustar seções por nível
+        if detail_level == "Rápido":
+            sections = """
+1. 🎯 Objetivos Estratégicos (2-3 pontos)
+2. 💡 Posições IETA Relevantes (cite documentos específicos)
+3. 🗣️ 3 Talking Points Principais
+"""
+        elif detail_level == "Padrão":
+            sections = """
+1. 🎯 Objetivos Estratégicos IETA
+2. 📊 Contexto sobre a Organização
+3. 💡 Posições IETA Relevantes (SEMPRE cite o documento fonte)
+4. 🗣️ 5 Talking Points Estratégicos
+5. ❓ 3-4 Perguntas Prováveis e Respostas
+"""
+        else:  # Completo
+            sections = """
+1. 🎯 Objetivos Estratégicos IETA
+2. 📊 Contexto Detalhado sobre a Organização
+3. 💡 Posições IETA Relevantes (com citações literais dos documentos)
+4. 🗣️ 7 Talking Points Estratégicos
+5. ❓ 5+ Perguntas Prováveis e Respostas Preparadas
+6. ⚠️ Considerações Estratégicas (Oportunidades e Riscos)
+7. 📋 Action Items para Follow-up
+"""
+
+        # Criar prompt melhorado
+        prompt = f"""Você é um assistente especializado da IETA (International Emissions Trading Association) Brasil.
+
+REGRAS CRÍTICAS DE RESPOSTA:
+1. Use APENAS informações dos documentos fornecidos abaixo
+2. SEMPRE cite a fonte: "Segundo [nome do documento], ..."
+3. Use dados numéricos EXATOS dos documentos (não invente)
+4. Se não houver informação específica, diga claramente
+5. Priorize informações de Position Papers oficiais
+6. Quando múltiplos documentos mencionarem algo, sintetize mostrando convergências
+
+INFORMAÇÕES DA REUNIÃO:
+- Organização: {organization}
+- Data: {meeting_date}
+- Tipo: {meeting_type}
+- Tópicos: {topics}
+- Objetivos: {objectives if objectives else "Mapear oportunidades e alinhar posições"}
+
+DOCUMENTOS IETA ({len(token_usage)} documentos, ~{len(full_context):,} caracteres):
+
+{full_context}
+
+TAREFA:
+Crie um briefing executivo estruturado para esta reunião.
+
+ESTRUTURA DO BRIEFING:
+{sections}
+
+FORMATO:
+- Use markdown com headers (##, ###) e bullet points
+- Cada afirmação importante deve incluir [Fonte: nome_do_documento], com a página quando o trecho a indicar ([Fonte: nome_do_documento, p. N])
+- Seja específico e prático
+- Foque em informações ACIONÁVEIS
+
+BRIEFING:
+"""
+
+        return {'prompt': prompt, 'context': full_context, 'token_usage': token_usage,
+                'dedup_savings': dedup_savings, 'compression': compression}
+
+    return PROMPT_CACHE.get_or_build(key, build)
+
+
+# ==============================================================================
+# PANEL PREP
+# ==============================================================================
+
+def build_panel_prompt(documents, index, corpus_version, panel_title, event_name, panel_date, your_role,
+                       panel_topic, duration, prep_level, audience, other_panelists, key_message,
+                       token_budget, timer=None, compress=False):
+    """
+    Prompt do Panel Prep.
+
+    Retorna {'prompt', 'context', 'token_usage', 'dedup_savings', 'compression'}; ver
+    retrieval.build_context. compress liga a compressão extrativa do contexto.
+    timer: diagnostics.StageTimer opcional (etapa "contexto", se não vier do cache).
+    """
+    # Só a chave usa os campos normalizados; o prompt leva o texto como foi digitado
+    fields = [panel_title, event_name, panel_date, your_role, panel_topic, duration, prep_level,
+              audience, other_panelists, key_message]
+    key = _hash_key("panel", corpus_version, *map(normalize_field, fields), token_budget, compress)
+
+    def build():
+        query = f"{panel_title}\n{panel_topic}\n{key_message}"
+        full_context, token_usage, dedup_savings, compression = cached_context(
+            documents, index, corpus_version, query, token_budget, show_size=False, timer=timer, compress=compress
+        )
+
+        # Ajustar por nível
+        if prep_level == "Básico":
+            sections = """
+1. 🎯 Mensagem Central (1 frase impactante)
+2. 💡 3 Pontos-Chave para Sua Fala
+3. 📊 2-3 Dados de Apoio dos documentos
+4. 🎤 Sugestão de Abertura
+5. 🔚 Sugestão de Fechamento
+"""
+        elif prep_level == "Intermediário":
+            sections = """
+1. 🎯 Mensagem Central e Narrativa
+2. 💡 5 Pontos Principais Estruturados
+3. 📊 Dados e Evidências (com fontes)
+4. 🎤 Abertura Impactante
+5. 🗣️ Possíveis Perguntas do Moderador/Audiência
+6. 🔚 Fechamento Memorável
+7. ⏰ Estrutura por Tempo ({duration})
+"""
+        else:  # Avançado
+            sections = """
+1. 🎯 Narrativa Estratégica Completa
+2. 💡 7-10 Pontos de Argumentação
+3. 📊 Dados, Evidências e Cases (citando documentos)
+4. 🎤 Múltiplas Opções de Abertura
+5. 🗣️ Banco de Q&A (10+ perguntas)
+6. 💬 Soundbites para Mídia/Redes
+7. 🔚 Variações de Fechamento
+8. ⏰ Roteiro Minuto a Minuto
+9. 🎭 Gestão de Debates e Contra-argumentos
+"""
+
+        prompt = f"""Você é um coach de comunicação especializado em painéis sobre mercados de carbono para a IETA.
+
+REGRAS CRÍTICAS:
+1. Use APENAS informações dos documentos IETA fornecidos
+2. Cite fontes específicas: [Fonte: nome_documento], com a página quando o trecho a indicar ([Fonte: nome_documento, p. N])
+3. Foque em comunicação CLARA e IMPACTANTE
+4. Adapte ao tempo disponível ({duration})
+5. Considere o público: {audience if audience else "profissionais do setor"}
+
+PAINEL:
+- Título: {panel_title}
+- Evento: {event_name}
+- Data: {panel_date}
+- Seu papel: {your_role}
+- Duração: {duration}
+- Tema: {panel_topic}
+- Público: {audience if audience else "profissionais do setor"}
+- Outros painelistas: {other_panelists if other_panelists else "Não informado"}
+- Mensagem-chave desejada: {key_message if key_message else "A definir com base nos documentos IETA"}
+
+DOCUMENTOS IETA ({len(token_usage)} documentos):
+
+{full_context}
+
+TAREFA:
+Crie uma preparação completa e prática para este painel.
+
+ESTRUTURA:
+{sections}
+
+DIRETRIZES:
+- Seja PRÁTICO e ACIONÁVEL
+- Pense em storytelling, não só dados
+- Inclua transições naturais
+- Prepare para imprevistos
+- Use dados concretos dos documentos IETA
+
+PREPARAÇÃO:
+"""
+
+        return {'prompt': prompt, 'context': full_context, 'token_usage': token_usage,
+                'dedup_savings': dedup_savings, 'compression': compression}
+
+    return PROMPT_CACHE.get_or_build(key, build)
@@ -0,0 +1,110 @@
+"""
+prompt_delivery.py - Entrega leve do prompt gerado ao navegador
+
+Um prompt de 80k+ caracteres ia três vezes para a página (caixa de texto,
+botão de download e link do ChatGPT) e voltava a cada rerun. Aqui o prompt
+fica guardado uma única vez no servidor, com um id, e o navegador recebe:
+
+- para copiar: o texto compactado (gzip + base64), descompactado no próprio
+  navegador pelo botão de cópia
+- para ler: uma página por vez da pré-visualização, só quando pedida
+- para baixar: nada; o arquivo é lido do servidor no clique (download adiado)
+"""
+
+import base64
+import gzip
+import hashlib
+import html
+import json
+
+from prompt_builder import LRUCache
+
+# Prompts guardados por processo (os mais antigos saem primeiro)
+PROMPT_STORE = LRUCache(maxsize=64)
+
+# Caracteres por página da pré-visualização
+PREVIEW_PAGE_CHARS = 8000
+
+
+def store_prompt(prompt):
+    """Guarda o prompt no servidor e retorna o id dele (o mesmo texto tem o mesmo id)"""
+    prompt_id = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+    PROMPT_STORE.put(prompt_id, prompt)
+    return prompt_id
+
+
+def get_prompt(prompt_id):
+    """Prompt guardado, ou None se já saiu do armazenamento"""
+    return PROMPT_STORE.get(prompt_id)
+
+
+def compress_prompt(prompt):
+    """Texto em gzip + base64, pronto para ir dentro do HTML"""
+    return base64.b64encode(gzip.compress(prompt.encode('utf-8'), compresslevel=9)).decode('ascii')
+
+
+def page_bounds(prompt, page_chars=PREVIEW_PAGE_CHARS):
+    """
+    Divide o prompt em páginas de até page_chars caracteres.
+
+    Cada corte cai na última quebra de linha antes do limite (quando há
+    uma), para não partir parágrafos. Retorna a lista de (início, fim).
+    """
+    bounds = []
+    start = 0
+    while start < len(prompt):
+        end = min(start + page_chars, len(prompt))
+        if end < len(prompt):
+            newline = prompt.rfind("\n", start, end)
+            if newline > start:
+                end = newline + 1
+        bounds.append((start, end))
+        start = end
+    return bounds or [(0, 0)]
+
+
+def clipboard_button_html(payload, label="📋 Copiar prompt completo"):
+    """
+    HTML de um botão que copia o prompt compactado para a área de transferência.
+
+    O texto é descompactado ao carregar (DecompressionStream), para o clique
+    só escrever na área de transferência enquanto o gesto do usuário vale.
+    """
+    return f"""
+<button id="copy" disabled style="
+    width: 100%;
+    height: 43px;
+    padding: 0.5rem;
+    background-color: #ff4b4b;
+    color: white;
+    border: none;
+    border-radius: 0.5rem;
+    cursor: pointer;
+    font-family: sans-serif;
+    font-size: 14px;
+    font-weight: 500;
+">{html.escape(label)}</button>
+<div id="status" style="font-family: sans-serif; font-size: 12px; color: #555; margin-top: 4px;"></div>
+<script>
+const payload = {json.dumps(payload)};
+const button = document.getElementById("copy");
+const status = document.getElementById("status");
+let text = null;
+
+(async () => {{
+    const bytes = Uint8Array.from(atob(payload), c => c.charCodeAt(0));
+    const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+    text = await new Response(stream).text();
+    button.disabled = false;
+}})().catch(e => {{ status.textContent = "⚠️ Navegador sem suporte: " + e; }});
+
+button.addEventListener("click", async () => {{
+    try {{
+        await navigator.clipboard.writeText(text);
+        status.textContent = "✅ Copiado! (" + text.length.toLocaleString() + " caracteres)";
+    }} catch (e) {{
+        status.textContent = "⚠️ Não foi possível copiar: " + e;
+    }}
+}});
+</script>
+"""
@@ -0,0 +1,374 @@
+"""
+retrieval.py - Busca de trechos relevantes nos documentos (BM25)
+
+Os documentos são divididos em trechos de ~1.500 caracteres e indexados num
+índice invertido em memória. Na hora de montar o contexto do prompt, os
+trechos mais relevantes para os tópicos/objetivos entram primeiro, em vez dos
+primeiros 12.000 caracteres de cada documento na ordem da pasta.
+
+A seleção respeita um orçamento em tokens (ver token_budget.py) e só usa
+trechos inteiros, priorizando relevância por token.
+
+O índice é construído uma vez por versão do corpus; a consulta só percorre as
+listas de ocorrência dos termos buscados, então continua em milissegundos
+mesmo com centenas de documentos. Documentos e consulta passam pela mesma
+normalização (ver text_normalization.py): sem acentos, radicais comuns a
+português e inglês e siglas/nomes por extenso reunidos num mesmo conceito.
+
+Trechos quase duplicados (relatórios de anos seguidos, briefs parecidos) são
+agrupados na indexação (ver dedup.py) e só o representante de cada grupo
+entra no contexto. O cabeçalho "DOCUMENTO/PARTE" dos arquivos gerados pelo
+chunk_documents.py não é indexado.
+
+Opcionalmente cada trecho entra comprimido (ver compression.py): só as
+frases mais ligadas à consulta, o que faz caber mais fontes no orçamento.
+
+As partes _parteNNdeMM de um mesmo documento contam como um documento só
+(ver logical_documents.py): um cabeçalho, uma cota de MAX_DOC_SHARE, e cada
+trecho com as páginas de onde veio, quando a parte tem marcadores de página.
+"""
+
+import math
+import re
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+from dedup import find_duplicates, minhash_sketch
+from logical_documents import LogicalDocuments, page_label, page_markers
+from text_normalization import tokenize
+from token_budget import count_tokens, pack_greedy
+
+PASSAGE_CHARS = 1500
+
+# Fração máxima do orçamento por documento, para um único documento não
+# ocupar o contexto todo (equivale aos antigos 12k de 80k caracteres)
+MAX_DOC_SHARE = 0.15
+
+# Com compressão, só os primeiros trechos da fila de prioridade são
+# comprimidos: até somarem este múltiplo do orçamento (o resto não caberia)
+COMPRESS_LOOKAHEAD = 3
+
+# Parâmetros clássicos do BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+PASSAGE_SEPARATOR = "\n\n[...]\n\n"
+
+# Tokens do rótulo de páginas de um trecho ("[Páginas 123 a 125]" + quebra de linha)
+PAGE_LABEL_TOKENS = count_tokens(page_label(123, 125) + "\n")
+
+# Cabeçalho escrito pelo chunk_documents.py no início de cada parte
+CHUNK_HEADER = re.compile(r"DOCUMENTO: [^\n]*\r?\nPARTE \d+ de \d+\r?\n(?:[^\n]*\r?\n){0,3}?={20,}\r?\n\s*")
+
+
+def split_passages(text, target_chars=PASSAGE_CHARS, start=0):
+    """
+    Divide o texto (a partir de start) em trechos de ~target_chars caracteres.
+
+    O corte é feito na última quebra de linha (ou espaço) da segunda metade
+    do trecho, para não partir frases no meio. Retorna [(inicio, fim)].
+    """
+    spans = []
+    pos = start
+    length = len(text)
+
+    while pos < length:
+        end = min(pos + target_chars, length)
+
+        if end < length:
+            cut = text.rfind("\n", pos + target_chars // 2, end)
+            if cut == -1:
+                cut = text.rfind(" ", pos + target_chars // 2, end)
+            if cut != -1:
+                end = cut + 1
+
+        if text[pos:end].strip():
+            spans.append((pos, end))
+        pos = end
+
+    return spans
+
+
+def bm25_idf(total, doc_freq):
+    """IDF de um termo presente em doc_freq dos total trechos"""
+    return math.log(1 + (total - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+def bm25_term_score(idf, freq, length, avg_length):
+    """Parcela do BM25 de um termo que aparece freq vezes num trecho de length termos"""
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+    return idf * freq * (BM25_K1 + 1) / (freq + norm)
+
+
+class RankedPassages(ABC):
+    """
+    Trechos de um corpus e a busca sobre eles.
+
+    Guarda o que toda consulta usa (offsets, tokens, duplicatas, documentos
+    lógicos); de onde vêm as estatísticas do BM25 fica com a subclasse, em
+    _scores: PassageIndex monta o índice em memória, corpus_db.ArtifactIndex
+    lê do artefato compilado. As duas usam bm25_idf/bm25_term_score, então
+    a mesma consulta ordena os trechos do mesmo jeito.
+
+    passages: [(nome_do_documento, inicio, fim)]; representative[id] é o
+    trecho que responde pelo grupo de duplicatas de id.
+    """
+
+    def __init__(self, passages, passage_tokens, representative, logical):
+        self.passages = passages
+        self.passage_tokens = passage_tokens
+        self.logical = logical
+        self.representative = representative
+        self.duplicates = defaultdict(list)  # representante -> [ids das cópias]
+        for passage_id, group in enumerate(representative):
+            if group != passage_id:
+                self.duplicates[group].append(passage_id)
+
+    @abstractmethod
+    def _scores(self, query):
+        """BM25 de cada trecho que tem algum termo da consulta: {id_do_trecho: score}"""
+
+    def search(self, query, limit=None):
+        """
+        Retorna [(score, id_do_trecho)] em ordem decrescente de relevância.
+
+        Cópias quase duplicadas não aparecem: o representante do grupo fica
+        com o maior score entre elas.
+        """
+        merged = {}
+        for passage_id, score in self._scores(query).items():
+            representative = self.representative[passage_id]
+            merged[representative] = max(score, merged.get(representative, 0.0))
+
+        ranked = sorted(((score, pid) for pid, score in merged.items()), reverse=True)
+        return ranked[:limit] if limit else ranked
+
+    def reading_order(self, passage_ids):
+        """Trechos na ordem de leitura: documento lógico, parte, posição na parte"""
+        return sorted(passage_ids, key=lambda passage_id: (self.logical.sort_key(self.passages[passage_id][0]),
+                                                           passage_id))
+
+    def lead_passages(self):
+        """Trechos na ordem "início de cada documento primeiro" (sem consulta; partes contam como um documento)"""
+        position_in_doc = {}
+        ordered = []
+        for passage_id in self.reading_order(range(len(self.passages))):
+            if self.representative[passage_id] != passage_id:
+                continue
+            logical = self.logical.logical_name(self.passages[passage_id][0])
+            position = position_in_doc.get(logical, 0)
+            position_in_doc[logical] = position + 1
+            ordered.append((position, self.logical.order[logical], passage_id))
+        return [passage_id for _, _, passage_id in sorted(ordered)]
+
+
+class PassageIndex(RankedPassages):
+    """Índice invertido BM25 em memória sobre os trechos de todos os documentos"""
+
+    def __init__(self, documents, target_chars=PASSAGE_CHARS):
+        passages = []  # (nome_do_documento, inicio, fim)
+        passage_tokens = []
+        self._lengths = []
+        self._postings = defaultdict(list)  # termo -> [(id_do_trecho, frequência)]
+        sketches = []
+        markers = {}
+
+        for doc_name, doc_data in documents.items():
+            content = doc_data['full_content']
+            header = CHUNK_HEADER.match(content)
+            markers[doc_name] = page_markers(content)
+
+            for start, end in split_passages(content, target_chars, header.end() if header else 0):
+                passage_id = len(passages)
+                passages.append((doc_name, start, end))
+
+                passage_tokens.append(count_tokens(content[start:end]))
+                sketches.append(minhash_sketch(content[start:end]))
+
+                terms = tokenize(content[start:end])
+                self._lengths.append(len(terms))
+
+                counts = defaultdict(int)
+                for term in terms:
+                    counts[term] += 1
+                for term, freq in counts.items():
+                    self._postings[term].append((passage_id, freq))
+
+        total = len(passages)
+        self._avg_length = (sum(self._lengths) / total) if total else 0.0
+        self._idf = {term: bm25_idf(total, len(posting)) for term, posting in self._postings.items()}
+
+        super().__init__(
+            passages, passage_tokens,
+            find_duplicates(sketches, [end - start for _, start, end in passages]),
+            LogicalDocuments(documents, markers),
+        )
+
+    def passage_terms(self, passage_id):
+        """Termos indexados do trecho (o tamanho dele no BM25)"""
+        return self._lengths[passage_id]
+
+    def _scores(self, query):
+        scores = defaultdict(float)
+        avg_length = self._avg_length or 1.0
+
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+
+            for passage_id, freq in self._postings[term]:
+                scores[passage_id] += bm25_term_score(idf, freq, self._lengths[passage_id], avg_length)
+
+        return scores
+
+
+def _doc_banner(doc_name, documents, part_names, show_size):
+    lines = ["", "=" * 70, f"DOCUMENTO: {doc_name}"]
+    if show_size:
+        char_count = sum(documents[name]['char_count'] for name in part_names)
+        parts = f" ({len(part_names)} partes)" if len(part_names) > 1 else ""
+        lines.append(f"Tamanho: {char_count:,} caracteres{parts}")
+    lines += ["=" * 70, "", ""]
+    return "\n".join(lines)
+
+
+def _with_pages(text, index, doc_name, start, end):
+    """Trecho precedido das páginas de onde veio, quando a parte tem marcadores"""
+    pages = index.logical.pages_of(doc_name, start, end)
+    return f"{page_label(*pages)}\n{text}" if pages else text
+
+
+def _format_doc(doc_name, documents, passage_ids, index, show_size, texts=None):
+    """
+    Bloco de um documento lógico: cabeçalho + trechos na ordem de leitura
+    (parte a parte), separados por [...]
+
+    texts: {id_do_trecho: texto comprimido}; trechos comprimidos nunca são
+    emendados no vizinho, já que as pontas deles podem ter sido cortadas.
+    Sem eles, só as faixas dos trechos são lidas do documento
+    (document_store.StoredDocument.text).
+    """
+    banner = _doc_banner(doc_name, documents, index.logical.parts[doc_name], show_size)
+    if texts is not None:
+        pieces = []
+        for passage_id in index.reading_order(passage_ids):
+            part_name, start, end = index.passages[passage_id]
+            pieces.append(_with_pages(texts[passage_id], index, part_name, start, end))
+        return banner + PASSAGE_SEPARATOR.join(pieces) + "\n"
+
+    spans = []  # [nome da parte, início, fim]
+    previous = None
+    for passage_id in index.reading_order(passage_ids):
+        part_name, start, end = index.passages[passage_id]
+        if previous is not None and passage_id == previous + 1 and spans[-1][0] == part_name:
+            spans[-1][2] = end  # Trechos vizinhos: texto contínuo
+        else:
+            spans.append([part_name, start, end])
+        previous = passage_id
+    pieces = [
+        _with_pages(documents[part_name].text(start, end).strip(), index, part_name, start, end)
+        for part_name, start, end in spans
+    ]
+    return banner + PASSAGE_SEPARATOR.join(pieces) + "\n"
+
+
+def build_context(documents, index, query, token_budget=20000, show_size=True, compress=None):
+    """
+    Monta o contexto do prompt com os trechos mais relevantes para a consulta.
+
+    Os trechos que casam com a consulta entram por ordem de relevância por
+    token (BM25 / tokens do trecho) até encher token_budget, respeitando
+    MAX_DOC_SHARE do orçamento por documento. Sobrando espaço, ele é
+    completado com o início de cada documento. Só entram trechos inteiros;
+    no texto final eles ficam agrupados por documento e na ordem original,
+    separados por "[...]".
+
+    compress: função texto -> texto (ver compression.query_compressor); com
+    ela cada trecho entra e é contado já comprimido.
+
+    As partes de um mesmo documento (ver logical_documents.py) formam um
+    bloco só, e os trechos delas levam as páginas de onde vieram.
+
+    Retorna (contexto, tokens_por_documento, economia, compressão), com a
+    contagem exata de tokens de cada bloco de documento (lógico) como ele
+    entrou no contexto; em economia, os caracteres/tokens das cópias duplicadas dos
+    trechos escolhidos que deixaram de entrar: {'passages', 'chars',
+    'tokens'}; em compressão, o tamanho dos trechos escolhidos antes e
+    depois dela: {'original_chars', 'chars', 'ratio'} (ratio 1.0 sem
+    compressão).
+    """
+    ranked = sorted(
+        index.search(query),
+        key=lambda item: item[0] / max(index.passage_tokens[item[1]], 1),
+        reverse=True,
+    )
+    priority = [passage_id for _, passage_id in ranked]
+    matched = set(priority)
+    priority += [passage_id for passage_id in index.lead_passages() if passage_id not in matched]
+
+    logical = index.logical
+    separator_tokens = count_tokens(PASSAGE_SEPARATOR)
+    banner_tokens = {
+        doc_name: count_tokens(_doc_banner(doc_name, documents, part_names, show_size)) + 1
+        for doc_name, part_names in logical.parts.items()
+    }
+
+    def overhead(part_name):
+        return separator_tokens + (PAGE_LABEL_TOKENS if part_name in logical.markers else 0)
+
+    texts = None
+    if compress is None:
+        items = []
+        for passage_id in priority:
+            part_name = index.passages[passage_id][0]
+            items.append((passage_id, logical.logical_name(part_name),
+                          index.passage_tokens[passage_id] + overhead(part_name)))
+    else:
+        texts = {}
+        items = []
+        planned = 0
+        for passage_id in priority:
+            if planned > token_budget * COMPRESS_LOOKAHEAD:
+                break
+            part_name, start, end = index.passages[passage_id]
+            texts[passage_id] = compress(documents[part_name].text(start, end))
+            cost = count_tokens(texts[passage_id]) + overhead(part_name)
+            items.append((passage_id, logical.logical_name(part_name), cost))
+            planned += cost
+    chosen = pack_greedy(items, token_budget, banner_tokens, group_cap=token_budget * MAX_DOC_SHARE)
+
+    # A contagem final é refeita no texto montado; se por arredondamento
+    # passar do orçamento, sai o trecho de menor prioridade
+    while True:
+        selected = defaultdict(list)  # documento lógico -> [id_do_trecho]
+        for passage_id in chosen:
+            selected[logical.logical_name(index.passages[passage_id][0])].append(passage_id)
+
+        blocks = {
+            doc_name: _format_doc(doc_name, documents, passage_ids, index, show_size, texts)
+            for doc_name, passage_ids in selected.items()
+        }
+        usage = {doc_name: count_tokens(block) for doc_name, block in blocks.items()}
+
+        if sum(usage.values()) <= token_budget or not chosen:
+            break
+        chosen = chosen[:-1]
+
+    copies = [copy_id for passage_id in chosen for copy_id in index.duplicates.get(passage_id, ())]
+    savings = {
+        'passages': len(copies),
+        'chars': sum(index.passages[copy_id][2] - index.passages[copy_id][1] for copy_id in copies),
+        'tokens': sum(index.passage_tokens[copy_id] for copy_id in copies),
+    }
+
+    original_chars = sum(index.passages[passage_id][2] - index.passages[passage_id][1] for passage_id in chosen)
+    final_chars = sum(len(texts[passage_id]) for passage_id in chosen) if texts is not None else original_chars
+    compression = {
+        'original_chars': original_chars,
+        'chars': final_chars,
+        'ratio': final_chars / original_chars if original_chars else 1.0,
+    }
+
+    # Documentos na ordem do trecho mais relevante de cada um
+    return "\n".join(blocks.values()), usage, savings, compression
@@ -0,0 +1,75 @@
+"""
+test_docx_stream.py - Paridade do docx_stream com o python-docx
+
+Rodar: python -m pytest test_docx_stream.py
+"""
+
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.shared import Inches
+
+from docx_stream import CELL_SEPARATOR, iter_docx_blocks
+
+
+def _paragraphs_fixture(path):
+    """Parágrafos com tabulações, quebras de linha, paradas de tabulação e vazios"""
+    doc = Document()
+    doc.add_heading("Mercado de carbono", level=1)
+    doc.add_paragraph("SBCE\tCBAM\tCBIOs")
+    paragraph = doc.add_paragraph("Primeira linha")
+    paragraph.add_run().add_break()
+    paragraph.add_run("segunda linha")
+    doc.add_paragraph("")
+    # Parada de tabulação em w:pPr/w:tabs/w:tab: não é texto
+    paragraph = doc.add_paragraph("Com parada de tabulação")
+    paragraph.paragraph_format.tab_stops.add_tab_stop(Inches(2))
+    doc.add_paragraph().paragraph_format.tab_stops.add_tab_stop(Inches(3))
+    paragraph = doc.add_paragraph()
+    paragraph.add_run("Negrito").bold = True
+    paragraph.add_run(" e normal")
+    doc.save(path)
+    return path
+
+
+def test_paragraphs_match_python_docx(tmp_path):
+    path = _paragraphs_fixture(tmp_path / "paragrafos.docx")
+
+    assert list(iter_docx_blocks(path)) == [p.text for p in Document(path).paragraphs]
+
+
+def test_table_rows_in_document_order(tmp_path):
+    doc = Document()
+    doc.add_paragraph("Antes")
+    table = doc.add_table(rows=2, cols=2)
+    for row, values in zip(table.rows, [("Ano", "Preço"), ("2024", "")]):
+        for cell, value in zip(row.cells, values):
+            cell.text = value
+    doc.add_paragraph("Depois")
+    path = tmp_path / "tabela.docx"
+    doc.save(path)
+
+    assert list(iter_docx_blocks(path)) == [
+        "Antes",
+        "Ano" + CELL_SEPARATOR + "Preço",
+        "2024" + CELL_SEPARATOR,
+        "Depois",
+    ]
+
+
+def test_tracked_changes_are_accepted(tmp_path):
+    # Diferença documentada: o python-docx deixa de fora o texto de w:ins
+    doc = Document()
+    doc.add_paragraph("Texto ")._p.append(parse_xml(
+        f'<w:ins {nsdecls("w")} w:id="1" w:author="IETA" w:date="2025-01-01T00:00:00Z">'
+        '<w:r><w:t>inserido</w:t></w:r></w:ins>'
+    ))
+    doc.paragraphs[0]._p.append(parse_xml(
+        f'<w:del {nsdecls("w")} w:id="2" w:author="IETA" w:date="2025-01-01T00:00:00Z">'
+        '<w:r><w:delText> apagado</w:delText></w:r></w:del>'
+    ))
+    path = tmp_path / "alteracoes.docx"
+    doc.save(path)
+
+    assert [p.text for p in Document(path).paragraphs] == ["Texto "]
+    assert list(iter_docx_blocks(path)) == ["Texto inserido"]
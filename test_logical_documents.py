@@ -0,0 +1,79 @@
+"""
+test_logical_documents.py - Faixas de páginas de um documento em partes _parteNNdeMM
+
+Rodar: python -m pytest test_logical_documents.py
+"""
+
+from document_store import StoredDocument
+from logical_documents import LogicalDocuments, page_markers
+
+
+def _pdf_part(stem, part, total, pages):
+    """Texto de uma parte no formato do chunk_pdf"""
+    text = f"DOCUMENTO: {stem}\nPARTE {part} de {total}\nPáginas {pages[0]} a {pages[-1]}\n{'=' * 70}\n"
+    for page in pages:
+        text += f"\n\n--- PÁGINA {page} ---\n\nTexto da página {page}"
+    return text
+
+
+class RangeSource:
+    """Origem que só sabe ler faixas, e anota quais leu"""
+
+    def __init__(self, name, text, reads):
+        self.key = ('teste', name)
+        self.name = name
+        self.content = text
+        self.reads = reads
+
+    def read(self):
+        raise AssertionError(f"{self.name} lido inteiro")
+
+    def read_range(self, start, end):
+        self.reads.append(self.name)
+        return self.content[start:end]
+
+
+def _manual(reads):
+    texts = {
+        "Manual_parte01de03.txt": _pdf_part("Manual", 1, 3, [1, 2]),
+        "Manual_parte02de03.txt": _pdf_part("Manual", 2, 3, [3, 4]),
+        "Manual_parte03de03.txt": _pdf_part("Manual", 3, 3, [5, 6]),
+        "Outro.txt": "Documento sem partes",
+    }
+    documents = {
+        name: StoredDocument(len(text), RangeSource(name, text, reads))
+        for name, text in texts.items()
+    }
+    markers = {name: page_markers(text) for name, text in texts.items()}
+    return documents, LogicalDocuments(list(texts), markers)
+
+
+def test_pages_of_grouped_document():
+    _, logical = _manual([])
+
+    assert logical.parts["Manual"] == ["Manual_parte01de03.txt", "Manual_parte02de03.txt", "Manual_parte03de03.txt"]
+    assert logical.pages("Manual") == [1, 2, 3, 4, 5, 6]
+    assert logical.pages("Outro.txt") == []
+
+
+def test_page_text_reads_only_the_parts_with_the_range():
+    reads = []
+    documents, logical = _manual(reads)
+
+    text = logical.page_text("Manual", 2, 3, documents)
+
+    assert text == (
+        "--- PÁGINA 2 ---\n\nTexto da página 2\n"
+        "--- PÁGINA 3 ---\n\nTexto da página 3"
+    )
+    assert reads == ["Manual_parte01de03.txt", "Manual_parte02de03.txt"]
+
+
+def test_page_spans_join_consecutive_pages():
+    documents, logical = _manual([])
+
+    spans = logical.page_spans("Manual", 3, 6, documents)
+
+    assert [name for name, _, _ in spans] == ["Manual_parte02de03.txt", "Manual_parte03de03.txt"]
+    assert spans[-1][2] == documents["Manual_parte03de03.txt"]['char_count']
+    assert logical.page_spans("Manual", 7, 9, documents) == []
@@ -0,0 +1,204 @@
+"""
+text_normalization.py - Termos normalizados para a busca (português e inglês)
+
+Os tópicos são digitados em português ("SBCE, CBAM, CBIOs, certificados de
+biometano"), mas boa parte do corpus está em inglês e escreve os termos por
+extenso. Para a busca casar os dois lados, todo texto (documentos na
+indexação, consulta na busca) passa pela mesma normalização:
+
+- minúsculas e sem acentos ("emissões" -> "emissoes")
+- radical leve, comum às duas línguas ("emissões", "emissão" e "emissions"
+  -> "emiss"; "carbono" e "carbon" -> "carbon")
+- conceitos do domínio: siglas e nomes por extenso, nas duas línguas, viram
+  um mesmo termo extra ("Sistema Brasileiro de Comércio de Emissões" e
+  "Brazilian Emissions Trading System" também geram "sbce")
+
+As tabelas (acentos, conceitos) são montadas uma vez na importação e os
+termos de cada palavra ficam num cache LRU limitado (WORD_CACHE_SIZE), então
+normalizar uma consulta são quase só consultas a dicionários.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+STOPWORDS_TEXT = """
+a ao aos as à às com como da das de do dos e é em entre era essa esse esta
+este foi há isso mais mas na nas no nos o os ou para pela pelas pelo pelos
+por que se ser sua suas são seu seus sobre também um uma umas uns
+an and are as at be by for from has have in is it its of on or that the
+their this to was were which will with
+"""
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Sufixos removidos pelo radical (sem acento), do mais longo para o mais curto
+SUFFIXES = (
+    "amentos", "imentos", "amento", "imento", "idades", "ations", "itions",
+    "mente", "idade", "acoes", "icoes", "ation", "ition", "ities", "ments",
+    "acao", "icao", "ions", "ment", "ity", "ies", "ing", "ion", "oes", "aes",
+    "ais", "eis", "ed", "ao", "es", "s",
+)
+
+# Radical mínimo (em letras) depois de tirar um sufixo
+MIN_STEM = 3
+
+# Conceito -> formas em que ele aparece (sigla, nome por extenso em português
+# e em inglês). O nome do conceito é o termo extra gerado para todas elas.
+CONCEPTS = {
+    'sbce': [
+        "SBCE", "Sistema Brasileiro de Comércio de Emissões", "Brazilian Emissions Trading System",
+        "Brazilian Emissions Trading Scheme", "Brazilian ETS",
+    ],
+    'cbam': [
+        "CBAM", "Carbon Border Adjustment Mechanism", "Mecanismo de Ajuste de Carbono na Fronteira",
+        "Ajuste de Carbono na Fronteira",
+    ],
+    'cbio': [
+        "CBIO", "CBIOs", "Crédito de Descarbonização", "Créditos de Descarbonização",
+        "Decarbonization Credit", "Decarbonization Credits",
+    ],
+    'itmo': [
+        "ITMO", "ITMOs", "Internationally Transferred Mitigation Outcome",
+        "Internationally Transferred Mitigation Outcomes",
+        "Resultado de Mitigação Transferido Internacionalmente",
+        "Resultados de Mitigação Transferidos Internacionalmente",
+    ],
+    'corsia': [
+        "CORSIA", "Carbon Offsetting and Reduction Scheme for International Aviation",
+        "Esquema de Compensação e Redução de Carbono para a Aviação Internacional",
+    ],
+    'crve': ["CRVE", "CRVEs", "Certificado de Redução ou Remoção Verificada de Emissões"],
+    'cbe': ["CBE", "CBEs", "Cota Brasileira de Emissões", "Cotas Brasileiras de Emissões"],
+    'ets': [
+        "ETS", "Emissions Trading System", "Emissions Trading Scheme", "Sistema de Comércio de Emissões",
+        "Mercado Regulado de Carbono", "Compliance Carbon Market",
+    ],
+    'euets': ["EU ETS", "European Union Emissions Trading System", "Sistema Europeu de Comércio de Emissões"],
+    'vcm': ["VCM", "Voluntary Carbon Market", "Voluntary Carbon Markets", "Mercado Voluntário de Carbono"],
+    'ndc': [
+        "NDC", "NDCs", "Nationally Determined Contribution", "Nationally Determined Contributions",
+        "Contribuição Nacionalmente Determinada", "Contribuições Nacionalmente Determinadas",
+    ],
+    'redd': [
+        "REDD", "Reducing Emissions from Deforestation and Forest Degradation",
+        "Redução de Emissões por Desmatamento e Degradação Florestal",
+    ],
+    'saf': [
+        "SAF", "Sustainable Aviation Fuel", "Sustainable Aviation Fuels",
+        "Combustível Sustentável de Aviação", "Combustíveis Sustentáveis de Aviação",
+    ],
+    'mrv': [
+        "MRV", "Measurement, Reporting and Verification", "Monitoring, Reporting and Verification",
+        "Mensuração, Relato e Verificação", "Monitoramento, Relato e Verificação",
+    ],
+    'gee': [
+        "GEE", "GHG", "Greenhouse Gas", "Greenhouse Gases", "Gás de Efeito Estufa", "Gases de Efeito Estufa",
+    ],
+    'biometano': ["Biometano", "Biomethane", "Renewable Natural Gas", "Gás Natural Renovável"],
+    'artigo6': ["Article 6", "Artigo 6"],
+    'acordoparis': ["Paris Agreement", "Acordo de Paris"],
+    'creditocarbono': ["Carbon Credit", "Carbon Credits", "Crédito de Carbono", "Créditos de Carbono"],
+    'precocarbono': ["Carbon Pricing", "Carbon Price", "Precificação de Carbono", "Preço de Carbono"],
+    'icao': [
+        "ICAO", "OACI", "International Civil Aviation Organization", "Organização da Aviação Civil Internacional",
+    ],
+    'iata': ["IATA", "International Air Transport Association"],
+    'ieta': ["IETA", "International Emissions Trading Association"],
+    'unfccc': [
+        "UNFCCC", "United Nations Framework Convention on Climate Change",
+        "Convenção-Quadro das Nações Unidas sobre Mudança do Clima",
+    ],
+}
+
+
+def _build_accent_table():
+    """Tabela de str.translate: letras acentuadas latinas -> letra sem acento"""
+    table = {}
+    for code in range(0xC0, 0x250):
+        char = chr(code)
+        base = "".join(c for c in unicodedata.normalize("NFKD", char) if not unicodedata.combining(c))
+        if base != char and base.isascii():
+            table[code] = base
+    return table
+
+
+ACCENT_TABLE = _build_accent_table()
+
+
+def fold(text):
+    """Minúsculas e sem acentos"""
+    return text.lower().translate(ACCENT_TABLE)
+
+
+STOPWORDS = frozenset(fold(STOPWORDS_TEXT).split())
+
+# Palavras distintas com termos em cache (o corpus de documents/ tem ~15 mil)
+WORD_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def stem(word):
+    """Radical leve de uma palavra já normalizada (fold); números ficam como estão"""
+    result = word
+    if word.isalpha():
+        for suffix in SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+                result = word[:-len(suffix)]
+                break
+        # Vogal temática do português: "carbono" -> "carbon", "mercado" -> "mercad"
+        if len(result) > MIN_STEM + 1 and result[-1] in "aeo":
+            result = result[:-1]
+    return result
+
+
+def _build_concept_tables():
+    """Formas de uma palavra -> conceito, e primeira palavra -> [(formas de várias palavras, conceito)]"""
+    single = {}
+    phrases = {}
+    for concept, forms in CONCEPTS.items():
+        for form in forms:
+            words = tuple(TOKEN_PATTERN.findall(fold(form)))
+            if len(words) == 1:
+                single[words[0]] = concept
+            else:
+                phrases.setdefault(words[0], []).append((words, concept))
+    # Formas mais longas primeiro: "EU ETS" antes de "ETS"
+    for candidates in phrases.values():
+        candidates.sort(key=lambda item: len(item[0]), reverse=True)
+    return single, phrases
+
+
+SINGLE_CONCEPTS, PHRASE_CONCEPTS = _build_concept_tables()
+
+
+def tokenize(text):
+    """
+    Termos normalizados do texto, na ordem: radicais sem stopwords nem letras
+    soltas, mais o nome do conceito onde aparece uma sigla ou nome por extenso
+    da tabela CONCEPTS.
+    """
+    words = TOKEN_PATTERN.findall(fold(text))
+    terms = []
+    for i, word in enumerate(words):
+        candidates = PHRASE_CONCEPTS.get(word)
+        if candidates:
+            for phrase, concept in candidates:
+                if tuple(words[i:i + len(phrase)]) == phrase:
+                    terms.append(concept)
+                    break
+
+        terms.extend(_terms_of_word(word))
+    return terms
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def _terms_of_word(word):
+    """Termos de uma palavra isolada: radical e conceito (nada para stopwords)"""
+    if len(word) <= 1 or word in STOPWORDS:
+        return ()
+    term = stem(word)
+    concept = SINGLE_CONCEPTS.get(word)
+    if concept is not None and concept != term:
+        return (term, concept)
+    return (term,)